@@ -0,0 +1,14 @@
+{% macro last_transformed_at() %}
+{#-
+    High-water mark of an incremental model: the latest transformed_at of its rows.
+    A table built before the model had a transformed_at column (added by
+    on_schema_change='append_new_columns' during the run) or without any row has
+    none yet, so everything counts as transformed after it.
+-#}
+{%- set columns = adapter.get_columns_in_relation(this) | map(attribute='name') | map('lower') | list -%}
+{%- if 'transformed_at' in columns -%}
+    (select coalesce(max(transformed_at), timestamp('1970-01-01')) from {{ this }})
+{%- else -%}
+    timestamp('1970-01-01')
+{%- endif -%}
+{% endmacro %}
@@ -1,14 +1,68 @@
-{{ config(materialized='table') }}
-
-select
-    file_name,
-    DATETIME(timestamp, "America/New_York") as local_timestamp,
-    DATE(DATETIME(timestamp, "America/New_York")) as date,
-    TIME(DATETIME(timestamp, "America/New_York")) as time,
-    heart_rate,
-    power,
-    cadence,
-    coalesce(speed, enhanced_speed) as speed_ms,
-    3.6 * coalesce(speed, enhanced_speed) as speed_kmh,
-    
-from {{ source('zwift_data', 'fitfile_data') }}
+{{
+    config(
+        materialized='incremental',
+        incremental_strategy='insert_overwrite',
+        partition_by={'field': 'date', 'data_type': 'date'},
+        cluster_by=['file_name'],
+        on_schema_change='append_new_columns',
+    )
+}}
+
+-- Incremental runs only read the partitions of the raw table (UTC days) loaded
+-- into since the last run, as told by the partition metadata, and replace the
+-- America/New_York days they touch: UTC day d holds the end of local day d - 1
+-- and the start of local day d, and each local day spans two UTC days. A local
+-- day is rebuilt from all of its records, so a re-run never duplicates them.
+-- Rebuild everything (e.g. after changing this model) with: dbt run --full-refresh
+-- transformed_at tells the downstream incremental models which days received rides.
+
+{% set raw_table = source('zwift_data', 'fitfile_data') %}
+{% set loaded_days = [] %}
+{% if is_incremental() %}
+    {% set loaded_days_query %}
+        select partition_id
+        from `{{ raw_table.database }}.{{ raw_table.schema }}.INFORMATION_SCHEMA.PARTITIONS`
+        where table_name = '{{ raw_table.identifier }}'
+            and last_modified_time > {{ last_transformed_at() }}
+            and (partition_id is null or partition_id not in ('__NULL__', '__UNPARTITIONED__'))
+    {% endset %}
+    {% set loaded_days = run_query(loaded_days_query).columns[0].values() %}
+    {% if none in loaded_days %}
+        {{ exceptions.raise_compiler_error(
+            raw_table.identifier ~ " is not partitioned by ride date: rebuild it once with "
+            ~ "python src/fitfile_etl.py --rebuild-raw-table"
+        ) }}
+    {% endif %}
+{% endif %}
+
+with records as (
+    select
+        file_name,
+        DATETIME(timestamp, "America/New_York") as local_timestamp,
+        DATE(DATETIME(timestamp, "America/New_York")) as date,
+        TIME(DATETIME(timestamp, "America/New_York")) as time,
+        heart_rate,
+        power,
+        cadence,
+        coalesce(speed, enhanced_speed) as speed_ms,
+        3.6 * coalesce(speed, enhanced_speed) as speed_kmh,
+        current_timestamp() as transformed_at,
+    from {{ raw_table }}
+    {% if is_incremental() %}
+    -- Constant bounds, so only the UTC days of the local days to replace are scanned
+    where false
+    {% for day in loaded_days %}
+        or DATE(timestamp) between
+            DATE_SUB(PARSE_DATE('%Y%m%d', '{{ day }}'), INTERVAL 1 DAY)
+            and DATE_ADD(PARSE_DATE('%Y%m%d', '{{ day }}'), INTERVAL 1 DAY)
+    {% endfor %}
+    {% endif %}
+)
+
+select * from records
+{% if is_incremental() %}
+where false
+{% for day in loaded_days %}
+    or date between DATE_SUB(PARSE_DATE('%Y%m%d', '{{ day }}'), INTERVAL 1 DAY) and PARSE_DATE('%Y%m%d', '{{ day }}')
+{% endfor %}
+{% endif %}
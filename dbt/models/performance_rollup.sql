@@ -0,0 +1,80 @@
+{{
+    config(
+        materialized='incremental',
+        incremental_strategy='merge',
+        unique_key=['grain', 'date'],
+        cluster_by=['grain'],
+    )
+}}
+
+-- Sums, counts and maxima of the per-second metrics by day, month and year
+-- (date is the first day of the period), so averages over any set of periods
+-- recombine exactly: sum(heart_rate_sum) / sum(heart_rate_count).
+-- Incremental runs recompute the days that received rides since the last run,
+-- then every month and year of the affected years from the day rows.
+
+with new_days as (
+    select
+        'day' as grain,
+        date,
+        sum(heart_rate) as heart_rate_sum,
+        count(heart_rate) as heart_rate_count,
+        max(heart_rate) as heart_rate_max,
+        sum(power) as power_sum,
+        count(power) as power_count,
+        max(power) as power_max,
+        sum(cadence) as cadence_sum,
+        count(cadence) as cadence_count,
+        max(cadence) as cadence_max,
+        sum(speed_kmh) as speed_kmh_sum,
+        count(speed_kmh) as speed_kmh_count,
+        max(speed_kmh) as speed_kmh_max,
+        max(transformed_at) as transformed_at
+    from {{ ref('augmented_data') }}
+    {% if is_incremental() %}
+    where date in (
+        select distinct date
+        from {{ ref('augmented_data') }}
+        where transformed_at > {{ last_transformed_at() }}
+    )
+    {% endif %}
+    group by date
+),
+
+days as (
+    select * from new_days
+    {% if is_incremental() %}
+    union all
+    select * from {{ this }}
+    where grain = 'day'
+        and date_trunc(date, year) in (select distinct date_trunc(date, year) from new_days)
+        and date not in (select date from new_days)
+    {% endif %}
+),
+
+periods as (
+    select 'month' as grain, date_trunc(date, month) as date, * except (grain, date) from days
+    union all
+    select 'year' as grain, date_trunc(date, year) as date, * except (grain, date) from days
+)
+
+select * from new_days
+union all
+select
+    grain,
+    date,
+    sum(heart_rate_sum) as heart_rate_sum,
+    sum(heart_rate_count) as heart_rate_count,
+    max(heart_rate_max) as heart_rate_max,
+    sum(power_sum) as power_sum,
+    sum(power_count) as power_count,
+    max(power_max) as power_max,
+    sum(cadence_sum) as cadence_sum,
+    sum(cadence_count) as cadence_count,
+    max(cadence_max) as cadence_max,
+    sum(speed_kmh_sum) as speed_kmh_sum,
+    sum(speed_kmh_count) as speed_kmh_count,
+    max(speed_kmh_max) as speed_kmh_max,
+    max(transformed_at) as transformed_at
+from periods
+group by grain, date
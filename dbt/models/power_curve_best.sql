@@ -0,0 +1,39 @@
+{{ config(materialized='incremental', unique_key=['period', 'duration_s']) }}
+
+-- Best mean-maximal power of each duration, all-time ('all') and per year ('2025').
+-- Incremental runs only read the curves loaded since the last run and merge them
+-- with the current bests of the same durations; merging is idempotent, so curves
+-- read twice are harmless.
+
+with new_curves as (
+    select
+        file_name,
+        start_time,
+        duration_s,
+        max_power,
+        loaded_at
+    from {{ source('zwift_data', 'fitfile_power_curve') }}
+    {% if is_incremental() %}
+    where loaded_at > (select max(loaded_at) from {{ this }})
+    {% endif %}
+),
+
+candidates as (
+    select 'all' as period, * from new_curves
+    union all
+    select cast(extract(year from datetime(start_time, "America/New_York")) as string) as period, * from new_curves
+    {% if is_incremental() %}
+    union all
+    select period, file_name, start_time, duration_s, max_power, loaded_at from {{ this }}
+    {% endif %}
+)
+
+select
+    period,
+    duration_s,
+    max_power,
+    file_name,
+    start_time,
+    loaded_at
+from candidates
+qualify row_number() over (partition by period, duration_s order by max_power desc, start_time) = 1
@@ -0,0 +1,55 @@
+{{
+    config(
+        materialized='incremental',
+        incremental_strategy='merge',
+        unique_key=['resolution_s', 'file_name', 'local_timestamp'],
+        partition_by={'field': 'date', 'data_type': 'date'},
+        cluster_by=['resolution_s', 'file_name'],
+    )
+}}
+
+-- Each ride at 1s, 5s and 30s resolution for the session charts: one row per
+-- bucket (local_timestamp is its start) with the average, minimum and maximum
+-- of each metric, so peaks stay visible at coarse resolutions.
+-- Incremental runs only add the rides whose file is not in the table yet.
+
+with bucketed as (
+    select
+        resolution_s,
+        date,
+        file_name,
+        DATETIME_ADD(
+            DATETIME_TRUNC(local_timestamp, MINUTE),
+            INTERVAL DIV(EXTRACT(SECOND FROM local_timestamp), resolution_s) * resolution_s SECOND
+        ) as bucket_start,
+        power,
+        heart_rate,
+        cadence,
+        speed_kmh
+    from {{ ref('augmented_data') }}
+    -- Resolutions must divide a minute, so buckets never span two minutes
+    cross join unnest([1, 5, 30]) as resolution_s
+    {% if is_incremental() %}
+    where file_name not in (select distinct file_name from {{ this }})
+    {% endif %}
+)
+
+select
+    resolution_s,
+    date,
+    file_name,
+    bucket_start as local_timestamp,
+    avg(power) as power_avg,
+    min(power) as power_min,
+    max(power) as power_max,
+    avg(heart_rate) as heart_rate_avg,
+    min(heart_rate) as heart_rate_min,
+    max(heart_rate) as heart_rate_max,
+    avg(cadence) as cadence_avg,
+    min(cadence) as cadence_min,
+    max(cadence) as cadence_max,
+    avg(speed_kmh) as speed_kmh_avg,
+    min(speed_kmh) as speed_kmh_min,
+    max(speed_kmh) as speed_kmh_max
+from bucketed
+group by resolution_s, date, file_name, bucket_start
@@ -1,4 +1,28 @@
-{{ config(materialized='table') }}
+{{
+    config(
+        materialized='incremental',
+        incremental_strategy='merge',
+        unique_key='date',
+        partition_by={'field': 'date', 'data_type': 'date', 'granularity': 'month'},
+        on_schema_change='append_new_columns',
+    )
+}}
+
+-- Incremental runs only recompute the days that received rides since the last
+-- run (all of their records, older rides of the same day included) and upsert
+-- them on date.
+
+with records as (
+    select *
+    from {{ ref('augmented_data') }}
+    {% if is_incremental() %}
+    where date in (
+        select distinct date
+        from {{ ref('augmented_data') }}
+        where transformed_at > {{ last_transformed_at() }}
+    )
+    {% endif %}
+)
 
 select
     date,
@@ -13,8 +37,9 @@ select
     round(max(heart_rate), 0) as max_heart_rate,
     round(max(power), 0) as max_power,
     round(max(cadence), 0) as max_cadence,
-    round(max(speed_kmh), 1) as max_speed_kmh
+    round(max(speed_kmh), 1) as max_speed_kmh,
+    max(transformed_at) as transformed_at
     
-from {{ ref('augmented_data') }}
+from records
 group by date
-order by date desc
\ No newline at end of file
+order by date desc
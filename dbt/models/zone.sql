@@ -1,4 +1,15 @@
-{{ config(materialized='table') }}
+{{
+    config(
+        materialized='incremental',
+        incremental_strategy='merge',
+        unique_key='date',
+        partition_by={'field': 'date', 'data_type': 'date', 'granularity': 'month'},
+        on_schema_change='append_new_columns',
+    )
+}}
+
+-- Incremental runs only recompute the days that received rides since the last
+-- run and upsert them on date, as in training.
 
 select
     date,
@@ -11,13 +22,22 @@ select
     sum(case when percent_of_max_hr >= 0.6 and percent_of_max_hr < 0.7 then 1 else 0 end)/count(date) as percentage_time_zone_2,
     sum(case when percent_of_max_hr >= 0.7 and percent_of_max_hr < 0.8 then 1 else 0 end)/count(date) as percentage_time_zone_3,
     sum(case when percent_of_max_hr >= 0.8 and percent_of_max_hr < 0.9 then 1 else 0 end)/count(date) as percentage_time_zone_4,
-    sum(case when percent_of_max_hr >= 0.9 then 1 else 0 end)/count(date) as percentage_time_zone_5
+    sum(case when percent_of_max_hr >= 0.9 then 1 else 0 end)/count(date) as percentage_time_zone_5,
+    max(transformed_at) as transformed_at
 from (
     select
         date,
-        heart_rate / (220 - DATE_DIFF(DATE(local_timestamp), DATE('1994-05-12'), YEAR)) as percent_of_max_hr
+        heart_rate / (220 - DATE_DIFF(DATE(local_timestamp), DATE('1994-05-12'), YEAR)) as percent_of_max_hr,
+        transformed_at
     from {{ ref('augmented_data') }}
     where heart_rate is not null
+    {% if is_incremental() %}
+    and date in (
+        select distinct date
+        from {{ ref('augmented_data') }}
+        where transformed_at > {{ last_transformed_at() }}
+    )
+    {% endif %}
 ) as fitfile_data
 group by date
-order by date desc
\ No newline at end of file
+order by date desc
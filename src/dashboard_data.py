@@ -0,0 +1,327 @@
+"""
+Data access of the dashboard pages: the warehouse and a registry of typed queries.
+
+Every dashboard query is registered in QUERIES with its typed parameters, and
+run with run_query: the parameters are checked and normalized (a date given as
+a string or a datetime is the same DATE parameter), then bound by the warehouse
+instead of being formatted into the SQL. Results are Polars DataFrames. The
+pages cache the warehouse with st.cache_resource and the query results with
+st.cache_data for QUERY_CACHE_TTL_SECONDS.
+
+The warehouse is the local DuckDB warehouse when ZWIFT_WAREHOUSE_DIR is set,
+BigQuery otherwise, with the service account of the Streamlit secrets or the
+local key file.
+"""
+
+import os
+from collections import namedtuple
+from datetime import date, datetime
+from pathlib import Path
+
+from google.cloud import bigquery
+from google.oauth2 import service_account
+
+try:
+    from src.warehouse import BigQueryWarehouse, DuckDBWarehouse
+except ModuleNotFoundError:
+    # Run by Streamlit (streamlit run src/Home.py): src/ itself is on sys.path
+    from warehouse import BigQueryWarehouse, DuckDBWarehouse
+
+# Environment variable holding the local warehouse folder
+WAREHOUSE_DIR_ENV_VAR = "ZWIFT_WAREHOUSE_DIR"
+
+# Service account key file used when no credentials are given
+BQ_KEY_PATH = Path(__file__).parent.parent / "zwift-data-loader-key.json"
+
+# Lifetime of the query results cached by the pages
+QUERY_CACHE_TTL_SECONDS = 600
+
+# Date range covering every date, for the queries of all years
+ALL_DATES = (date.min, date.max)
+
+# A dashboard query, with the names and BigQuery types of its @name parameters
+Query = namedtuple("Query", ["sql", "params"])
+
+QUERIES = {
+    "available_years": Query(
+        """
+        SELECT DISTINCT EXTRACT(YEAR FROM date) as year
+        FROM `zwift_data.training`
+        ORDER BY year DESC
+        """,
+        {},
+    ),
+    "available_dates": Query(
+        """
+        SELECT DISTINCT date
+        FROM `zwift_data.training`
+        ORDER BY date DESC
+        """,
+        {},
+    ),
+    # A range on the partitioning column, so only the partitions of the range are scanned
+    "training_metrics": Query(
+        """
+        SELECT
+            COUNT(DISTINCT date) as total_sessions,
+            ROUND(SUM(distance_km), 2) as total_distance_km,
+            ROUND(AVG(distance_km), 2) as avg_distance_km,
+            AVG(duration) as avg_duration_seconds
+        FROM `zwift_data.training`
+        WHERE date BETWEEN @start_date AND @end_date
+        """,
+        {"start_date": "DATE", "end_date": "DATE"},
+    ),
+    # Yearly rows of performance_rollup, dated on the first day of their year
+    "performance_metrics": Query(
+        """
+        SELECT
+            ROUND(MAX(heart_rate_max), 0) as max_heart_rate,
+            ROUND(SUM(heart_rate_sum) / SUM(heart_rate_count), 0) as avg_heart_rate,
+            ROUND(MAX(cadence_max), 0) as max_cadence,
+            ROUND(SUM(cadence_sum) / SUM(cadence_count), 0) as avg_cadence,
+            ROUND(MAX(power_max), 0) as max_power,
+            ROUND(SUM(power_sum) / SUM(power_count), 0) as avg_power,
+            ROUND(MAX(speed_kmh_max), 1) as max_speed,
+            ROUND(SUM(speed_kmh_sum) / SUM(speed_kmh_count), 1) as avg_speed
+        FROM `zwift_data.performance_rollup`
+        WHERE grain = 'year' AND date BETWEEN @start_date AND @end_date
+        """,
+        {"start_date": "DATE", "end_date": "DATE"},
+    ),
+    "zone_distribution": Query(
+        """
+        WITH zone_time_totals AS (
+            SELECT
+                SUM(time_zone_1) as total_zone_1,
+                SUM(time_zone_2) as total_zone_2,
+                SUM(time_zone_3) as total_zone_3,
+                SUM(time_zone_4) as total_zone_4,
+                SUM(time_zone_5) as total_zone_5
+            FROM `zwift_data.zone`
+            WHERE date BETWEEN @start_date AND @end_date
+        )
+        SELECT
+            'Zone 1' as zone_name,
+            ROUND((total_zone_1 / (total_zone_1 + total_zone_2 + total_zone_3 + total_zone_4 + total_zone_5)) * 100, 2) as percentage
+        FROM zone_time_totals
+        UNION ALL
+        SELECT
+            'Zone 2' as zone_name,
+            ROUND((total_zone_2 / (total_zone_1 + total_zone_2 + total_zone_3 + total_zone_4 + total_zone_5)) * 100, 2) as percentage
+        FROM zone_time_totals
+        UNION ALL
+        SELECT
+            'Zone 3' as zone_name,
+            ROUND((total_zone_3 / (total_zone_1 + total_zone_2 + total_zone_3 + total_zone_4 + total_zone_5)) * 100, 2) as percentage
+        FROM zone_time_totals
+        UNION ALL
+        SELECT
+            'Zone 4' as zone_name,
+            ROUND((total_zone_4 / (total_zone_1 + total_zone_2 + total_zone_3 + total_zone_4 + total_zone_5)) * 100, 2) as percentage
+        FROM zone_time_totals
+        UNION ALL
+        SELECT
+            'Zone 5' as zone_name,
+            ROUND((total_zone_5 / (total_zone_1 + total_zone_2 + total_zone_3 + total_zone_4 + total_zone_5)) * 100, 2) as percentage
+        FROM zone_time_totals
+        ORDER BY zone_name
+        """,
+        {"start_date": "DATE", "end_date": "DATE"},
+    ),
+    "power_curve": Query(
+        """
+        SELECT
+            period,
+            duration_s,
+            max_power
+        FROM `zwift_data.power_curve_best`
+        WHERE period IN ('all', @period)
+        ORDER BY period, duration_s
+        """,
+        {"period": "STRING"},
+    ),
+    "session_metrics": Query(
+        """
+        SELECT
+            distance_km,
+            duration,
+            ROUND(max_heart_rate, 0) as max_heart_rate,
+            ROUND(avg_heart_rate, 0) as avg_heart_rate,
+            ROUND(max_cadence, 0) as max_cadence,
+            ROUND(avg_cadence, 0) as avg_cadence,
+            ROUND(max_power, 0) as max_power,
+            ROUND(avg_power, 0) as avg_power,
+            ROUND(max_speed_kmh, 1) as max_speed,
+            ROUND(avg_speed_kmh, 1) as avg_speed
+        FROM `zwift_data.training`
+        WHERE date = @date
+        """,
+        {"date": "DATE"},
+    ),
+    # Average, minimum and maximum per bucket of the power and heart rate of a session
+    "timeseries": Query(
+        """
+        SELECT
+            local_timestamp,
+            power_avg,
+            power_min,
+            power_max,
+            heart_rate_avg,
+            heart_rate_min,
+            heart_rate_max
+        FROM `zwift_data.timeseries_downsampled`
+        WHERE date = @date AND resolution_s = @resolution_s
+        ORDER BY local_timestamp
+        """,
+        {"date": "DATE", "resolution_s": "INT64"},
+    ),
+    "session_zone_distribution": Query(
+        """
+        SELECT
+            'Zone 1' as zone_name,
+            ROUND(percentage_time_zone_1, 4) as percentage
+        FROM `zwift_data.zone`
+        WHERE date = @date
+        UNION ALL
+        SELECT
+            'Zone 2' as zone_name,
+            ROUND(percentage_time_zone_2, 4) as percentage
+        FROM `zwift_data.zone`
+        WHERE date = @date
+        UNION ALL
+        SELECT
+            'Zone 3' as zone_name,
+            ROUND(percentage_time_zone_3, 4) as percentage
+        FROM `zwift_data.zone`
+        WHERE date = @date
+        UNION ALL
+        SELECT
+            'Zone 4' as zone_name,
+            ROUND(percentage_time_zone_4, 4) as percentage
+        FROM `zwift_data.zone`
+        WHERE date = @date
+        UNION ALL
+        SELECT
+            'Zone 5' as zone_name,
+            ROUND(percentage_time_zone_5, 4) as percentage
+        FROM `zwift_data.zone`
+        WHERE date = @date
+        ORDER BY zone_name
+        """,
+        {"date": "DATE"},
+    ),
+}
+
+def get_bigquery_client(service_account_info=None):
+    """
+    Create a BigQuery client.
+
+    Args:
+        service_account_info (dict): Service account key (e.g. from the Streamlit secrets).
+                                     Defaults to None, to use the key file at BQ_KEY_PATH.
+
+    Returns:
+        google.cloud.bigquery.Client: BigQuery client instance.
+
+    Raises:
+        FileNotFoundError: If no service account key is given and the key file does not exist.
+    """
+    if service_account_info is not None:
+        credentials = service_account.Credentials.from_service_account_info(service_account_info)
+        return bigquery.Client(credentials=credentials, project=service_account_info["project_id"])
+    if not BQ_KEY_PATH.exists():
+        raise FileNotFoundError(
+            f"BigQuery credentials not found. Please configure secrets or add credentials file at: {BQ_KEY_PATH}"
+        )
+    return bigquery.Client.from_service_account_json(str(BQ_KEY_PATH))
+
+
+def create_warehouse(service_account_info=None):
+    """
+    Create the warehouse queried by the dashboard pages.
+
+    Args:
+        service_account_info (dict): Service account key of the BigQuery warehouse.
+                                     Defaults to None, to use the local key file.
+
+    Returns:
+        Warehouse: The local warehouse if ZWIFT_WAREHOUSE_DIR is set, BigQuery otherwise.
+    """
+    warehouse_dir = os.environ.get(WAREHOUSE_DIR_ENV_VAR)
+    if warehouse_dir:
+        return DuckDBWarehouse(warehouse_dir)
+    return BigQueryWarehouse(get_bigquery_client(service_account_info))
+
+
+def normalize_param(value, type_):
+    """
+    Convert a query parameter value to the Python type of its BigQuery type.
+
+    Args:
+        value: Parameter value; DATE parameters also accept "YYYY-MM-DD" strings and datetimes.
+        type_ (str): BigQuery type of the parameter: DATE, INT64, FLOAT64 or STRING.
+
+    Returns:
+        The normalized value (datetime.date, int, float or str).
+
+    Raises:
+        ValueError: If the value cannot be converted, or the type is not supported.
+    """
+    if type_ == "DATE":
+        if isinstance(value, datetime):
+            return value.date()
+        if isinstance(value, date):
+            return value
+        return date.fromisoformat(str(value))
+    if type_ == "INT64":
+        if isinstance(value, float) and not value.is_integer():
+            raise ValueError(f"Not an integer: {value}")
+        return int(value)
+    if type_ == "FLOAT64":
+        return float(value)
+    if type_ == "STRING":
+        return str(value)
+    raise ValueError(f"Unsupported query parameter type: {type_}")
+
+
+def run_query(name, warehouse, **params):
+    """
+    Run a registered dashboard query.
+
+    Args:
+        name (str): Name of the query in QUERIES.
+        warehouse (Warehouse): Warehouse to query.
+        **params: Value of each parameter of the query.
+
+    Returns:
+        polars.DataFrame: Query result.
+
+    Raises:
+        ValueError: If the query is unknown, or its parameters are missing, unexpected
+                    or of the wrong type.
+    """
+    if name not in QUERIES:
+        raise ValueError(f"Unknown query: {name}")
+    query = QUERIES[name]
+    if set(params) != set(query.params):
+        raise ValueError(f"Query {name} takes parameters {sorted(query.params)}, got {sorted(params)}")
+    bound_params = tuple(
+        (param, type_, normalize_param(params[param], type_)) for param, type_ in sorted(query.params.items())
+    )
+    return warehouse.query_polars(query.sql, bound_params, label=name)
+
+
+def year_date_range(year):
+    """
+    Date range of a year filter of the dashboard.
+
+    Args:
+        year (str): A year such as "2024", or "All Years".
+
+    Returns:
+        tuple: (first date, last date) of the year, or ALL_DATES for "All Years".
+    """
+    if year == "All Years":
+        return ALL_DATES
+    return date(int(year), 1, 1), date(int(year), 12, 31)
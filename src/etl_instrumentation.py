@@ -0,0 +1,172 @@
+"""
+Per-stage timing instrumentation for the ETL.
+
+ETL functions wrap each stage in measure_stage, which records wall time, CPU
+time, rows and bytes for the stage. Stages can be nested (e.g. serialize and
+load_job inside upload); nested stages record their parent stage and inherit its
+file name. Measuring is off (and nearly free) unless a sink is activated with
+collect_stages: a list in worker processes, whose records are sent back to the
+parent, or the RunReport of the run, which appends each record to a JSON-lines
+file and keeps cProfile dumps of the slowest files.
+"""
+
+import cProfile
+import glob
+import json
+import os
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+# Where measure_stage records go in this process; None when measuring is off
+_active_sink = None
+
+# Records of the stages currently being measured, innermost last
+_stage_stack = []
+
+
+@contextmanager
+def measure_stage(stage, file_name=None):
+    """
+    Measure one ETL stage.
+
+    The caller can set "rows" and "bytes" on the yielded record. Nothing is
+    recorded when no sink is active.
+
+    Args:
+        stage (str): Name of the stage (e.g. "parse", "load_job").
+        file_name (str): Name of the FIT file the stage processed, if any.
+
+    Yields:
+        dict: The stage record.
+    """
+    if _active_sink is None:
+        yield {}
+        return
+    parent = _stage_stack[-1] if _stage_stack else None
+    if file_name is None and parent is not None:
+        file_name = parent["file_name"]
+    record = {
+        "stage": stage,
+        "parent": None if parent is None else parent["stage"],
+        "file_name": file_name,
+        "rows": None,
+        "bytes": None,
+    }
+    _stage_stack.append(record)
+    wall_start, cpu_start = time.perf_counter(), time.process_time()
+    try:
+        yield record
+    finally:
+        record["wall_s"] = time.perf_counter() - wall_start
+        record["cpu_s"] = time.process_time() - cpu_start
+        _stage_stack.pop()
+        _active_sink.append(record)
+
+
+@contextmanager
+def collect_stages(sink=None):
+    """
+    Activate stage measuring in this process.
+
+    Args:
+        sink: Object with an append method receiving stage records. Defaults to a
+              new list.
+
+    Yields:
+        The active sink.
+    """
+    global _active_sink, _stage_stack
+    previous_sink, previous_stack = _active_sink, _stage_stack
+    _active_sink, _stage_stack = ([] if sink is None else sink), []
+    try:
+        yield _active_sink
+    finally:
+        _active_sink, _stage_stack = previous_sink, previous_stack
+
+
+def profile_call(profile_path, func, *args, **kwargs):
+    """
+    Call a function, dumping a cProfile profile of the call if a path is given.
+
+    Args:
+        profile_path (str): Path of the profile dump. Defaults to no profiling when None.
+        func (callable): Function to call.
+        *args: Positional arguments of the call.
+        **kwargs: Keyword arguments of the call.
+
+    Returns:
+        The return value of the call.
+    """
+    if profile_path is None:
+        return func(*args, **kwargs)
+    profiler = cProfile.Profile()
+    try:
+        return profiler.runcall(func, *args, **kwargs)
+    finally:
+        profiler.dump_stats(profile_path)
+
+
+class RunReport:
+    """
+    Machine-readable report of an ETL run, written as JSON lines.
+
+    Every stage record is written as soon as it is received, tagged with the run ID.
+    When profiling, each step of each file is profiled into profile_dir and, at the
+    end of the run, only the profiles of the profile_top_n slowest files (by total
+    wall time of their top-level stages) are kept.
+    """
+
+    def __init__(self, report_path, profile_dir=None, profile_top_n=5):
+        self.report_path = report_path
+        self.profile_dir = profile_dir
+        self.profile_top_n = profile_top_n
+        self.run_id = uuid.uuid4().hex
+        self.file_seconds = {}
+        if profile_dir is not None:
+            os.makedirs(profile_dir, exist_ok=True)
+
+    def get_profile_path(self, file_name, step):
+        """Path of the cProfile dump of one step (e.g. "load") of a FIT file, or None when not profiling."""
+        if self.profile_dir is None:
+            return None
+        return os.path.join(self.profile_dir, f"{file_name}.{step}.prof")
+
+    def append(self, record):
+        """Write one stage record to the report."""
+        if record.get("file_name") is not None and record.get("parent") is None and "wall_s" in record:
+            self.file_seconds[record["file_name"]] = self.file_seconds.get(record["file_name"], 0) + record["wall_s"]
+        line = {"run_id": self.run_id, "recorded_at": datetime.now(timezone.utc).isoformat(), **record}
+        with open(self.report_path, "a") as f:
+            f.write(json.dumps(line, default=str) + "\n")
+
+    def extend(self, records):
+        """Write stage records received from a worker process."""
+        for record in records:
+            self.append(record)
+
+    def finish(self):
+        """
+        Write the run summary line and prune profiles of all but the slowest files.
+
+        Returns:
+            list: Names of the slowest files, slowest first.
+        """
+        slowest = sorted(self.file_seconds, key=self.file_seconds.get, reverse=True)[: self.profile_top_n]
+        if self.profile_dir is not None:
+            for file_name in self.file_seconds:
+                if file_name in slowest:
+                    continue
+                for profile_path in glob.glob(os.path.join(glob.escape(self.profile_dir), f"{glob.escape(file_name)}.*.prof")):
+                    os.remove(profile_path)
+        self.append(
+            {
+                "stage": "run",
+                "parent": None,
+                "file_name": None,
+                "files": len(self.file_seconds),
+                "slowest_files": [{"file_name": name, "wall_s": self.file_seconds[name]} for name in slowest],
+            }
+        )
+        return slowest
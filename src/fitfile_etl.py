@@ -1,24 +1,194 @@
+import argparse
+import contextlib
 import glob
+import hashlib
+import multiprocessing
 import os
+from collections import deque
+from datetime import datetime, timezone
+from concurrent.futures import Future, ProcessPoolExecutor
 
 import polars as pl
+import pyarrow as pa
+import pyarrow.parquet as pq
 from fitparse import FitFile
+from google.api_core.exceptions import NotFound
 from google.cloud import bigquery
 
+try:
+    from src.etl_instrumentation import RunReport, collect_stages, measure_stage, profile_call
+    from src.fit_decoder import (
+        ACTIVITY_MESSAGES,
+        FIT_EMPTY,
+        FIT_VALID,
+        FitUnsupportedError,
+        FitValidationError,
+        convert_raw_messages,
+        iter_record_chunks,
+        read_messages,
+        read_records,
+        validate_fitfile,
+    )
+    from src.job_telemetry import JOB_METRICS_PATH, collect_jobs, record_job
+    from src.ingest_manifest import (
+        MANIFEST_SCHEMA,
+        append_local_manifest,
+        find_changed_files,
+        read_local_manifest,
+        sync_manifest,
+        upload_manifest_entries,
+    )
+    from src.parse_cache import CACHE_MAX_BYTES, clear_cache, hash_file, read_cache, write_cache
+    from src.ride_metrics import (
+        DEFAULT_FTP,
+        METRICS_TABLE,
+        POWER_CURVE_TABLE,
+        compute_power_curve,
+        compute_ride_metrics,
+    )
+    from src.upload_spool import (
+        SPOOL_DIR,
+        drain_spool,
+        get_spool_job_id_prefix,
+        get_spooled_file_hashes,
+        get_spooled_filenames,
+        read_spool_table,
+        upload_spool_entry,
+        write_spool_entry,
+    )
+except ModuleNotFoundError:
+    # Run as a script (python src/fitfile_etl.py): src/ itself is on sys.path
+    from etl_instrumentation import RunReport, collect_stages, measure_stage, profile_call
+    from fit_decoder import (
+        ACTIVITY_MESSAGES,
+        FIT_EMPTY,
+        FIT_VALID,
+        FitUnsupportedError,
+        FitValidationError,
+        convert_raw_messages,
+        iter_record_chunks,
+        read_messages,
+        read_records,
+        validate_fitfile,
+    )
+    from job_telemetry import JOB_METRICS_PATH, collect_jobs, record_job
+    from ingest_manifest import (
+        MANIFEST_SCHEMA,
+        append_local_manifest,
+        find_changed_files,
+        read_local_manifest,
+        sync_manifest,
+        upload_manifest_entries,
+    )
+    from parse_cache import CACHE_MAX_BYTES, clear_cache, hash_file, read_cache, write_cache
+    from ride_metrics import (
+        DEFAULT_FTP,
+        METRICS_TABLE,
+        POWER_CURVE_TABLE,
+        compute_power_curve,
+        compute_ride_metrics,
+    )
+    from upload_spool import (
+        SPOOL_DIR,
+        drain_spool,
+        get_spool_job_id_prefix,
+        get_spooled_file_hashes,
+        get_spooled_filenames,
+        read_spool_table,
+        upload_spool_entry,
+        write_spool_entry,
+    )
+
 ZWIFT_DATA_FOLDER = r"G:\My Drive\projects\zwift\data"
 
+BQ_KEY_PATH = "zwift-data-loader-key.json"
+BQ_DATASET = "zwift_data"
+BQ_TABLE = "fitfile_data"
+BQ_MANIFEST_TABLE = "ingest_manifest"
+
+# Layout of the raw table: one partition per ride date, clustered by file, so
+# queries on a day, a year or a file only scan that slice of the archive. The
+# partitions are UTC dates (DATE(timestamp)) while the dbt models and the dashboard
+# use America/New_York dates, which lag them by 4-5 hours: a filter on a local date
+# range prunes correctly only if it widens the UTC range by a day at its end.
+BQ_TABLE_SCHEMA = [
+    bigquery.SchemaField("file_name", "STRING"),
+    bigquery.SchemaField("timestamp", "TIMESTAMP"),
+    bigquery.SchemaField("heart_rate", "INTEGER"),
+    bigquery.SchemaField("power", "INTEGER"),
+    bigquery.SchemaField("cadence", "INTEGER"),
+    bigquery.SchemaField("speed", "FLOAT"),
+    bigquery.SchemaField("enhanced_speed", "FLOAT"),
+]
+BQ_TABLE_PARTITION_FIELD = "timestamp"
+BQ_TABLE_CLUSTERING_FIELDS = ["file_name"]
+
+# BigQuery tables of the FIT summary messages loaded alongside the records
+SUMMARY_TABLES = {
+    "session": "fitfile_session",
+    "lap": "fitfile_lap",
+    "file_id": "fitfile_file_id",
+    "device_info": "fitfile_device_info",
+}
+
+# Local mirror of the BigQuery ingest manifest table
+MANIFEST_PATH = "ingest_manifest.parquet"
+
+# Subfolder of the data folder where truncated and corrupt FIT files are set aside
+QUARANTINE_FOLDER = "quarantine"
+
+# Columns kept by clean_fitfile (file_name is added in front)
+CLEANED_COLUMNS = ["timestamp", "heart_rate", "power", "cadence", "speed", "enhanced_speed"]
+
+# Narrowest types holding the FIT values of each cleaned column (heart rate and
+# cadence are uint8 fields, power uint16, speeds m/s with millimetre resolution)
+COMPACT_DTYPES = {
+    "file_name": pl.Categorical,
+    "timestamp": pl.Datetime("us"),
+    "heart_rate": pl.UInt8,
+    "power": pl.UInt16,
+    "cadence": pl.UInt8,
+    "speed": pl.Float32,
+    "enhanced_speed": pl.Float32,
+}
+
+# Bump when parsing or cleaning changes the output for the same input file, so
+# parse cache entries written by older code are no longer used
+PARSER_VERSION = 1
+CACHE_VERSION = f"v{PARSER_VERSION}-{hashlib.sha1(','.join(CLEANED_COLUMNS).encode()).hexdigest()[:8]}"
+
+# Number of records per chunk in streaming mode
+STREAM_CHUNK_ROWS = 10_000
 
-def parse_fitfile(fitfile_path):
+# Upper bound on the number of rows sent in a single batched BigQuery load job
+BATCH_MAX_ROWS = 2_000_000
+
+
+def parse_fitfile(fitfile_path, columnar=False, verified=False):
     """
     Parse a FIT file and convert it to a Polars DataFrame.
 
+    The default mode walks every record through fitparse. The columnar mode decodes
+    only the columns used by clean_fitfile straight into typed arrays, which is much
+    faster and lighter on long rides. It falls back to fitparse for files using FIT
+    features the columnar decoder does not handle.
+
     Args:
         fitfile_path (str): Path to the FIT file to be parsed.
+        columnar (bool): Use the columnar decoder instead of fitparse. Defaults to False.
+        verified (bool): The file already passed validate_fitfile, so the columnar decoder
+                         does not check its CRC again. Defaults to False.
 
     Returns:
         polars.DataFrame: DataFrame containing all record messages from the FIT file,
                          with each field as a column. Returns empty DataFrame if no records found.
     """
+    if columnar:
+        try:
+            return read_records(fitfile_path, verified=verified)
+        except FitUnsupportedError:
+            pass
+
     with open(fitfile_path, "rb") as f:
         fitfile = FitFile(f)
         records = []
@@ -34,7 +204,46 @@ def parse_fitfile(fitfile_path):
     return df
 
 
-def clean_fitfile(df, filename):
+def parse_fitfile_messages(fitfile_path, verified=False):
+    """
+    Parse the record, session, lap, file_id and device_info messages of a FIT file in one pass.
+
+    Uses the columnar decoder, falling back to a single fitparse pass for files using
+    FIT features the columnar decoder does not handle. Summary messages get the same
+    columns and types from both decoders.
+
+    Args:
+        fitfile_path (str): Path to the FIT file to be parsed.
+        verified (bool): The file already passed validate_fitfile. Defaults to False.
+
+    Returns:
+        dict: Message name to polars.DataFrame. "record" is as returned by parse_fitfile
+              in columnar mode; the other message types have the columns of their
+              field specs in ACTIVITY_MESSAGES.
+    """
+    try:
+        return read_messages(fitfile_path, ACTIVITY_MESSAGES, verified=verified)
+    except FitUnsupportedError:
+        pass
+
+    records = []
+    summaries = {name: [] for name in ACTIVITY_MESSAGES if name != "record"}
+    with open(fitfile_path, "rb") as f:
+        for message in FitFile(f).get_messages():
+            if message.name == "record":
+                records.append({field.name: field.value for field in message})
+            elif message.name in summaries:
+                # Raw values of the fields stored in the file, not those expanded by fitparse
+                summaries[message.name].append(
+                    {field.def_num: field.raw_value for field in message if field.field_def is not None}
+                )
+    frames = {"record": pl.DataFrame(records) if records else pl.DataFrame([])}
+    for name, messages in summaries.items():
+        frames[name] = pl.from_arrow(convert_raw_messages(messages, ACTIVITY_MESSAGES[name][1]))
+    return frames
+
+
+def clean_fitfile(df, filename, compact=False):
     """
     Clean and filter a FIT file DataFrame to include only relevant columns.
 
@@ -44,18 +253,414 @@ def clean_fitfile(df, filename):
     Args:
         df (polars.DataFrame): Raw DataFrame containing parsed FIT file data.
         filename (str): Name of the source FIT file to be added as a column.
+        compact (bool): Cast the columns to COMPACT_DTYPES. Defaults to False.
 
     Returns:
         polars.DataFrame: Cleaned DataFrame with columns: file_name, timestamp,
                          heart_rate, power, cadence, speed, enhanced_speed.
     """
-    desired_cols = ["timestamp", "heart_rate", "power", "cadence", "speed", "enhanced_speed"]
+    desired_cols = CLEANED_COLUMNS
     cleaned_df = df[desired_cols]
     cleaned_df = cleaned_df.with_columns(pl.lit(filename).alias("file_name"))
     cleaned_df = cleaned_df.select(["file_name"] + desired_cols)
+    if compact:
+        cleaned_df = compact_fitfile(cleaned_df)
     return cleaned_df
 
 
+def compact_fitfile(df):
+    """
+    Cast a cleaned FIT file DataFrame to the narrowest types holding its values.
+
+    Uses COMPACT_DTYPES: 1-byte heart rate and cadence, 2-byte power, 4-byte speeds,
+    a dictionary-encoded file name and microsecond timestamps. This shrinks the frame
+    in memory and the Parquet data uploaded; BigQuery loads the columns with the same
+    INTEGER, FLOAT, STRING and TIMESTAMP types as the full-width ones.
+
+    Args:
+        df (polars.DataFrame): Cleaned DataFrame, as returned by clean_fitfile.
+
+    Returns:
+        polars.DataFrame: The same data with compact column types.
+
+    Raises:
+        polars.exceptions.InvalidOperationError: If a value does not fit its compact type.
+    """
+    return df.with_columns(pl.col(name).cast(dtype) for name, dtype in COMPACT_DTYPES.items() if name in df.columns)
+
+
+def load_fitfile(file_path, cache_dir=None, compact=False, summaries=False):
+    """
+    Parse and clean a single FIT file.
+
+    Runs validate_fitfile, parse_fitfile (columnar mode) and clean_fitfile for one
+    file, catching any error so it can be handled by the caller. Truncated and corrupt
+    files are reported as a FitValidationError without being decoded. Defined at
+    module level so it can be sent to worker processes. With a cache directory,
+    files whose content was already parsed by the same CACHE_VERSION are read back
+    from the Parquet cache instead of being validated and decoded again. The cache
+    holds full-width columns, so compact and full-width runs share it.
+
+    With summaries, the session, lap, file_id and device_info messages are decoded
+    in the same pass as the records (see parse_fitfile_messages). The cache only
+    holds records, so it is written but not read.
+
+    Args:
+        file_path (str): Path to the FIT file to be loaded.
+        cache_dir (str): Path to the parse cache directory. Defaults to None (no cache).
+        compact (bool): Return compact column types (see compact_fitfile). Defaults to False.
+        summaries (bool): Also return the summary messages. Defaults to False.
+
+    Returns:
+        tuple: A tuple containing (cleaned DataFrame or None if the file has no records,
+               exception raised while loading or None). With summaries, the DataFrame is
+               replaced by a dict of message name to DataFrame: the cleaned records under
+               "record", and each summary message type with a file_name column.
+    """
+    filename = os.path.basename(file_path)
+    try:
+        if cache_dir is not None and not summaries:
+            with measure_stage("read_cache", filename) as stage:
+                content_hash = hash_file(file_path)
+                df = read_cache(cache_dir, content_hash, CACHE_VERSION)
+                if df is not None:
+                    stage.update(rows=df.height, bytes=df.estimated_size())
+            if df is not None:
+                df = df.with_columns(pl.lit(filename).alias("file_name"))
+                return (compact_fitfile(df) if compact else df), None
+
+        with measure_stage("validate", filename) as stage:
+            status, reason = validate_fitfile(file_path)
+            stage["bytes"] = os.path.getsize(file_path)
+        if status == FIT_EMPTY:
+            return None, None
+        if status != FIT_VALID:
+            return None, FitValidationError(status, reason)
+
+        with measure_stage("parse", filename) as stage:
+            if summaries:
+                frames = parse_fitfile_messages(file_path, verified=True)
+                df = frames.pop("record")
+            else:
+                df = parse_fitfile(file_path, columnar=True, verified=True)
+            stage.update(rows=len(df), bytes=os.path.getsize(file_path))
+        if len(df) == 0:
+            return None, None
+        with measure_stage("clean", filename) as stage:
+            df = clean_fitfile(df, filename)
+            stage.update(rows=df.height, bytes=df.estimated_size())
+
+        if cache_dir is not None:
+            if summaries:
+                content_hash = hash_file(file_path)
+            with measure_stage("write_cache", filename):
+                write_cache(cache_dir, content_hash, CACHE_VERSION, df, max_bytes=CACHE_MAX_BYTES)
+        if compact:
+            with measure_stage("compact", filename) as stage:
+                df = compact_fitfile(df)
+                stage.update(rows=df.height, bytes=df.estimated_size())
+        if summaries:
+            tables = {
+                name: frame.select(pl.lit(filename).alias("file_name"), pl.all()) for name, frame in frames.items()
+            }
+            return {"record": df, **tables}, None
+        return df, None
+    except Exception as e:
+        return None, e
+
+
+def load_fitfile_measured(file_path, cache_dir=None, profile_path=None, compact=False, summaries=False):
+    """
+    Run load_fitfile and measure its stages, e.g. in a worker process.
+
+    Args:
+        file_path (str): Path to the FIT file to be loaded.
+        cache_dir (str): Path to the parse cache directory. Defaults to None (no cache).
+        profile_path (str): Path of a cProfile dump of the call. Defaults to None (no profiling).
+        compact (bool): Return compact column types (see compact_fitfile). Defaults to False.
+        summaries (bool): Also return the summary messages (see load_fitfile). Defaults to False.
+
+    Returns:
+        tuple: A tuple containing (cleaned DataFrame or None, exception or None,
+               list of stage records).
+    """
+    with collect_stages() as stages:
+        df, error = profile_call(profile_path, load_fitfile, file_path, cache_dir, compact, summaries)
+    return df, error, stages
+
+
+def load_fitfiles(folder_path, filenames, workers=1, cache_dir=None, report=None, compact=False, summaries=False):
+    """
+    Parse and clean several FIT files, optionally in parallel.
+
+    With more than one worker, files are fanned out to a process pool. Results are
+    always yielded in sorted filename order, regardless of which worker finishes first,
+    and at most workers * 2 files are in flight so parsed frames do not pile up while
+    the caller is busy uploading. A failure of the pool itself (e.g. a worker killed
+    by the OS) is reported as the error of each file it affected.
+    Workers are spawned rather than forked, since forking a process that already
+    started Polars' thread pool can deadlock. With a run report, the stages measured
+    in each worker (and the optional profile of each file) are added to the report.
+
+    Args:
+        folder_path (str): Path to the folder containing the FIT files.
+        filenames (iterable): FIT file names (basenames) to load.
+        workers (int): Number of worker processes. Defaults to 1 (no pool).
+        cache_dir (str): Path to the parse cache directory. Defaults to None (no cache).
+        report (RunReport): Run report receiving the stage records. Defaults to None.
+        compact (bool): Return compact column types (see compact_fitfile). Defaults to False.
+        summaries (bool): Also return the summary messages (see load_fitfile). Defaults to False.
+
+    Yields:
+        tuple: A tuple containing (filename, cleaned DataFrame or None, exception or None)
+               for each file, as returned by load_fitfile.
+    """
+    filenames = sorted(filenames)
+    if workers <= 1 or len(filenames) <= 1:
+        for filename in filenames:
+            file_path = os.path.join(folder_path, filename)
+            if report is None:
+                df, error = load_fitfile(file_path, cache_dir=cache_dir, compact=compact, summaries=summaries)
+            else:
+                df, error, stages = load_fitfile_measured(
+                    file_path, cache_dir, report.get_profile_path(filename, "load"), compact, summaries
+                )
+                report.extend(stages)
+            yield filename, df, error
+        return
+
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as executor:
+        in_flight = deque()
+        for filename in filenames:
+            file_path = os.path.join(folder_path, filename)
+            in_flight.append((filename, submit_fitfile(executor, file_path, cache_dir, report, compact, summaries)))
+            if len(in_flight) >= workers * 2:
+                yield collect_fitfile(*in_flight.popleft(), report)
+        while in_flight:
+            yield collect_fitfile(*in_flight.popleft(), report)
+
+
+def submit_fitfile(executor, file_path, cache_dir=None, report=None, compact=False, summaries=False):
+    # Submitting to a broken pool raises immediately; keep the error with the file instead
+    try:
+        if report is None:
+            return executor.submit(load_fitfile, file_path, cache_dir, compact, summaries)
+        profile_path = report.get_profile_path(os.path.basename(file_path), "load")
+        return executor.submit(load_fitfile_measured, file_path, cache_dir, profile_path, compact, summaries)
+    except Exception as e:
+        future = Future()
+        future.set_exception(e)
+        return future
+
+
+def collect_fitfile(filename, future, report=None):
+    try:
+        result = future.result()
+    except Exception as e:
+        return filename, None, e
+    if report is not None:
+        df, error, stages = result
+        report.extend(stages)
+    else:
+        df, error = result
+    return filename, df, error
+
+
+def is_invalid_fitfile_error(error):
+    """
+    Check whether a loading error means the FIT file itself is bad (truncated or corrupt).
+
+    Args:
+        error (Exception): Error raised while loading a FIT file.
+
+    Returns:
+        bool: True if the file should be quarantined.
+    """
+    # Decoders that do not go through validate_fitfile (fitparse) report bad CRCs by message
+    return isinstance(error, FitValidationError) or "CRC Mismatch" in str(error)
+
+
+def quarantine_fitfile(folder_path, filename):
+    """
+    Move a bad FIT file to the quarantine subfolder, out of the ETL's way.
+
+    Args:
+        folder_path (str): Path to the folder containing the FIT file.
+        filename (str): Name of the FIT file.
+
+    Returns:
+        str: New path of the FIT file.
+    """
+    quarantine_path = os.path.join(folder_path, QUARANTINE_FOLDER)
+    os.makedirs(quarantine_path, exist_ok=True)
+    destination = os.path.join(quarantine_path, filename)
+    os.replace(os.path.join(folder_path, filename), destination)
+    return destination
+
+
+def iter_valid_fitfiles(folder_path, results, raise_errors=False):
+    """
+    Filter load_fitfiles results down to the files that can be uploaded.
+
+    Empty files are deleted from the folder, truncated and corrupted files are moved
+    to its quarantine subfolder, and any other loading error is reported, exactly as
+    for a single file.
+
+    Args:
+        folder_path (str): Path to the folder containing the FIT files.
+        results (iterable): (filename, DataFrame or None, exception or None) tuples,
+                            as yielded by load_fitfiles.
+        raise_errors (bool): Raise the other loading errors (e.g. a file that could not
+                             be read yet) instead of reporting them, so the caller can
+                             retry the file. Defaults to False.
+
+    Yields:
+        tuple: A tuple containing (filename, cleaned DataFrame) for each valid file.
+    """
+    for filename, df, error in results:
+        file_path = os.path.join(folder_path, filename)
+        if error is not None:
+            if is_invalid_fitfile_error(error):
+                print(f"Quarantining invalid file: {filename} ({error}).")
+                quarantine_fitfile(folder_path, filename)
+            elif raise_errors:
+                raise error
+            else:
+                print(f"Error processing {filename}: {error}")
+        elif df is None:
+            print(f"Deleting empty file: {filename}.")
+            os.remove(file_path)
+        else:
+            yield filename, df
+
+
+def split_summary_tables(tables):
+    """
+    Split load_fitfile output with summaries into records and summary tables.
+
+    Args:
+        tables (dict): Message name to DataFrame, as returned by load_fitfile with summaries.
+
+    Returns:
+        tuple: A tuple containing (cleaned records DataFrame, dict of BigQuery table name
+               to list of DataFrames, for the summary messages present in the file).
+    """
+    summaries = {
+        SUMMARY_TABLES[name]: [df] for name, df in tables.items() if name in SUMMARY_TABLES and df.height > 0
+    }
+    return tables["record"], summaries
+
+
+def derive_ride_tables(frames, ftp=None, power_curve=False):
+    """
+    Compute the per-ride tables loaded alongside the records.
+
+    All the rides are computed in one pass over their concatenated records.
+
+    Args:
+        frames (list): Cleaned DataFrames of one or more FIT files (full-width or compact).
+        ftp (float): FTP of the ride metrics (see compute_ride_metrics), or None to skip
+                     them. Defaults to None.
+        power_curve (bool): Compute the mean-maximal power curves (see compute_power_curve),
+                            stamped with the load time. Defaults to False.
+
+    Returns:
+        dict: BigQuery table name to list of DataFrames, as taken by spool_and_upload.
+    """
+    tables = {}
+    if ftp is None and not power_curve:
+        return tables
+    # Compact file names are categoricals, which do not concatenate across files
+    records = pl.concat([df.with_columns(pl.col("file_name").cast(pl.String)) for df in frames])
+    if ftp is not None:
+        with measure_stage("metrics") as stage:
+            tables[METRICS_TABLE] = [compute_ride_metrics(records, ftp)]
+            stage["rows"] = records.height
+    if power_curve:
+        with measure_stage("power_curve") as stage:
+            loaded_at = datetime.now(timezone.utc).replace(tzinfo=None)
+            tables[POWER_CURVE_TABLE] = [
+                compute_power_curve(records).with_columns(pl.lit(loaded_at).alias("loaded_at"))
+            ]
+            stage["rows"] = records.height
+    return tables
+
+
+def batch_fitfiles(frames, max_rows=BATCH_MAX_ROWS):
+    """
+    Group cleaned FIT file DataFrames into size-bounded batches.
+
+    A batch is closed as soon as it reaches max_rows rows, so a single large file
+    can exceed the bound but is never split across batches.
+
+    Args:
+        frames (iterable): (filename, polars.DataFrame) tuples.
+        max_rows (int): Row count at which a batch is closed. Defaults to BATCH_MAX_ROWS.
+
+    Yields:
+        list: Lists of (filename, polars.DataFrame) tuples.
+    """
+    batch = []
+    batch_rows = 0
+    for filename, df in frames:
+        batch.append((filename, df))
+        batch_rows += df.height
+        if batch_rows >= max_rows:
+            yield batch
+            batch = []
+            batch_rows = 0
+    if batch:
+        yield batch
+
+
+def stream_fitfile(file_path, chunk_rows=STREAM_CHUNK_ROWS, compact=False):
+    """
+    Parse and clean a FIT file as a stream of fixed-size chunks.
+
+    Streaming variant of parse_fitfile + clean_fitfile: peak memory is bounded by
+    chunk_rows instead of the length of the ride. The file is validated first, then
+    decoded with the columnar decoder on a memory-mapped file, falling back to
+    fitparse (still chunked) for files the columnar decoder does not handle.
+
+    Args:
+        file_path (str): Path to the FIT file to be parsed.
+        chunk_rows (int): Maximum number of records per chunk. Defaults to STREAM_CHUNK_ROWS.
+        compact (bool): Yield compact column types (see compact_fitfile), which also
+                        keeps the schema of fitparse chunks identical. Defaults to False.
+
+    Yields:
+        polars.DataFrame: Cleaned chunks, with the columns returned by clean_fitfile.
+                          Nothing is yielded for a file without records.
+
+    Raises:
+        FitValidationError: If the file is truncated or corrupt, before any chunk is yielded.
+    """
+    filename = os.path.basename(file_path)
+    status, reason = validate_fitfile(file_path)
+    if status == FIT_EMPTY:
+        return
+    if status != FIT_VALID:
+        raise FitValidationError(status, reason)
+    try:
+        # The decoder reads all message headers before yielding, so no chunk precedes the fallback
+        for df in iter_record_chunks(file_path, chunk_rows, verified=True):
+            yield clean_fitfile(df, filename, compact)
+        return
+    except FitUnsupportedError:
+        pass
+
+    with open(file_path, "rb") as f:
+        fitfile = FitFile(f)
+        records = []
+        for record in fitfile.get_messages("record"):
+            records.append({field.name: field.value for field in record})
+            if len(records) == chunk_rows:
+                yield clean_fitfile(pl.DataFrame(records), filename, compact)
+                records = []
+        if records:
+            yield clean_fitfile(pl.DataFrame(records), filename, compact)
+
+
 def get_existing_filenames_from_bigquery(client, dataset, table):
     """
     Retrieve all existing FIT file names from a BigQuery table.
@@ -76,11 +681,107 @@ def get_existing_filenames_from_bigquery(client, dataset, table):
     FROM `{client.project}.{dataset}.{table}`
     WHERE file_name IS NOT NULL
     """
-    result = client.query(query)
-    existing_files = {row.file_name for row in result}
+    job = client.query(query)
+    existing_files = {row.file_name for row in job}
+    record_job(job, "existing_filenames")
     return existing_files
 
 
+def create_raw_table(client, dataset, table):
+    """
+    Create the raw FIT file data table, partitioned by ride date and clustered by file name, if missing.
+
+    An existing table is left as is, even one created by an older version without
+    that layout (see raw_table_needs_rebuild and rebuild_raw_table).
+
+    Args:
+        client (google.cloud.bigquery.Client): BigQuery client instance.
+        dataset (str): Name of the BigQuery dataset.
+        table (str): Name of the raw FIT file data table.
+
+    Returns:
+        bool: True if the table was created, False if it already existed.
+    """
+    table_id = f"{client.project}.{dataset}.{table}"
+    try:
+        client.get_table(table_id)
+        return False
+    except NotFound:
+        pass
+    raw_table = bigquery.Table(table_id, schema=BQ_TABLE_SCHEMA)
+    raw_table.time_partitioning = bigquery.TimePartitioning(
+        type_=bigquery.TimePartitioningType.DAY, field=BQ_TABLE_PARTITION_FIELD
+    )
+    raw_table.clustering_fields = BQ_TABLE_CLUSTERING_FIELDS
+    client.create_table(raw_table, exists_ok=True)
+    return True
+
+
+def raw_table_needs_rebuild(client, dataset, table):
+    """
+    Check whether the raw FIT file data table lacks the partitioning and clustering of create_raw_table.
+
+    Args:
+        client (google.cloud.bigquery.Client): BigQuery client instance.
+        dataset (str): Name of the BigQuery dataset.
+        table (str): Name of the raw FIT file data table.
+
+    Returns:
+        bool: True if the table exists without that layout.
+    """
+    try:
+        existing = client.get_table(f"{client.project}.{dataset}.{table}")
+    except NotFound:
+        return False
+    partitioning = existing.time_partitioning
+    return not (
+        partitioning is not None
+        and partitioning.field == BQ_TABLE_PARTITION_FIELD
+        and existing.clustering_fields == BQ_TABLE_CLUSTERING_FIELDS
+    )
+
+
+def rebuild_raw_table(client, dataset, table):
+    """
+    Rebuild a raw FIT file data table created by an older version with the layout of create_raw_table.
+
+    BigQuery cannot change the partitioning of a table in place, so the table is
+    copied to a partitioned one (one full scan). The copy must hold as many rows as
+    the table, otherwise the rebuild stops before touching it (e.g. when a load ran
+    meanwhile). The old table is then renamed aside, the copy renamed in its place,
+    and the old table only dropped once both renames succeeded: a failure at any
+    step leaves every row in one of the tables.
+
+    Args:
+        client (google.cloud.bigquery.Client): BigQuery client instance.
+        dataset (str): Name of the BigQuery dataset.
+        table (str): Name of the raw FIT file data table.
+
+    Returns:
+        bool: True if the table was rebuilt, False if it did not need to be.
+    """
+    if not raw_table_needs_rebuild(client, dataset, table):
+        return False
+    table_id = f"{client.project}.{dataset}.{table}"
+    rebuilt_table_id = f"{table_id}_partitioned"
+    old_table = f"{table}_unpartitioned"
+    query = f"""
+    CREATE OR REPLACE TABLE `{rebuilt_table_id}`
+    PARTITION BY DATE({BQ_TABLE_PARTITION_FIELD})
+    CLUSTER BY {", ".join(BQ_TABLE_CLUSTERING_FIELDS)}
+    AS SELECT * FROM `{table_id}`;
+    ASSERT (SELECT COUNT(*) FROM `{rebuilt_table_id}`) = (SELECT COUNT(*) FROM `{table_id}`)
+        AS 'The partitioned copy of {table} does not hold all of its rows';
+    ALTER TABLE `{table_id}` RENAME TO `{old_table}`;
+    ALTER TABLE `{rebuilt_table_id}` RENAME TO `{table}`;
+    DROP TABLE `{client.project}.{dataset}.{old_table}`;
+    """
+    job = client.query(query)
+    job.result()
+    record_job(job, "rebuild_raw_table")
+    return True
+
+
 def get_fitfile_names_from_folder(folder_path):
     """
     Get all FIT file names from a specified folder.
@@ -100,16 +801,75 @@ def get_fitfile_names_from_folder(folder_path):
     return filenames
 
 
+def get_bigquery_schema(arrow_schema):
+    """
+    Map an Arrow schema to an explicit BigQuery load schema.
+
+    Timestamps map to TIMESTAMP, integers to INTEGER, floats to FLOAT and strings
+    (including dictionary-encoded strings) to STRING.
+
+    Args:
+        arrow_schema (pyarrow.Schema): Schema of the data to upload.
+
+    Returns:
+        list: google.cloud.bigquery.SchemaField for each column.
+
+    Raises:
+        ValueError: If a column has an Arrow type with no BigQuery mapping.
+    """
+    schema = []
+    for field in arrow_schema:
+        arrow_type = field.type
+        if pa.types.is_dictionary(arrow_type):
+            arrow_type = arrow_type.value_type
+        if pa.types.is_timestamp(arrow_type):
+            field_type = "TIMESTAMP"
+        elif pa.types.is_integer(arrow_type):
+            field_type = "INTEGER"
+        elif pa.types.is_floating(arrow_type):
+            field_type = "FLOAT"
+        elif pa.types.is_string(arrow_type) or pa.types.is_large_string(arrow_type):
+            field_type = "STRING"
+        elif pa.types.is_boolean(arrow_type):
+            field_type = "BOOLEAN"
+        elif pa.types.is_date(arrow_type):
+            field_type = "DATE"
+        else:
+            raise ValueError(f"No BigQuery type for column '{field.name}' of Arrow type {field.type}")
+        schema.append(bigquery.SchemaField(field.name, field_type))
+    return schema
+
+
+def to_upload_table(df):
+    """
+    Convert a DataFrame to the Arrow table sent to BigQuery.
+
+    Naive timestamps (UTC, as produced by the FIT parsers) are marked as UTC so the
+    Parquet file stores them as instants, which BigQuery loads as TIMESTAMP.
+
+    Args:
+        df (polars.DataFrame or pyarrow.Table): Data to upload.
+
+    Returns:
+        pyarrow.Table: Arrow table ready to be written as Parquet.
+    """
+    if isinstance(df, pa.Table):
+        df = pl.from_arrow(df)
+    naive_timestamps = [name for name, dtype in df.schema.items() if dtype == pl.Datetime and dtype.time_zone is None]
+    return df.with_columns(pl.col(naive_timestamps).dt.replace_time_zone("UTC")).to_arrow()
+
+
 def upload_to_bigquery(df, client, dataset, table):
     """
-    Upload a pandas DataFrame to a BigQuery table.
+    Upload a Polars DataFrame or Arrow table to a BigQuery table.
 
-    Loads the provided DataFrame into the specified BigQuery table using
-    the BigQuery client's load_table_from_dataframe method with explicit schema
-    to ensure timestamp column is cast as TIMESTAMP type.
+    Serializes the data to Parquet in memory and loads it with the BigQuery
+    client's load_table_from_file method, skipping any pandas conversion. The
+    explicit schema is mapped from the Arrow types to ensure the timestamp column
+    is cast as TIMESTAMP type.
 
     Args:
-        df (pandas.DataFrame): DataFrame containing the data to upload.
+        df (polars.DataFrame or pyarrow.Table): Data to upload.
         client (google.cloud.bigquery.Client): BigQuery client instance.
         dataset (str): Name of the BigQuery dataset.
         table (str): Name of the BigQuery table.
@@ -119,69 +879,530 @@ def upload_to_bigquery(df, client, dataset, table):
     """
     table_id = f"{client.project}.{dataset}.{table}"
 
-    # Define schema to ensure timestamp is cast as TIMESTAMP type
-    schema = [
-        bigquery.SchemaField("file_name", "STRING"),
-        bigquery.SchemaField("timestamp", "TIMESTAMP"),
-        bigquery.SchemaField("heart_rate", "INTEGER"),
-        bigquery.SchemaField("power", "INTEGER"),
-        bigquery.SchemaField("cadence", "INTEGER"),
-        bigquery.SchemaField("speed", "FLOAT"),
-        bigquery.SchemaField("enhanced_speed", "FLOAT"),
-    ]
-
-    job_config = bigquery.LoadJobConfig(schema=schema)
-    job = client.load_table_from_dataframe(df, table_id, job_config=job_config)
-    job.result()
+    with measure_stage("serialize") as stage:
+        arrow_table = to_upload_table(df)
+        sink = pa.BufferOutputStream()
+        pq.write_table(arrow_table, sink)
+        buffer = sink.getvalue()
+        stage.update(rows=arrow_table.num_rows, bytes=buffer.size)
+
+    with measure_stage("load_job") as stage:
+        job_config = bigquery.LoadJobConfig(
+            schema=get_bigquery_schema(arrow_table.schema), source_format=bigquery.SourceFormat.PARQUET
+        )
+        job = client.load_table_from_file(pa.BufferReader(buffer), table_id, job_config=job_config)
+        job.result()
+        record_job(job, f"load_job:{table}")
+        stage.update(rows=job.output_rows, bytes=buffer.size)
     return job.output_rows, table_id
 
 
-if __name__ == "__main__":
-    print("Loading Zwift .fit files to BigQuery...")
+def find_load_job(client, job_id_prefix):
+    """
+    Find the load job of an earlier attempt at an upload, or the job ID of the next attempt.
+
+    Attempts at the same upload use the job IDs <prefix>_0, <prefix>_1, ... in turn, and
+    a new one only once the job of the previous attempt failed. An attempt whose job was
+    accepted before an error (e.g. a timeout waiting for its result) therefore waits for
+    that job on the next attempt instead of loading the rows a second time.
+
+    Args:
+        client (google.cloud.bigquery.Client): BigQuery client instance.
+        job_id_prefix (str): Job ID prefix of the upload.
+
+    Returns:
+        tuple: (pending, running or successful job, None) when an earlier attempt can be
+               reused, otherwise (None, job ID of the next attempt).
+    """
+    attempt = 0
+    while True:
+        job_id = f"{job_id_prefix}_{attempt}"
+        try:
+            job = client.get_job(job_id)
+        except NotFound:
+            return None, job_id
+        if job.state != "DONE" or job.error_result is None:
+            return job, None
+        attempt += 1
+
+
+def upload_parquet_file_to_bigquery(parquet_path, client, dataset, table, job_id_prefix=None):
+    """
+    Upload a Parquet file, as written from to_upload_table output, to BigQuery in one load job.
+
+    Args:
+        parquet_path (str): Path to the Parquet file.
+        client (google.cloud.bigquery.Client): BigQuery client instance.
+        dataset (str): Name of the BigQuery dataset.
+        table (str): Name of the BigQuery table.
+        job_id_prefix (str): Job ID prefix of the upload, to reuse the load job of an
+                             earlier attempt (see find_load_job). None always submits a
+                             new load job.
+
+    Returns:
+        tuple: A tuple containing (number of rows uploaded, full table ID).
+    """
+    table_id = f"{client.project}.{dataset}.{table}"
+    with measure_stage("load_job") as stage:
+        job, job_id = (None, None) if job_id_prefix is None else find_load_job(client, job_id_prefix)
+        if job is None:
+            job_config = bigquery.LoadJobConfig(
+                schema=get_bigquery_schema(pq.read_schema(parquet_path)), source_format=bigquery.SourceFormat.PARQUET
+            )
+            with open(parquet_path, "rb") as f:
+                job = client.load_table_from_file(f, table_id, job_config=job_config, job_id=job_id)
+        job.result()
+        record_job(job, f"load_job:{table}")
+        stage.update(rows=job.output_rows, bytes=os.path.getsize(parquet_path))
+    return job.output_rows, table_id
+
+
+def upload_spool_file(spool_path, client, dataset, table):
+    """
+    Upload a spool entry to the table it was spooled for.
+
+    The load jobs of an entry have deterministic job IDs, so retrying the upload of an
+    entry whose load job was accepted (in this run or an earlier one) waits for that job
+    rather than appending its rows again.
+
+    Args:
+        spool_path (str): Path to the spool entry.
+        client (google.cloud.bigquery.Client): BigQuery client instance.
+        dataset (str): Name of the BigQuery dataset.
+        table (str): Name of the raw FIT file data table, used for entries without a table.
+
+    Returns:
+        int: Number of rows uploaded.
+    """
+    return upload_parquet_file_to_bigquery(
+        spool_path, client, dataset, read_spool_table(spool_path) or table, get_spool_job_id_prefix(spool_path)
+    )[0]
+
+
+def spool_and_upload(tables, file_hashes, client, dataset, table, spool_dir=SPOOL_DIR, summaries=None):
+    """
+    Write a batch of upload tables to the upload spool, then load it to BigQuery.
+
+    The upload is retried on transient errors; if it still fails, the batch stays
+    in the spool and is loaded by drain_spool at the start of the next run, without
+    parsing the FIT files again. Summary tables are spooled before the records and
+    loaded after them; one that fails to load stays in the spool as well.
 
-    client = bigquery.Client.from_service_account_json("zwift-data-loader-key.json")
-    BQ_DATASET = "zwift_data"
-    BQ_TABLE = "fitfile_data"
+    Args:
+        tables (iterable): pyarrow.Table objects, as returned by to_upload_table.
+        file_hashes (dict): FIT file name to content hash, for the files in the batch.
+        client (google.cloud.bigquery.Client): BigQuery client instance.
+        dataset (str): Name of the BigQuery dataset.
+        table (str): Name of the BigQuery table.
+        spool_dir (str): Path to the spool directory. Defaults to SPOOL_DIR.
+        summaries (dict): BigQuery table name to list of DataFrames of the files in the batch
+                          loaded alongside the records, such as the summary messages returned
+                          by split_summary_tables or the ride metrics. Defaults to None.
+
+    Returns:
+        list: Manifest entries of the uploaded FIT files (empty if there was no table).
+    """
+    with measure_stage("spool") as stage:
+        summary_paths = []
+        for summary_table, frames in (summaries or {}).items():
+            summary_path = write_spool_entry(
+                spool_dir, [to_upload_table(df) for df in frames], file_hashes, table=summary_table
+            )
+            if summary_path is not None:
+                summary_paths.append(summary_path)
+        spool_path = write_spool_entry(spool_dir, tables, file_hashes)
+        if spool_path is not None:
+            stage["bytes"] = os.path.getsize(spool_path)
+
+    def upload_file(path):
+        return upload_spool_file(path, client, dataset, table)
+
+    entries = [] if spool_path is None else upload_spool_entry(spool_path, upload_file)
+    for summary_path in summary_paths:
+        try:
+            upload_spool_entry(summary_path, upload_file)
+        except Exception as e:
+            print(f"Could not load {read_spool_table(summary_path)}, it stays in the upload spool: {e}")
+    return entries
+
+
+def ingest_fitfile(folder_path, filename, client, dataset, table, manifest_table, spool_dir=SPOOL_DIR):
+    """
+    Load one FIT file to BigQuery and record it in the ingest manifest.
+
+    Single-file version of a batch run, used to ingest files as soon as they are
+    saved. Empty files are deleted and invalid ones quarantined, as in a batch run.
+    The data goes through the upload spool, and batches left there by earlier failures are
+    loaded first. A file already listed in the local manifest (by name or content
+    hash) or still waiting in the spool is not loaded again. The manifest entry is
+    written locally first, so it is synced on the next run if the manifest table
+    upload fails.
+
+    Args:
+        folder_path (str): Path to the folder containing the FIT file.
+        filename (str): Name of the FIT file.
+        client (google.cloud.bigquery.Client): BigQuery client instance.
+        dataset (str): Name of the BigQuery dataset.
+        table (str): Name of the raw FIT file data table.
+        manifest_table (str): Name of the ingest manifest table.
+        spool_dir (str): Path to the upload spool directory. Defaults to SPOOL_DIR.
 
-    # Get all FIT files from zwift data folder
-    all_fit_files = get_fitfile_names_from_folder(ZWIFT_DATA_FOLDER)
-    print(f"Found {len(all_fit_files)} FIT files in Google Drive")
+    Returns:
+        int: Number of rows uploaded (0 for an empty or corrupted file, or a file
+             already loaded or spooled).
+
+    Raises:
+        Exception: Any other error loading the file (e.g. a file still locked by its
+                   writer), so it can be retried later.
+    """
+    entries = drain_spool(spool_dir, lambda path: upload_spool_file(path, client, dataset, table))
+    manifest_df = read_local_manifest(MANIFEST_PATH)
+    if entries:
+        manifest_df = append_local_manifest(MANIFEST_PATH, entries)
+    file_hash = hash_file(os.path.join(folder_path, filename))
+    loaded = manifest_df.filter((pl.col("file_name") == filename) | (pl.col("file_hash") == file_hash))
+    spooled_hashes = get_spooled_file_hashes(spool_dir)
+    if not loaded.is_empty():
+        print(f"   Already loaded as '{loaded['file_name'][0]}': {filename}")
+    elif filename in spooled_hashes or file_hash in spooled_hashes.values():
+        print(f"   Already waiting in the upload spool: {filename}")
+    else:
+        results = load_fitfiles(folder_path, [filename])
+        for filename, df in iter_valid_fitfiles(folder_path, results, raise_errors=True):
+            new_entries = spool_and_upload(
+                [to_upload_table(df)], {filename: file_hash}, client, dataset, table, spool_dir
+            )
+            append_local_manifest(MANIFEST_PATH, new_entries)
+            entries.extend(new_entries)
+    if not entries:
+        return 0
 
-    # Get existing filenames from BigQuery
     try:
-        existing_files = get_existing_filenames_from_bigquery(client, BQ_DATASET, BQ_TABLE)
-        print(f"Found {len(existing_files)} FIT files in BigQuery database")
+        upload_manifest_entries(pl.DataFrame(entries, schema=MANIFEST_SCHEMA), client, dataset, manifest_table)
     except Exception as e:
-        print(f"Could not query existing files (table may not exist): {e}")
-        existing_files = set()
+        print(f"Could not update the ingest manifest table, it will be synced on the next run: {e}")
+    return sum(entry["row_count"] for entry in entries if entry["file_name"] == filename)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load Zwift .fit files to BigQuery.")
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Number of processes used to parse FIT files (default: 1).",
+    )
+    parser.add_argument(
+        "--batch",
+        action="store_true",
+        help=f"Upload new files in batched load jobs of up to {BATCH_MAX_ROWS} rows instead of one job per file.",
+    )
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help=(
+            f"Parse and upload each file in chunks of {STREAM_CHUNK_ROWS} records to bound peak memory. "
+            "Files are processed one at a time; --workers, --batch and --cache-dir are ignored."
+        ),
+    )
+    parser.add_argument(
+        "--cache-dir",
+        default=None,
+        help="Directory of the local Parquet parse cache (default: no cache).",
+    )
+    parser.add_argument(
+        "--clear-cache",
+        action="store_true",
+        help="Delete every parse cache entry before loading.",
+    )
+    parser.add_argument(
+        "--verify-hashes",
+        action="store_true",
+        help="Report already loaded files whose content changed since they were loaded.",
+    )
+    parser.add_argument(
+        "--compact-schema",
+        action="store_true",
+        help="Use 1-2 byte integers, 4-byte floats and a dictionary-encoded file name for the uploaded columns.",
+    )
+    parser.add_argument(
+        "--summaries",
+        action="store_true",
+        help=(
+            "Also load the session, lap, file_id and device_info messages, decoded in the same pass as the "
+            f"records, to the {', '.join(SUMMARY_TABLES.values())} tables (ignored with --stream)."
+        ),
+    )
+    parser.add_argument(
+        "--metrics",
+        action="store_true",
+        help=(
+            "Also load the normalized power, IF, TSS, variability index and efficiency factor of each ride "
+            f"to the {METRICS_TABLE} table (ignored with --stream)."
+        ),
+    )
+    parser.add_argument(
+        "--ftp",
+        type=float,
+        default=DEFAULT_FTP,
+        help=f"Functional threshold power in watts used by --metrics (default: {DEFAULT_FTP}).",
+    )
+    parser.add_argument(
+        "--power-curve",
+        action="store_true",
+        help=(
+            f"Also load the mean-maximal power curve of each ride (1s to 60min) to the {POWER_CURVE_TABLE} "
+            "table, merged into power_curve_best by dbt (ignored with --stream)."
+        ),
+    )
+    parser.add_argument(
+        "--spool-dir",
+        default=SPOOL_DIR,
+        help=f"Directory of the upload spool, holding batches waiting to be loaded (default: {SPOOL_DIR}).",
+    )
+    parser.add_argument(
+        "--report",
+        default=None,
+        help="Append wall time, CPU time, rows and bytes of every stage of every file to this JSON-lines file.",
+    )
+    parser.add_argument(
+        "--job-metrics",
+        nargs="?",
+        const=JOB_METRICS_PATH,
+        default=None,
+        help=(
+            "Append the job ID, bytes processed and billed, slot time and wall time of every "
+            f"BigQuery job to this JSON-lines file (default when given without a path: {JOB_METRICS_PATH})."
+        ),
+    )
+    parser.add_argument(
+        "--rebuild-raw-table",
+        action="store_true",
+        help=(
+            f"Rebuild a {BQ_TABLE} table created without partitioning by ride date (one full scan of it). "
+            "Run it while nothing else loads into the table."
+        ),
+    )
+    parser.add_argument(
+        "--profile-dir",
+        default=None,
+        help="Write cProfile dumps of the slowest files to this directory (requires --report).",
+    )
+    parser.add_argument(
+        "--profile-top",
+        type=int,
+        default=5,
+        help="Number of slowest files whose profiles are kept with --profile-dir (default: 5).",
+    )
+    args = parser.parse_args()
+    if args.profile_dir is not None and args.report is None:
+        parser.error("--profile-dir requires --report")
+    if args.ftp <= 0:
+        parser.error("--ftp must be positive")
+    ftp = args.ftp if args.metrics else None
+
+    print("Loading Zwift .fit files to BigQuery...")
 
-    # Find new files to process
-    new_files = all_fit_files - existing_files
-    print(f"Found {len(new_files)} new file(s) to load")
+    report = None
+    if args.report is not None:
+        report = RunReport(args.report, profile_dir=args.profile_dir, profile_top_n=args.profile_top)
 
-    if new_files:
-        total_rows_uploaded = 0
-        for filename in new_files:
-            file_path = os.path.join(ZWIFT_DATA_FOLDER, filename)
+    with (
+        collect_stages(report) if report is not None else contextlib.nullcontext(),
+        collect_jobs(args.job_metrics) if args.job_metrics is not None else contextlib.nullcontext(),
+    ):
+        if args.cache_dir is not None:
+            if args.clear_cache:
+                deleted = clear_cache(args.cache_dir)
+            else:
+                # Entries written by an older parser or column set can never be hit again
+                deleted = clear_cache(args.cache_dir, keep_version=CACHE_VERSION)
+            if deleted:
+                print(f"Deleted {deleted} parse cache entries")
 
+        client = bigquery.Client.from_service_account_json(BQ_KEY_PATH)
+
+        with measure_stage("create_raw_table"):
+            if create_raw_table(client, BQ_DATASET, BQ_TABLE):
+                print(f"Created {BQ_TABLE} partitioned by ride date and clustered by file name")
+            elif args.rebuild_raw_table:
+                if rebuild_raw_table(client, BQ_DATASET, BQ_TABLE):
+                    print(f"Rebuilt {BQ_TABLE} partitioned by ride date and clustered by file name")
+            elif raw_table_needs_rebuild(client, BQ_DATASET, BQ_TABLE):
+                print(f"{BQ_TABLE} is not partitioned by ride date: rebuild it once with --rebuild-raw-table")
+
+        # Load the batches an earlier run could not upload, before looking for new files
+        with measure_stage("drain_spool") as stage:
+            spooled_entries = drain_spool(args.spool_dir, lambda path: upload_spool_file(path, client, BQ_DATASET, BQ_TABLE))
+            stage["rows"] = sum(entry["row_count"] for entry in spooled_entries)
+        if spooled_entries:
+            # Recorded locally, so sync_manifest pushes them to the manifest table
+            append_local_manifest(MANIFEST_PATH, spooled_entries)
+            print(f"Loaded {len(spooled_entries)} file(s) left in the upload spool by an earlier run")
+
+        # Get all FIT files from zwift data folder
+        with measure_stage("scan_folder") as stage:
+            all_fit_files = get_fitfile_names_from_folder(ZWIFT_DATA_FOLDER)
+            stage["rows"] = len(all_fit_files)
+        print(f"Found {len(all_fit_files)} FIT files in Google Drive")
+
+        # Get existing filenames from the ingest manifest, or from the raw table if it is unavailable
+        try:
+            with measure_stage("sync_manifest") as stage:
+                manifest_df = sync_manifest(client, BQ_DATASET, BQ_MANIFEST_TABLE, BQ_TABLE, MANIFEST_PATH)
+                stage["rows"] = manifest_df.height
+            existing_files = set(manifest_df["file_name"])
+            print(f"Found {len(existing_files)} FIT files in the ingest manifest")
+            if args.verify_hashes:
+                for filename in find_changed_files(manifest_df, ZWIFT_DATA_FOLDER):
+                    print(f"   Warning: '{filename}' changed since it was loaded.")
+        except Exception as e:
+            print(f"Could not read the ingest manifest, scanning the raw table instead: {e}")
             try:
-                df = parse_fitfile(file_path)
-                if len(df) > 0:
-                    df = clean_fitfile(df, filename)
-                    pandas_df = df.to_pandas()
-                    output_rows, table_id = upload_to_bigquery(pandas_df, client, BQ_DATASET, BQ_TABLE)
-                    total_rows_uploaded += output_rows
-                    print(f"   Processed '{filename}' successfully ({output_rows} rows).")
-                else:
-                    print(f"Deleting empty file: {filename}.")
-                    os.remove(file_path)
+                with measure_stage("scan_existing_files") as stage:
+                    existing_files = get_existing_filenames_from_bigquery(client, BQ_DATASET, BQ_TABLE)
+                    stage["rows"] = len(existing_files)
+                print(f"Found {len(existing_files)} FIT files in BigQuery database")
             except Exception as e:
-                if "CRC Mismatch" in str(e):
-                    print(f"Deleting corrupted file: {filename}.")
-                    os.remove(file_path)
-                else:
-                    print(f"Error processing {filename}: {e}")
+                print(f"Could not query existing files (table may not exist): {e}")
+                existing_files = set()
+
+        # Find new files to process; files still waiting in the spool are already parsed
+        spooled_files = get_spooled_filenames(args.spool_dir)
+        if spooled_files:
+            print(f"{len(spooled_files)} file(s) still waiting in the upload spool")
+        new_files = all_fit_files - existing_files - spooled_files
+        print(f"Found {len(new_files)} new file(s) to load")
+
+        if new_files:
+            total_rows_uploaded = 0
+            manifest_entries = []
+            if args.stream:
+                for filename in sorted(new_files):
+                    file_path = os.path.join(ZWIFT_DATA_FOLDER, filename)
+                    try:
+                        tables = (to_upload_table(df) for df in stream_fitfile(file_path, compact=args.compact_schema))
+                        with measure_stage("stream_upload", filename) as stage:
+                            entries = profile_call(
+                                report and report.get_profile_path(filename, "stream_upload"),
+                                spool_and_upload,
+                                tables,
+                                {filename: hash_file(file_path)},
+                                client,
+                                BQ_DATASET,
+                                BQ_TABLE,
+                                args.spool_dir,
+                            )
+                            stage.update(rows=sum(entry["row_count"] for entry in entries), bytes=os.path.getsize(file_path))
+                        if entries:
+                            total_rows_uploaded += entries[0]["row_count"]
+                            print(f"   Processed '{filename}' successfully ({entries[0]['row_count']} rows).")
+                            append_local_manifest(MANIFEST_PATH, entries)
+                            manifest_entries.extend(entries)
+                        else:
+                            print(f"Deleting empty file: {filename}.")
+                            os.remove(file_path)
+                    except Exception as e:
+                        if is_invalid_fitfile_error(e):
+                            print(f"Quarantining invalid file: {filename} ({e}).")
+                            quarantine_fitfile(ZWIFT_DATA_FOLDER, filename)
+                        else:
+                            print(f"Error processing {filename}: {e}")
+            elif args.batch:
+                results = load_fitfiles(
+                    ZWIFT_DATA_FOLDER,
+                    new_files,
+                    workers=args.workers,
+                    cache_dir=args.cache_dir,
+                    report=report,
+                    compact=args.compact_schema,
+                    summaries=args.summaries,
+                )
+                valid_files = iter_valid_fitfiles(ZWIFT_DATA_FOLDER, results)
+                # Summary tables wait here until the batch holding their file's records is uploaded
+                file_summaries = {}
+                if args.summaries:
+                    valid_files = (
+                        (filename, file_summaries.setdefault(filename, split_summary_tables(tables))[0])
+                        for filename, tables in valid_files
+                    )
+                for batch in batch_fitfiles(valid_files):
+                    try:
+                        # A batch load job is shared by several files, so it is reported without a file name
+                        with measure_stage("upload_batch") as stage:
+                            file_hashes = {
+                                filename: hash_file(os.path.join(ZWIFT_DATA_FOLDER, filename)) for filename, _ in batch
+                            }
+                            summaries = {}
+                            for filename, _ in batch:
+                                for summary_table, frames in file_summaries.pop(filename, (None, {}))[1].items():
+                                    summaries.setdefault(summary_table, []).extend(frames)
+                            summaries.update(
+                                derive_ride_tables([df for _, df in batch], ftp, args.power_curve)
+                            )
+                            tables = (to_upload_table(df) for _, df in batch)
+                            entries = spool_and_upload(
+                                tables, file_hashes, client, BQ_DATASET, BQ_TABLE, args.spool_dir, summaries
+                            )
+                            stage["rows"] = sum(entry["row_count"] for entry in entries)
+                        for entry in entries:
+                            total_rows_uploaded += entry["row_count"]
+                            print(f"   Processed '{entry['file_name']}' successfully ({entry['row_count']} rows).")
+                        append_local_manifest(MANIFEST_PATH, entries)
+                        manifest_entries.extend(entries)
+                    except Exception as e:
+                        for filename, _ in batch:
+                            print(f"Error processing {filename}: {e}")
+            else:
+                results = load_fitfiles(
+                    ZWIFT_DATA_FOLDER,
+                    new_files,
+                    workers=args.workers,
+                    cache_dir=args.cache_dir,
+                    report=report,
+                    compact=args.compact_schema,
+                    summaries=args.summaries,
+                )
+                for filename, df in iter_valid_fitfiles(ZWIFT_DATA_FOLDER, results):
+                    summaries = {}
+                    if args.summaries:
+                        df, summaries = split_summary_tables(df)
+                    try:
+                        with measure_stage("upload", filename) as stage:
+                            summaries.update(derive_ride_tables([df], ftp, args.power_curve))
+                            entries = profile_call(
+                                report and report.get_profile_path(filename, "upload"),
+                                spool_and_upload,
+                                [to_upload_table(df)],
+                                {filename: hash_file(os.path.join(ZWIFT_DATA_FOLDER, filename))},
+                                client,
+                                BQ_DATASET,
+                                BQ_TABLE,
+                                args.spool_dir,
+                                summaries,
+                            )
+                            stage["rows"] = entries[0]["row_count"]
+                        total_rows_uploaded += entries[0]["row_count"]
+                        print(f"   Processed '{filename}' successfully ({entries[0]['row_count']} rows).")
+                        append_local_manifest(MANIFEST_PATH, entries)
+                        manifest_entries.extend(entries)
+                    except Exception as e:
+                        print(f"Error processing {filename}: {e}")
+
+            print(f"Total: Loaded {total_rows_uploaded} rows from {len(new_files)} files")
+
+            if manifest_entries:
+                try:
+                    manifest_df = pl.DataFrame(manifest_entries, schema=MANIFEST_SCHEMA)
+                    with measure_stage("upload_manifest") as stage:
+                        stage["rows"] = upload_manifest_entries(manifest_df, client, BQ_DATASET, BQ_MANIFEST_TABLE)
+                except Exception as e:
+                    print(f"Could not update the ingest manifest table, it will be synced on the next run: {e}")
 
-        print(f"Total: Loaded {total_rows_uploaded} rows from {len(new_files)} files")
+        if report is not None:
+            slowest = report.finish()
+            print(f"Run report written to {args.report} (slowest files: {', '.join(slowest) or 'none'})")
+        if args.job_metrics is not None:
+            print(f"Job metrics appended to {args.job_metrics} (summary: python src/job_telemetry.py {args.job_metrics})")
 
 print("--------------------------------")
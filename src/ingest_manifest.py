@@ -0,0 +1,255 @@
+"""
+Ingest manifest of the FIT files loaded to BigQuery.
+
+One row per loaded file (name, content hash, row count, time range and load
+timestamp), kept in a small BigQuery table and mirrored by a local Parquet file.
+Looking up already loaded files reads this table instead of scanning every row
+of the raw fitfile_data table. The local file is written right after each
+upload, so entries survive a failure before the end-of-run BigQuery sync and are
+pushed on the next run.
+"""
+
+import os
+from datetime import datetime, timezone
+
+import polars as pl
+from google.api_core.exceptions import NotFound
+from google.cloud import bigquery
+
+try:
+    from src.job_telemetry import record_job
+    from src.parse_cache import hash_file
+except ModuleNotFoundError:
+    # Imported from a script run (python src/fitfile_etl.py): src/ itself is on sys.path
+    from job_telemetry import record_job
+    from parse_cache import hash_file
+
+MANIFEST_SCHEMA = {
+    "file_name": pl.String,
+    "file_hash": pl.String,
+    "row_count": pl.Int64,
+    "start_time": pl.Datetime("us"),
+    "end_time": pl.Datetime("us"),
+    "loaded_at": pl.Datetime("us"),
+}
+
+MANIFEST_BQ_SCHEMA = [
+    bigquery.SchemaField("file_name", "STRING"),
+    bigquery.SchemaField("file_hash", "STRING"),
+    bigquery.SchemaField("row_count", "INTEGER"),
+    bigquery.SchemaField("start_time", "TIMESTAMP"),
+    bigquery.SchemaField("end_time", "TIMESTAMP"),
+    bigquery.SchemaField("loaded_at", "TIMESTAMP"),
+]
+
+
+def build_manifest_entry(filename, file_hash, row_count, start_time, end_time):
+    """
+    Build the manifest entry of a loaded FIT file.
+
+    Args:
+        filename (str): Name of the FIT file.
+        file_hash (str): Hash of the FIT file content.
+        row_count (int): Number of rows uploaded for the file.
+        start_time (datetime.datetime): First record timestamp of the file.
+        end_time (datetime.datetime): Last record timestamp of the file.
+
+    Returns:
+        dict: Manifest entry with the columns of MANIFEST_SCHEMA.
+    """
+    return {
+        "file_name": filename,
+        "file_hash": file_hash,
+        "row_count": row_count,
+        "start_time": start_time,
+        "end_time": end_time,
+        "loaded_at": datetime.now(timezone.utc).replace(tzinfo=None),
+    }
+
+
+def read_local_manifest(manifest_path):
+    """
+    Read the local manifest file.
+
+    Args:
+        manifest_path (str): Path to the local manifest Parquet file.
+
+    Returns:
+        polars.DataFrame: Manifest entries, empty if the file does not exist yet.
+    """
+    if not os.path.exists(manifest_path):
+        return pl.DataFrame(schema=MANIFEST_SCHEMA)
+    return pl.read_parquet(manifest_path).cast(MANIFEST_SCHEMA)
+
+
+def write_local_manifest(manifest_path, manifest_df):
+    """
+    Atomically replace the local manifest file.
+
+    Args:
+        manifest_path (str): Path to the local manifest Parquet file.
+        manifest_df (polars.DataFrame): Manifest entries to write.
+    """
+    tmp_path = f"{manifest_path}.tmp"
+    manifest_df.write_parquet(tmp_path)
+    os.replace(tmp_path, manifest_path)
+
+
+def append_local_manifest(manifest_path, entries):
+    """
+    Add entries to the local manifest file, replacing older entries of the same files.
+
+    Args:
+        manifest_path (str): Path to the local manifest Parquet file.
+        entries (list): Manifest entries, as returned by build_manifest_entry.
+
+    Returns:
+        polars.DataFrame: The updated manifest.
+    """
+    new_df = pl.DataFrame(entries, schema=MANIFEST_SCHEMA)
+    manifest_df = pl.concat([read_local_manifest(manifest_path), new_df])
+    manifest_df = manifest_df.unique(subset="file_name", keep="last", maintain_order=True)
+    write_local_manifest(manifest_path, manifest_df)
+    return manifest_df
+
+
+def get_manifest_from_bigquery(client, dataset, table):
+    """
+    Read every entry of the BigQuery manifest table.
+
+    Args:
+        client (google.cloud.bigquery.Client): BigQuery client instance.
+        dataset (str): Name of the BigQuery dataset.
+        table (str): Name of the manifest table.
+
+    Returns:
+        polars.DataFrame: Manifest entries.
+    """
+    query = f"""
+    SELECT file_name, file_hash, row_count, start_time, end_time, loaded_at
+    FROM `{client.project}.{dataset}.{table}`
+    """
+    job = client.query(query)
+    manifest_df = pl.from_arrow(job.to_arrow())
+    record_job(job, "read_manifest")
+    return manifest_df.with_columns(pl.col(pl.Datetime).dt.replace_time_zone(None)).cast(MANIFEST_SCHEMA)
+
+
+def create_manifest_table(client, dataset, table, raw_table):
+    """
+    Create the BigQuery manifest table, backfilled from the raw FIT file table.
+
+    The backfill is the only full scan of the raw table; it runs once, when the
+    manifest table does not exist yet. Backfilled entries have no file hash.
+
+    Args:
+        client (google.cloud.bigquery.Client): BigQuery client instance.
+        dataset (str): Name of the BigQuery dataset.
+        table (str): Name of the manifest table.
+        raw_table (str): Name of the raw FIT file data table.
+    """
+    table_id = f"{client.project}.{dataset}.{table}"
+    raw_table_id = f"{client.project}.{dataset}.{raw_table}"
+    try:
+        client.get_table(raw_table_id)
+    except NotFound:
+        client.create_table(bigquery.Table(table_id, schema=MANIFEST_BQ_SCHEMA), exists_ok=True)
+        return
+
+    query = f"""
+    CREATE TABLE IF NOT EXISTS `{table_id}` AS
+    SELECT
+        file_name,
+        CAST(NULL AS STRING) AS file_hash,
+        COUNT(*) AS row_count,
+        MIN(timestamp) AS start_time,
+        MAX(timestamp) AS end_time,
+        CURRENT_TIMESTAMP() AS loaded_at
+    FROM `{raw_table_id}`
+    WHERE file_name IS NOT NULL
+    GROUP BY file_name
+    """
+    job = client.query(query)
+    job.result()
+    record_job(job, "backfill_manifest")
+
+
+def upload_manifest_entries(manifest_df, client, dataset, table):
+    """
+    Append manifest entries to the BigQuery manifest table.
+
+    Args:
+        manifest_df (polars.DataFrame): Manifest entries to upload.
+        client (google.cloud.bigquery.Client): BigQuery client instance.
+        dataset (str): Name of the BigQuery dataset.
+        table (str): Name of the manifest table.
+
+    Returns:
+        int: Number of entries uploaded.
+    """
+    table_id = f"{client.project}.{dataset}.{table}"
+    rows = manifest_df.with_columns(pl.col(pl.Datetime).dt.strftime("%Y-%m-%dT%H:%M:%S%.6f")).to_dicts()
+    job_config = bigquery.LoadJobConfig(schema=MANIFEST_BQ_SCHEMA)
+    job = client.load_table_from_json(rows, table_id, job_config=job_config)
+    job.result()
+    record_job(job, f"load_job:{table}")
+    return job.output_rows
+
+
+def sync_manifest(client, dataset, table, raw_table, manifest_path):
+    """
+    Reconcile the BigQuery manifest table and the local manifest file.
+
+    Local entries missing from BigQuery (e.g. written by a run that failed before
+    its end-of-run sync) are uploaded, then the local file is rewritten as a
+    mirror of the combined manifest. The BigQuery table is created and backfilled
+    from the raw table if it does not exist yet.
+
+    Args:
+        client (google.cloud.bigquery.Client): BigQuery client instance.
+        dataset (str): Name of the BigQuery dataset.
+        table (str): Name of the manifest table.
+        raw_table (str): Name of the raw FIT file data table.
+        manifest_path (str): Path to the local manifest Parquet file.
+
+    Returns:
+        polars.DataFrame: The combined manifest.
+    """
+    try:
+        remote_df = get_manifest_from_bigquery(client, dataset, table)
+    except NotFound:
+        create_manifest_table(client, dataset, table, raw_table)
+        remote_df = get_manifest_from_bigquery(client, dataset, table)
+
+    local_df = read_local_manifest(manifest_path)
+    missing_df = local_df.join(remote_df.select("file_name"), on="file_name", how="anti")
+    if missing_df.height > 0:
+        upload_manifest_entries(missing_df, client, dataset, table)
+
+    manifest_df = pl.concat([remote_df, missing_df]).unique(subset="file_name", keep="last", maintain_order=True)
+    write_local_manifest(manifest_path, manifest_df)
+    return manifest_df
+
+
+def find_changed_files(manifest_df, folder_path):
+    """
+    Find loaded FIT files whose content changed since they were loaded.
+
+    Entries without a hash (backfilled from the raw table) and files no longer in
+    the folder are skipped.
+
+    Args:
+        manifest_df (polars.DataFrame): Manifest entries.
+        folder_path (str): Path to the folder containing the FIT files.
+
+    Returns:
+        list: Sorted names of the files whose current hash differs from the manifest.
+    """
+    changed = []
+    for filename, file_hash in manifest_df.select("file_name", "file_hash").iter_rows():
+        file_path = os.path.join(folder_path, filename)
+        if file_hash is None or not os.path.exists(file_path):
+            continue
+        if hash_file(file_path) != file_hash:
+            changed.append(filename)
+    return sorted(changed)
@@ -0,0 +1,188 @@
+"""
+Cost telemetry of the warehouse jobs issued by the ETL, dbt and the dashboard.
+
+Every BigQuery job (queries, load jobs, dbt model builds) is recorded with its
+job ID, bytes processed, bytes billed, slot time and wall time, labelled with
+what issued it (e.g. "load_job:fitfile_data", "dbt:training", or the name of a
+dashboard query such as "training_metrics").
+Local DuckDB queries are recorded with their wall time only. Records are
+appended as JSON lines to a local metrics store, summarized per label by
+summarize_jobs.
+
+Recording is off unless a store is set: with the ZWIFT_JOB_METRICS environment
+variable (e.g. for the dashboard), or with collect_jobs.
+
+Usage (summary of the recorded jobs, most expensive first):
+    poetry run python src/job_telemetry.py warehouse_jobs.jsonl
+Usage (record a dbt run made outside the project, then summarize):
+    poetry run python src/job_telemetry.py warehouse_jobs.jsonl --dbt-run-results target/run_results.json
+"""
+
+import argparse
+import json
+import os
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+import polars as pl
+
+# Environment variable holding the path of the metrics store
+JOB_METRICS_ENV_VAR = "ZWIFT_JOB_METRICS"
+
+# Default path of the metrics store of the command line tools
+JOB_METRICS_PATH = "warehouse_jobs.jsonl"
+
+# Where job records are appended; None when recording is off
+_store_path = os.environ.get(JOB_METRICS_ENV_VAR) or None
+
+
+@contextmanager
+def collect_jobs(store_path):
+    """
+    Record the warehouse jobs issued in this process to a metrics store.
+
+    Args:
+        store_path (str): Path of the JSON-lines metrics store. None turns recording off.
+
+    Yields:
+        str: The path of the metrics store.
+    """
+    global _store_path
+    previous_path = _store_path
+    _store_path = store_path
+    try:
+        yield store_path
+    finally:
+        _store_path = previous_path
+
+
+def append_job_record(record):
+    """
+    Append one job record to the active metrics store, if any.
+
+    Args:
+        record (dict): Job record; label and backend are expected, missing
+                       measurements are left null.
+    """
+    if _store_path is None:
+        return
+    line = {"recorded_at": datetime.now(timezone.utc).isoformat(), **record}
+    with open(_store_path, "a") as f:
+        f.write(json.dumps(line, default=str) + "\n")
+
+
+def record_job(job, label):
+    """
+    Record a finished BigQuery job.
+
+    Query jobs report bytes processed and billed; load jobs report the bytes of
+    their input files as bytes processed and bill nothing. Wall time runs from
+    the job creation (so it includes queueing) to its end.
+
+    Args:
+        job (google.cloud.bigquery.job.QueryJob or LoadJob): Finished job.
+        label (str): What issued the job.
+    """
+    if _store_path is None:
+        return
+    wall_s = None
+    if job.created is not None and job.ended is not None:
+        wall_s = (job.ended - job.created).total_seconds()
+    bytes_processed = getattr(job, "total_bytes_processed", None)
+    if bytes_processed is None:
+        bytes_processed = getattr(job, "input_file_bytes", None)
+    append_job_record(
+        {
+            "label": label,
+            "backend": "bigquery",
+            "job_id": job.job_id,
+            "job_type": job.job_type,
+            "bytes_processed": bytes_processed,
+            "bytes_billed": getattr(job, "total_bytes_billed", None),
+            "slot_ms": getattr(job, "slot_millis", None),
+            "wall_s": wall_s,
+            "cache_hit": getattr(job, "cache_hit", None),
+        }
+    )
+
+
+def record_dbt_run_results(run_results_path):
+    """
+    Record the model builds of a dbt run from its run_results.json artifact.
+
+    Args:
+        run_results_path (str): Path of the artifact (target/run_results.json).
+
+    Returns:
+        int: Number of recorded model builds (0 when recording is off).
+    """
+    if _store_path is None:
+        return 0
+    with open(run_results_path) as f:
+        results = json.load(f)["results"]
+    for result in results:
+        response = result.get("adapter_response") or {}
+        append_job_record(
+            {
+                "label": f"dbt:{result['unique_id'].split('.')[-1]}",
+                "backend": "bigquery",
+                "job_id": response.get("job_id"),
+                "job_type": "dbt",
+                "bytes_processed": response.get("bytes_processed"),
+                "bytes_billed": response.get("bytes_billed"),
+                "slot_ms": response.get("slot_ms"),
+                "wall_s": result.get("execution_time"),
+                "status": result.get("status"),
+            }
+        )
+    return len(results)
+
+
+def summarize_jobs(store_path):
+    """
+    Summarize the recorded jobs per label, most billed first.
+
+    Args:
+        store_path (str): Path of the JSON-lines metrics store.
+
+    Returns:
+        polars.DataFrame: One row per label and backend with columns: label, backend,
+                         jobs, bytes_processed, bytes_billed, slot_s (totals), avg_wall_s,
+                         max_wall_s.
+    """
+    schema = {
+        "label": pl.String,
+        "backend": pl.String,
+        "bytes_processed": pl.Int64,
+        "bytes_billed": pl.Int64,
+        "slot_ms": pl.Int64,
+        "wall_s": pl.Float64,
+    }
+    jobs = pl.read_ndjson(store_path, schema=schema) if os.path.exists(store_path) else pl.DataFrame(schema=schema)
+    return (
+        jobs.group_by("label", "backend")
+        .agg(
+            pl.len().alias("jobs"),
+            pl.col("bytes_processed").sum(),
+            pl.col("bytes_billed").sum(),
+            (pl.col("slot_ms").sum() / 1000).alias("slot_s"),
+            pl.col("wall_s").mean().alias("avg_wall_s"),
+            pl.col("wall_s").max().alias("max_wall_s"),
+        )
+        .sort(["bytes_billed", "bytes_processed", "label"], descending=[True, True, False], nulls_last=True)
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Summarize the cost of the recorded warehouse jobs.")
+    parser.add_argument(
+        "store_path", nargs="?", default=JOB_METRICS_PATH, help=f"Metrics store (default: {JOB_METRICS_PATH})."
+    )
+    parser.add_argument("--dbt-run-results", default=None, help="Record the model builds of this dbt run_results.json first.")
+    args = parser.parse_args()
+
+    if args.dbt_run_results is not None:
+        with collect_jobs(args.store_path):
+            print(f"Recorded {record_dbt_run_results(args.dbt_run_results)} dbt model builds")
+    with pl.Config(tbl_rows=-1, tbl_cols=-1, tbl_width_chars=200):
+        print(summarize_jobs(args.store_path))
@@ -1,37 +1,223 @@
+"""
+Move finished Zwift activity files to the Google Drive data folder.
+
+Each file is copied to a temporary name next to its destination, the copy is
+hash-verified against the source, renamed into place atomically and only then
+removed from the source, so an interrupted or corrupted transfer never leaves a
+half-written .fit file in the data folder. Files already at the destination
+with the same content are not copied again. With several workers, files are
+transferred in parallel by a bounded thread pool, since the time is spent
+waiting on the synced drive rather than in Python.
+"""
+
+import argparse
 import os
 import shutil
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    from src.ingest_manifest import read_local_manifest
+    from src.parse_cache import hash_file
+except ModuleNotFoundError:
+    # Run as a script (python src/move_zwift_files.py): src/ itself is on sys.path
+    from ingest_manifest import read_local_manifest
+    from parse_cache import hash_file
 
 # Define source and destination folders
-source_folder = r"C:\Users\aucla\OneDrive\Documents\Zwift\Activities"
-destination_folder = r"G:\My Drive\projects\zwift\data"
+SOURCE_FOLDER = r"C:\Users\aucla\OneDrive\Documents\Zwift\Activities"
+DESTINATION_FOLDER = r"G:\My Drive\projects\zwift\data"
 
-print("Moving Zwift .fit files to Google Drive...")
+# Activity Zwift is still recording; it is renamed to its final name when the ride is saved
+IN_PROGRESS_FILENAME = "inProgressActivity.fit"
 
-# Ensure destination exists
-os.makedirs(destination_folder, exist_ok=True)
+# Local mirror of the ingest manifest, whose hashes describe the files already in the data folder
+MANIFEST_PATH = "ingest_manifest.parquet"
 
-# Count files to process
-files_to_process = []
-for filename in os.listdir(source_folder):
-    if filename == "inProgressActivity.fit":
-        continue  # Skip this file
-    src_file = os.path.join(source_folder, filename)
-    if os.path.isfile(src_file):
-        files_to_process.append(filename)
 
-number_of_files = len(files_to_process)
-if number_of_files > 0:
-    print(f"Found {number_of_files} files to move.")
+class TransferError(Exception):
+    """Raised when the copy of a file does not match its source."""
+
 
-    # Move all files from source to destination
-    for filename in files_to_process:
+def get_files_to_move(source_folder):
+    """
+    List the finished activity files of the Zwift activities folder.
+
+    Args:
+        source_folder (str): Path to the Zwift activities folder.
+
+    Returns:
+        list: Names of the files to move, skipping the in-progress activity.
+    """
+    files_to_process = []
+    for filename in os.listdir(source_folder):
+        if filename == IN_PROGRESS_FILENAME:
+            continue  # Skip this file
         src_file = os.path.join(source_folder, filename)
-        dst_file = os.path.join(destination_folder, filename)
-        shutil.move(src_file, dst_file)
-        print(f"   Moved: {filename}")
+        if os.path.isfile(src_file):
+            files_to_process.append(filename)
+    return files_to_process
+
+
+def get_known_hashes(manifest_path=MANIFEST_PATH):
+    """
+    Read the content hashes of the files already loaded, from the local ingest manifest.
+
+    Args:
+        manifest_path (str): Path to the local manifest Parquet file. Defaults to MANIFEST_PATH.
+
+    Returns:
+        dict: File name to content hash, for the entries that have one.
+    """
+    manifest_df = read_local_manifest(manifest_path)
+    return {
+        filename: file_hash
+        for filename, file_hash in manifest_df.select("file_name", "file_hash").iter_rows()
+        if file_hash is not None
+    }
+
+
+def is_already_transferred(src_file, dst_file, source_hash, known_hash=None):
+    """
+    Check whether the destination already holds the content of the source file.
+
+    A known hash of the destination (from the ingest manifest) is trusted as is; a
+    destination of a different size cannot match; only a same-size destination
+    with no known hash is read back and hashed.
+
+    Args:
+        src_file (str): Path to the source file.
+        dst_file (str): Path to the destination file.
+        source_hash (str): Content hash of the source file.
+        known_hash (str): Content hash of the destination file, if known.
+
+    Returns:
+        bool: True if the destination has the same content as the source.
+    """
+    if not os.path.exists(dst_file):
+        return False
+    if known_hash is not None:
+        return known_hash == source_hash
+    if os.path.getsize(dst_file) != os.path.getsize(src_file):
+        return False
+    return hash_file(dst_file) == source_hash
+
+
+def transfer_file(source_folder, destination_folder, filename, known_hash=None):
+    """
+    Move one activity file to the data folder with a verified copy.
+
+    The file is copied to "<name>.tmp" in the destination folder, the copy's hash is
+    checked against the source, the copy is renamed to its final name and only
+    then is the source removed. If the destination already has the same content,
+    nothing is copied and the source is removed.
+
+    Args:
+        source_folder (str): Path to the Zwift activities folder.
+        destination_folder (str): Path to the data folder.
+        filename (str): Name of the file to move.
+        known_hash (str): Content hash of the destination file, if known (e.g. from
+                          the ingest manifest). Defaults to None.
+
+    Returns:
+        str: "moved" or "skipped" (already at the destination).
+
+    Raises:
+        TransferError: If the copy does not match the source. The source is kept.
+    """
+    src_file = os.path.join(source_folder, filename)
+    dst_file = os.path.join(destination_folder, filename)
+    source_hash = hash_file(src_file)
+    if is_already_transferred(src_file, dst_file, source_hash, known_hash):
+        os.remove(src_file)
+        return "skipped"
+
+    tmp_file = f"{dst_file}.tmp"
+    try:
+        shutil.copyfile(src_file, tmp_file)
+        copy_hash = hash_file(tmp_file)
+        if copy_hash != source_hash:
+            raise TransferError(f"Copy of {filename} does not match the source [source: {source_hash}, copy: {copy_hash}]")
+        os.replace(tmp_file, dst_file)
+    finally:
+        if os.path.exists(tmp_file):
+            os.remove(tmp_file)
+    os.remove(src_file)
+    return "moved"
+
+
+def transfer_files(source_folder, destination_folder, filenames, workers=1, known_hashes=None):
+    """
+    Move several activity files to the data folder, optionally in parallel.
+
+    Args:
+        source_folder (str): Path to the Zwift activities folder.
+        destination_folder (str): Path to the data folder.
+        filenames (iterable): Names of the files to move.
+        workers (int): Number of transfer threads. Defaults to 1.
+        known_hashes (dict): File name to content hash of files already at the
+                             destination. Defaults to None.
+
+    Yields:
+        tuple: A tuple containing (filename, "moved" or "skipped" or None, exception
+               or None) for each file, in sorted filename order.
+    """
+    known_hashes = known_hashes or {}
+
+    def transfer(filename):
+        try:
+            return filename, transfer_file(source_folder, destination_folder, filename, known_hashes.get(filename)), None
+        except Exception as e:
+            return filename, None, e
+
+    filenames = sorted(filenames)
+    if workers <= 1:
+        yield from map(transfer, filenames)
+        return
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        yield from executor.map(transfer, filenames)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Move Zwift .fit files to Google Drive.")
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Number of files transferred in parallel (default: 1).",
+    )
+    args = parser.parse_args()
+
+    print("Moving Zwift .fit files to Google Drive...")
+
+    # Ensure destination exists
+    os.makedirs(DESTINATION_FOLDER, exist_ok=True)
+
+    # Count files to process
+    files_to_process = get_files_to_move(SOURCE_FOLDER)
+
+    number_of_files = len(files_to_process)
+    if number_of_files > 0:
+        print(f"Found {number_of_files} files to move.")
+
+        # Move all files from source to destination
+        failed = 0
+        known_hashes = get_known_hashes()
+        for filename, status, error in transfer_files(
+            SOURCE_FOLDER, DESTINATION_FOLDER, files_to_process, workers=args.workers, known_hashes=known_hashes
+        ):
+            if error is not None:
+                failed += 1
+                print(f"   Error moving {filename}: {error}")
+            elif status == "skipped":
+                print(f"   Already in Google Drive: {filename}")
+            else:
+                print(f"   Moved: {filename}")
 
-    print("All Zwift .fit files moved successfully.")
-else:
-    print("No files to move.")
+        if failed:
+            print(f"{failed} Zwift .fit file(s) could not be moved and were left in place.")
+        else:
+            print("All Zwift .fit files moved successfully.")
+    else:
+        print("No files to move.")
 
-print("--------------------------------")
+    print("--------------------------------")
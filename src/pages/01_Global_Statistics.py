@@ -3,15 +3,19 @@ Zwift Training Overview Dashboard - Main Page
 Displays aggregate statistics across all training sessions
 """
 
-import os
 from pathlib import Path
 
-import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
+import polars as pl
 import streamlit as st
-from google.cloud import bigquery
-from google.oauth2 import service_account
+from google.api_core.exceptions import NotFound
+
+try:
+    from src.dashboard_data import QUERY_CACHE_TTL_SECONDS, create_warehouse, run_query, year_date_range
+except ModuleNotFoundError:
+    # Run by Streamlit (streamlit run src/Home.py): src/ itself is on sys.path
+    from dashboard_data import QUERY_CACHE_TTL_SECONDS, create_warehouse, run_query, year_date_range
 
 # Page configuration
 st.set_page_config(
@@ -212,36 +216,29 @@ st.markdown(
 )
 
 
-# Initialize BigQuery client
 @st.cache_resource
-def get_bigquery_client():
-    """Initialize and cache BigQuery client with service account credentials"""
+def get_warehouse():
+    """Initialize and cache the storage backend: the local warehouse if ZWIFT_WAREHOUSE_DIR is set, BigQuery otherwise"""
     try:
-        # Try to use Streamlit secrets (for Streamlit Cloud deployment)
-        if "gcp_service_account" in st.secrets:
-            credentials = service_account.Credentials.from_service_account_info(
-                st.secrets["gcp_service_account"]
-            )
-            return bigquery.Client(credentials=credentials, project=st.secrets["gcp_service_account"]["project_id"])
-        else:
-            # Fall back to local JSON file (for local development)
-            project_root = Path(__file__).parent.parent.parent
-            credentials_path = project_root / "zwift-data-loader-key.json"
-
-            if not credentials_path.exists():
-                st.error(f"BigQuery credentials not found. Please configure secrets or add credentials file at: {credentials_path}")
-                st.stop()
+        service_account_info = st.secrets.get("gcp_service_account")
+    except FileNotFoundError:
+        # No secrets file (local development): use the local key file
+        service_account_info = None
+    return create_warehouse(service_account_info)
 
-            os.environ["GOOGLE_APPLICATION_CREDENTIALS"] = str(credentials_path)
-            return bigquery.Client()
 
-    except Exception as e:
-        st.error(f"Failed to initialize BigQuery client: {e}")
-        st.stop()
+@st.cache_data(ttl=QUERY_CACHE_TTL_SECONDS)
+def query(name, **params):
+    """Run a registered dashboard query on the storage backend, cached for 10 minutes"""
+    return run_query(name, get_warehouse(), **params)
 
 
-# Initialize client
-client = get_bigquery_client()
+# Initialize storage backend
+try:
+    get_warehouse()
+except Exception as e:
+    st.error(f"Failed to initialize the warehouse: {e}")
+    st.stop()
 
 # Add Zwift logo to sidebar
 from pathlib import Path
@@ -252,16 +249,10 @@ if logo_path.exists():
 
 
 # Fetch available years from data
-@st.cache_data(ttl=600)
 def get_available_years():
     """Get list of years with training data"""
-    query = """
-    SELECT DISTINCT EXTRACT(YEAR FROM date) as year
-    FROM `zwift_data.training`
-    ORDER BY year DESC
-    """
-    df = client.query(query).to_dataframe()
-    return ["All Years"] + [str(int(year)) for year in df["year"].tolist()]
+    df = query("available_years")
+    return ["All Years"] + [str(int(year)) for year in df["year"].to_list()]
 
 
 # Year filter
@@ -272,127 +263,47 @@ year_filter = st.sidebar.selectbox("Year", options=available_years, index=0)
 # Display title with selected year
 st.title(f"Global Statistics for: {year_filter}")
 
-# Build year filter condition for queries
-year_condition = ""
-if year_filter != "All Years":
-    year_condition = f"WHERE EXTRACT(YEAR FROM date) = {year_filter}"
-
-
-# Fetch global training metrics
-@st.cache_data(ttl=600)
-def get_training_metrics(year_cond):
-    """Get global training statistics"""
-    query = f"""
-    WITH session_metrics AS (
-        SELECT
-            date,
-            distance_km,
-            duration
-        FROM `zwift_data.training`
-        {year_cond}
-    )
-    SELECT
-        COUNT(DISTINCT date) as total_sessions,
-        ROUND(SUM(distance_km), 2) as total_distance_km,
-        ROUND(AVG(distance_km), 2) as avg_distance_km,
-        AVG(duration) as avg_duration_seconds
-    FROM session_metrics
-    """
-    return client.query(query).to_dataframe()
-
-
-# Fetch performance metrics
-@st.cache_data(ttl=600)
-def get_performance_metrics(year_cond):
-    """Get performance statistics from augmented_data"""
-    query = f"""
-    SELECT
-        ROUND(MAX(heart_rate), 0) as max_heart_rate,
-        ROUND(AVG(heart_rate), 0) as avg_heart_rate,
-        ROUND(MAX(cadence), 0) as max_cadence,
-        ROUND(AVG(cadence), 0) as avg_cadence,
-        ROUND(MAX(power), 0) as max_power,
-        ROUND(AVG(power), 0) as avg_power,
-        ROUND(MAX(speed_kmh), 1) as max_speed,
-        ROUND(AVG(speed_kmh), 1) as avg_speed
-    FROM `zwift_data.augmented_data`
-    {year_cond}
-    """
-    return client.query(query).to_dataframe()
-
-
-# Fetch cardio zone distribution
-@st.cache_data(ttl=600)
-def get_zone_distribution(year_cond):
-    """Get time distribution across cardio zones"""
-    query = f"""
-    WITH zone_time_totals AS (
-        SELECT
-            SUM(time_zone_1) as total_zone_1,
-            SUM(time_zone_2) as total_zone_2,
-            SUM(time_zone_3) as total_zone_3,
-            SUM(time_zone_4) as total_zone_4,
-            SUM(time_zone_5) as total_zone_5
-        FROM `zwift_data.zone`
-        {year_cond}
-    )
-    SELECT
-        'Zone 1' as zone_name,
-        ROUND((total_zone_1 / (total_zone_1 + total_zone_2 + total_zone_3 + total_zone_4 + total_zone_5)) * 100, 2) as percentage
-    FROM zone_time_totals
-    UNION ALL
-    SELECT
-        'Zone 2' as zone_name,
-        ROUND((total_zone_2 / (total_zone_1 + total_zone_2 + total_zone_3 + total_zone_4 + total_zone_5)) * 100, 2) as percentage
-    FROM zone_time_totals
-    UNION ALL
-    SELECT
-        'Zone 3' as zone_name,
-        ROUND((total_zone_3 / (total_zone_1 + total_zone_2 + total_zone_3 + total_zone_4 + total_zone_5)) * 100, 2) as percentage
-    FROM zone_time_totals
-    UNION ALL
-    SELECT
-        'Zone 4' as zone_name,
-        ROUND((total_zone_4 / (total_zone_1 + total_zone_2 + total_zone_3 + total_zone_4 + total_zone_5)) * 100, 2) as percentage
-    FROM zone_time_totals
-    UNION ALL
-    SELECT
-        'Zone 5' as zone_name,
-        ROUND((total_zone_5 / (total_zone_1 + total_zone_2 + total_zone_3 + total_zone_4 + total_zone_5)) * 100, 2) as percentage
-    FROM zone_time_totals
-    ORDER BY zone_name
-    """
-    return client.query(query).to_dataframe()
+# Date range of the year filter, a range on the partitioning column of the tables
+start_date, end_date = year_date_range(year_filter)
+
+
+def format_duration(seconds):
+    """Format a power curve duration as 5s, 1m, 1m30s or 1h"""
+    if seconds >= 3600 and seconds % 3600 == 0:
+        return f"{seconds // 3600}h"
+    if seconds >= 60:
+        return f"{seconds // 60}m{seconds % 60}s" if seconds % 60 else f"{seconds // 60}m"
+    return f"{seconds}s"
 
 
 # Fetch data
 try:
     with st.spinner("Loading training statistics..."):
-        training_metrics = get_training_metrics(year_condition)
-        performance_metrics = get_performance_metrics(year_condition)
-        zone_distribution = get_zone_distribution(year_condition)
+        training_metrics = query("training_metrics", start_date=start_date, end_date=end_date)
+        performance_metrics = query("performance_metrics", start_date=start_date, end_date=end_date)
+        zone_distribution = query("zone_distribution", start_date=start_date, end_date=end_date)
 
     col1, col2, col3, col4 = st.columns(4)
 
     with col1:
         st.metric(
-            label="Total Training Sessions", value=f"{int(training_metrics['total_sessions'].iloc[0]):,}"
+            label="Total Training Sessions", value=f"{int(training_metrics['total_sessions'][0]):,}"
         )
 
     with col2:
         st.metric(
-            label="Total Distance", value=f"{training_metrics['total_distance_km'].iloc[0]:,.1f} km"
+            label="Total Distance", value=f"{training_metrics['total_distance_km'][0]:,.1f} km"
         )
 
     with col3:
         st.metric(
             label="Avg. Distance per Session",
-            value=f"{training_metrics['avg_distance_km'].iloc[0]:.1f} km",
+            value=f"{training_metrics['avg_distance_km'][0]:.1f} km",
         )
 
     with col4:
         # Convert seconds to HH:MM:SS
-        avg_seconds = training_metrics["avg_duration_seconds"].iloc[0]
+        avg_seconds = training_metrics["avg_duration_seconds"][0]
         hours = int(avg_seconds // 3600)
         minutes = int((avg_seconds % 3600) // 60)
         seconds = int(avg_seconds % 60)
@@ -403,33 +314,33 @@ try:
     with col1:
         st.metric(
             label="Avg. Heart Rate ❤️",
-            value=f"{int(performance_metrics['avg_heart_rate'].iloc[0])} bpm",
+            value=f"{int(performance_metrics['avg_heart_rate'][0])} bpm",
         )
         st.metric(
-            label="Max Hearth Rate ❤️", value=f"{int(performance_metrics['max_heart_rate'].iloc[0])} bpm"
+            label="Max Hearth Rate ❤️", value=f"{int(performance_metrics['max_heart_rate'][0])} bpm"
         )
 
     with col2:
-        st.metric(label="Avg. Power⚡", value=f"{int(performance_metrics['avg_power'].iloc[0])} W")
-        st.metric(label="Max Power ⚡", value=f"{int(performance_metrics['max_power'].iloc[0])} W")
+        st.metric(label="Avg. Power⚡", value=f"{int(performance_metrics['avg_power'][0])} W")
+        st.metric(label="Max Power ⚡", value=f"{int(performance_metrics['max_power'][0])} W")
 
     with col3:
-        st.metric(label="Avg. Speed 🚴", value=f"{performance_metrics['avg_speed'].iloc[0]:.1f} km/h")
-        st.metric(label="Max Speed 🚴", value=f"{performance_metrics['max_speed'].iloc[0]:.1f} km/h")
+        st.metric(label="Avg. Speed 🚴", value=f"{performance_metrics['avg_speed'][0]:.1f} km/h")
+        st.metric(label="Max Speed 🚴", value=f"{performance_metrics['max_speed'][0]:.1f} km/h")
 
     with col4:
         st.metric(
-            label="Avg. Cadence 🔄", value=f"{int(performance_metrics['avg_cadence'].iloc[0])} rpm"
+            label="Avg. Cadence 🔄", value=f"{int(performance_metrics['avg_cadence'][0])} rpm"
         )
-        st.metric(label="Max Cadence 🔄", value=f"{int(performance_metrics['max_cadence'].iloc[0])} rpm")
+        st.metric(label="Max Cadence 🔄", value=f"{int(performance_metrics['max_cadence'][0])} rpm")
 
     # Cardio Zone Distribution Section
     st.markdown("### Time Spent in Cardio Zones")
 
-    if not zone_distribution.empty:
+    if not zone_distribution.is_empty():
         # Create 5 individual zone cards with color-coded backgrounds
         zone_colors = ["#92FC29", "#ADCE2D", "#C9A130", "#E47334", "#FF4537"]
-        zone_data = zone_distribution.to_dict("records")
+        zone_data = zone_distribution.to_dicts()
 
         col1, col2, col3, col4, col5 = st.columns(5)
         cols = [col1, col2, col3, col4, col5]
@@ -474,3 +385,61 @@ try:
 except Exception as e:
     st.error(f"Error loading metrics: {e}")
     st.info("Please ensure the BigQuery tables exist and contain data.")
+
+
+# Power Curve Section: optional, the power_curve_best table only exists once rides were loaded with --power-curve
+st.markdown("### Power Curve")
+
+try:
+    power_curve = query("power_curve", period="all" if year_filter == "All Years" else year_filter)
+except NotFound:
+    power_curve = pl.DataFrame()
+except Exception as e:
+    st.error(f"Error loading the power curve: {e}")
+    power_curve = pl.DataFrame()
+
+if not power_curve.is_empty():
+    fig = go.Figure()
+    curve_styles = {"all": ("All-time best", "#1f77b4"), year_filter: (f"{year_filter} best", "#E47334")}
+    for (period,), curve in power_curve.group_by("period", maintain_order=True):
+        name, color = curve_styles[period]
+        fig.add_trace(
+            go.Scatter(
+                x=curve["duration_s"].to_list(),
+                y=curve["max_power"].to_list(),
+                name=name,
+                line=dict(color=color, width=2),
+                customdata=[format_duration(int(seconds)) for seconds in curve["duration_s"]],
+                hovertemplate="%{customdata}: %{y:.0f} W<extra></extra>",
+            )
+        )
+
+    tick_durations = [1, 5, 15, 30, 60, 300, 600, 1200, 1800, 3600]
+    fig.update_layout(
+        xaxis=dict(
+            type="log",
+            tickvals=tick_durations,
+            ticktext=[format_duration(seconds) for seconds in tick_durations],
+            title="",
+        ),
+        yaxis=dict(title=""),
+        hovermode="x unified",
+        height=350,
+        showlegend=True,
+        legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1),
+        margin=dict(t=20, b=10, l=40, r=20),
+        font=dict(size=12),
+        plot_bgcolor="#1a1d23",
+        paper_bgcolor="#1a1d23",
+    )
+
+    st.plotly_chart(
+        fig,
+        use_container_width=True,
+        config={
+            "displayModeBar": False,
+            "responsive": True,
+        },
+    )
+else:
+    st.info("No power curve available yet: load rides with --power-curve and run dbt.")
@@ -5,12 +5,21 @@ Displays detailed metrics and time-series data for individual training sessions
 
 from datetime import datetime
 
-import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
 import streamlit as st
-from google.cloud import bigquery
-from google.oauth2 import service_account
+
+try:
+    from src.dashboard_data import QUERY_CACHE_TTL_SECONDS, create_warehouse, run_query
+except ModuleNotFoundError:
+    # Run by Streamlit (streamlit run src/Home.py): src/ itself is on sys.path
+    from dashboard_data import QUERY_CACHE_TTL_SECONDS, create_warehouse, run_query
+
+# Resolutions of the timeseries_downsampled model (s), finest first
+TIMESERIES_RESOLUTIONS = [1, 5, 30]
+
+# Points per series of the session chart: about one per pixel of a full-width chart
+CHART_MAX_POINTS = 2000
 
 st.set_page_config(
     page_title="Zwift Dashboard", page_icon="🚴", layout="wide", initial_sidebar_state="expanded"
@@ -214,38 +223,29 @@ st.markdown(
     unsafe_allow_html=True,
 )
 
-# Initialize BigQuery client
 @st.cache_resource
-def get_bigquery_client():
-    """Initialize and cache BigQuery client with service account credentials"""
+def get_warehouse():
+    """Initialize and cache the storage backend: the local warehouse if ZWIFT_WAREHOUSE_DIR is set, BigQuery otherwise"""
     try:
-        # Try to use Streamlit secrets (for Streamlit Cloud deployment)
-        if "gcp_service_account" in st.secrets:
-            credentials = service_account.Credentials.from_service_account_info(
-                st.secrets["gcp_service_account"]
-            )
-            return bigquery.Client(credentials=credentials, project=st.secrets["gcp_service_account"]["project_id"])
-        else:
-            # Fall back to local JSON file (for local development)
-            import os
-            from pathlib import Path
+        service_account_info = st.secrets.get("gcp_service_account")
+    except FileNotFoundError:
+        # No secrets file (local development): use the local key file
+        service_account_info = None
+    return create_warehouse(service_account_info)
 
-            project_root = Path(__file__).parent.parent.parent
-            credentials_path = project_root / "zwift-data-loader-key.json"
 
-            if not credentials_path.exists():
-                st.error(f"BigQuery credentials not found. Please configure secrets or add credentials file at: {credentials_path}")
-                st.stop()
+@st.cache_data(ttl=QUERY_CACHE_TTL_SECONDS)
+def query(name, **params):
+    """Run a registered dashboard query on the storage backend, cached for 10 minutes"""
+    return run_query(name, get_warehouse(), **params)
 
-            os.environ["GOOGLE_APPLICATION_CREDENTIALS"] = str(credentials_path)
-            return bigquery.Client()
 
-    except Exception as e:
-        st.error(f"Failed to initialize BigQuery client: {e}")
-        st.stop()
-
-
-client = get_bigquery_client()
+# Initialize storage backend
+try:
+    get_warehouse()
+except Exception as e:
+    st.error(f"Failed to initialize the warehouse: {e}")
+    st.stop()
 
 # Add Zwift logo to sidebar
 from pathlib import Path
@@ -255,97 +255,12 @@ if logo_path.exists():
     st.sidebar.image(str(logo_path), use_container_width=True)
 
 
-# Fetch available training dates
-@st.cache_data(ttl=600)
-def get_available_dates():
-    """Get list of dates with training data"""
-    query = """
-    SELECT DISTINCT date
-    FROM `zwift_data.training`
-    ORDER BY date DESC
-    """
-    df = client.query(query).to_dataframe()
-    return df["date"].tolist()
-
-
-# Fetch session metrics from training table (already pre-aggregated)
-@st.cache_data(ttl=600)
-def get_session_metrics(selected_date):
-    """Get detailed metrics for a specific training session"""
-    query = f"""
-    SELECT
-        distance_km,
-        duration,
-        ROUND(max_heart_rate, 0) as max_heart_rate,
-        ROUND(avg_heart_rate, 0) as avg_heart_rate,
-        ROUND(max_cadence, 0) as max_cadence,
-        ROUND(avg_cadence, 0) as avg_cadence,
-        ROUND(max_power, 0) as max_power,
-        ROUND(avg_power, 0) as avg_power,
-        ROUND(max_speed_kmh, 1) as max_speed,
-        ROUND(avg_speed_kmh, 1) as avg_speed
-    FROM `zwift_data.training`
-    WHERE date = '{selected_date}'
-    """
-    return client.query(query).to_dataframe()
-
-
-# Fetch time-series data
-@st.cache_data(ttl=600)
-def get_timeseries_data(selected_date):
-    """Get time-series data for power and cadence visualization"""
-    query = f"""
-    SELECT
-        local_timestamp,
-        time,
-        power,
-        cadence,
-        heart_rate,
-        speed_kmh
-    FROM `zwift_data.augmented_data`
-    WHERE date = '{selected_date}'
-    ORDER BY local_timestamp
-    """
-    return client.query(query).to_dataframe()
-
-
-# Fetch cardio zone distribution for specific date
-@st.cache_data(ttl=600)
-def get_zone_distribution(selected_date):
-    """Get time distribution across cardio zones for a specific date"""
-    query = f"""
-    SELECT
-        'Zone 1' as zone_name,
-        ROUND(percentage_time_zone_1, 4) as percentage
-    FROM `zwift_data.zone`
-    WHERE date = '{selected_date}'
-    UNION ALL
-    SELECT
-        'Zone 2' as zone_name,
-        ROUND(percentage_time_zone_2, 4) as percentage
-    FROM `zwift_data.zone`
-    WHERE date = '{selected_date}'
-    UNION ALL
-    SELECT
-        'Zone 3' as zone_name,
-        ROUND(percentage_time_zone_3, 4) as percentage
-    FROM `zwift_data.zone`
-    WHERE date = '{selected_date}'
-    UNION ALL
-    SELECT
-        'Zone 4' as zone_name,
-        ROUND(percentage_time_zone_4, 4) as percentage
-    FROM `zwift_data.zone`
-    WHERE date = '{selected_date}'
-    UNION ALL
-    SELECT
-        'Zone 5' as zone_name,
-        ROUND(percentage_time_zone_5, 4) as percentage
-    FROM `zwift_data.zone`
-    WHERE date = '{selected_date}'
-    ORDER BY zone_name
-    """
-    return client.query(query).to_dataframe()
+def pick_resolution(duration_seconds):
+    """Finest resolution keeping the session chart under CHART_MAX_POINTS points"""
+    for resolution in TIMESERIES_RESOLUTIONS:
+        if duration_seconds / resolution <= CHART_MAX_POINTS:
+            return resolution
+    return TIMESERIES_RESOLUTIONS[-1]
 
 
 # Date picker filter
@@ -353,7 +268,7 @@ st.sidebar.header("Filters")
 
 try:
     with st.spinner("Loading available training dates..."):
-        available_dates = get_available_dates()
+        available_dates = query("available_dates")["date"].to_list()
 
     if not available_dates:
         st.error("No training sessions found in the database.")
@@ -374,39 +289,57 @@ try:
 
     # Fetch data for selected date
     with st.spinner("Loading session details..."):
-        session_metrics = get_session_metrics(selected_date)
-        timeseries_data = get_timeseries_data(selected_date)
-        zone_distribution = get_zone_distribution(selected_date)
+        session_metrics = query("session_metrics", date=selected_date)
+        zone_distribution = query("session_zone_distribution", date=selected_date)
 
-    if session_metrics.empty:
+    if session_metrics.is_empty():
         st.error(f"No data available for {selected_date}")
         st.stop()
 
-    if not timeseries_data.empty:
+    with st.spinner("Loading session chart..."):
+        resolution = pick_resolution(session_metrics["duration"][0])
+        timeseries_data = query("timeseries", date=selected_date, resolution_s=resolution)
+
+    if not timeseries_data.is_empty():
         # Create chart for Power and Heart Rate
         fig = go.Figure()
 
-        # Add Power trace (blue)
-        fig.add_trace(
-            go.Scatter(
-                x=timeseries_data["local_timestamp"],
-                y=timeseries_data["power"],
-                name="Power",
-                line=dict(color="#1f77b4", width=2),
-                hovertemplate="Power: %{y:.0f} W<extra></extra>",
-            )
-        )
-
-        # Add Heart Rate trace
-        fig.add_trace(
-            go.Scatter(
-                x=timeseries_data["local_timestamp"],
-                y=timeseries_data["heart_rate"],
-                name="Heart Rate",
-                line=dict(color="#E47334", width=2),
-                hovertemplate="Heart Rate: %{y:.0f} bpm<extra></extra>",
+        series = [
+            ("power", "Power", "#1f77b4", "rgba(31, 119, 180, 0.25)", "W"),
+            ("heart_rate", "Heart Rate", "#E47334", "rgba(228, 115, 52, 0.25)", "bpm"),
+        ]
+        for column, name, color, band_color, unit in series:
+            if resolution > 1:
+                # Min-max band of each bucket, so short peaks stay visible
+                fig.add_trace(
+                    go.Scatter(
+                        x=timeseries_data["local_timestamp"].to_list(),
+                        y=timeseries_data[f"{column}_max"].to_list(),
+                        line=dict(width=0),
+                        showlegend=False,
+                        hoverinfo="skip",
+                    )
+                )
+                fig.add_trace(
+                    go.Scatter(
+                        x=timeseries_data["local_timestamp"].to_list(),
+                        y=timeseries_data[f"{column}_min"].to_list(),
+                        line=dict(width=0),
+                        fill="tonexty",
+                        fillcolor=band_color,
+                        showlegend=False,
+                        hoverinfo="skip",
+                    )
+                )
+            fig.add_trace(
+                go.Scatter(
+                    x=timeseries_data["local_timestamp"].to_list(),
+                    y=timeseries_data[f"{column}_avg"].to_list(),
+                    name=name,
+                    line=dict(color=color, width=2),
+                    hovertemplate=f"{name}: %{{y:.0f}} {unit}<extra></extra>",
+                )
             )
-        )
 
         # Configure layout with single y-axis (no title)
         fig.update_layout(
@@ -436,10 +369,10 @@ try:
 
     st.markdown("### Time Spent in Cardio Zones")
 
-    if not zone_distribution.empty:
+    if not zone_distribution.is_empty():
         # Create 5 individual zone cards with color-coded backgrounds
         zone_colors = ["#92FC29", "#ADCE2D", "#C9A130", "#E47334", "#FF4537"]
-        zone_data = zone_distribution.to_dict("records")
+        zone_data = zone_distribution.to_dicts()
 
         col1, col2, col3, col4, col5 = st.columns(5)
         cols = [col1, col2, col3, col4, col5]
@@ -483,11 +416,11 @@ try:
         col1, col2, col3, col4 = st.columns(4)
 
         with col1:
-            st.metric(label="Distance", value=f"{session_metrics['distance_km'].iloc[0]:.1f} km")
+            st.metric(label="Distance", value=f"{session_metrics['distance_km'][0]:.1f} km")
 
         with col2:
             # Convert seconds to HH:MM:SS
-            duration_seconds = session_metrics["duration"].iloc[0]
+            duration_seconds = session_metrics["duration"][0]
             hours = int(duration_seconds // 3600)
             minutes = int((duration_seconds % 3600) // 60)
             seconds = int(duration_seconds % 60)
@@ -497,25 +430,25 @@ try:
 
         with col1:
             st.metric(
-                label="Avg. Heart Rate ❤️", value=f"{int(session_metrics['avg_heart_rate'].iloc[0])} bpm"
+                label="Avg. Heart Rate ❤️", value=f"{int(session_metrics['avg_heart_rate'][0])} bpm"
             )
             st.metric(
-                label="Max Heart Rate ❤️", value=f"{int(session_metrics['max_heart_rate'].iloc[0])} bpm"
+                label="Max Heart Rate ❤️", value=f"{int(session_metrics['max_heart_rate'][0])} bpm"
             )
 
         with col2:
-            st.metric(label="Avg. Power ⚡", value=f"{int(session_metrics['avg_power'].iloc[0])} W")
-            st.metric(label="Max Power ⚡", value=f"{int(session_metrics['max_power'].iloc[0])} W")
+            st.metric(label="Avg. Power ⚡", value=f"{int(session_metrics['avg_power'][0])} W")
+            st.metric(label="Max Power ⚡", value=f"{int(session_metrics['max_power'][0])} W")
 
         with col3:
-            st.metric(label="Avg. Speed 🚴", value=f"{session_metrics['avg_speed'].iloc[0]:.1f} km/h")
-            st.metric(label="Max Speed 🚴", value=f"{session_metrics['max_speed'].iloc[0]:.1f} km/h")
+            st.metric(label="Avg. Speed 🚴", value=f"{session_metrics['avg_speed'][0]:.1f} km/h")
+            st.metric(label="Max Speed 🚴", value=f"{session_metrics['max_speed'][0]:.1f} km/h")
 
         with col4:
             st.metric(
-                label="Avg. Cadence 🔄", value=f"{int(session_metrics['avg_cadence'].iloc[0])} rpm"
+                label="Avg. Cadence 🔄", value=f"{int(session_metrics['avg_cadence'][0])} rpm"
             )
-            st.metric(label="Max Cadence 🔄", value=f"{int(session_metrics['max_cadence'].iloc[0])} rpm")
+            st.metric(label="Max Cadence 🔄", value=f"{int(session_metrics['max_cadence'][0])} rpm")
     else:
         st.info("No cardio zone data available for the selected date.")
 
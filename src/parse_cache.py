@@ -0,0 +1,148 @@
+"""
+Local on-disk cache of parsed and cleaned FIT files.
+
+Entries are Parquet files named after the FIT file content hash and a version
+string, so unchanged files skip decoding entirely on re-runs and backfills, and
+bumping the version (parser change, new cleaned column set) invalidates every
+older entry. The least recently used entries are evicted once the cache grows
+past its size limit.
+"""
+
+import glob
+import hashlib
+import os
+
+import polars as pl
+
+# Default size limit of the cache directory
+CACHE_MAX_BYTES = 2 * 1024**3
+
+
+def hash_file(file_path):
+    """
+    Compute the SHA-256 hash of a file's content.
+
+    Args:
+        file_path (str): Path to the file to hash.
+
+    Returns:
+        str: Hex digest of the file content.
+    """
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def get_cache_path(cache_dir, content_hash, version):
+    """
+    Build the path of the cache entry for a file content hash and cache version.
+
+    Args:
+        cache_dir (str): Path to the cache directory.
+        content_hash (str): Hash of the FIT file content, as returned by hash_file.
+        version (str): Version of the parser and cleaned column set.
+
+    Returns:
+        str: Path to the Parquet file of the cache entry.
+    """
+    return os.path.join(cache_dir, f"{content_hash}-{version}.parquet")
+
+
+def read_cache(cache_dir, content_hash, version):
+    """
+    Read a cached DataFrame, if there is one.
+
+    Reading an entry marks it as recently used for eviction purposes.
+
+    Args:
+        cache_dir (str): Path to the cache directory.
+        content_hash (str): Hash of the FIT file content, as returned by hash_file.
+        version (str): Version of the parser and cleaned column set.
+
+    Returns:
+        polars.DataFrame: The cached DataFrame, or None on a cache miss.
+    """
+    cache_path = get_cache_path(cache_dir, content_hash, version)
+    try:
+        df = pl.read_parquet(cache_path)
+    except (FileNotFoundError, pl.exceptions.ComputeError):
+        return None
+    os.utime(cache_path)
+    return df
+
+
+def write_cache(cache_dir, content_hash, version, df, max_bytes=CACHE_MAX_BYTES):
+    """
+    Store a DataFrame in the cache, then evict old entries beyond the size limit.
+
+    The entry is written to a temporary file and renamed into place, so readers
+    (including parallel ETL workers) never see a partially written entry.
+
+    Args:
+        cache_dir (str): Path to the cache directory.
+        content_hash (str): Hash of the FIT file content, as returned by hash_file.
+        version (str): Version of the parser and cleaned column set.
+        df (polars.DataFrame): DataFrame to cache.
+        max_bytes (int): Size limit of the cache directory. Defaults to CACHE_MAX_BYTES.
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    cache_path = get_cache_path(cache_dir, content_hash, version)
+    tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+    df.write_parquet(tmp_path)
+    os.replace(tmp_path, cache_path)
+    evict_cache(cache_dir, max_bytes)
+
+
+def evict_cache(cache_dir, max_bytes=CACHE_MAX_BYTES):
+    """
+    Delete the least recently used cache entries until the cache fits in max_bytes.
+
+    Args:
+        cache_dir (str): Path to the cache directory.
+        max_bytes (int): Size limit of the cache directory. Defaults to CACHE_MAX_BYTES.
+
+    Returns:
+        int: Number of entries deleted.
+    """
+    entries = []
+    for cache_path in glob.glob(os.path.join(cache_dir, "*.parquet")):
+        try:
+            stat = os.stat(cache_path)
+        except FileNotFoundError:
+            continue
+        entries.append((stat.st_mtime, stat.st_size, cache_path))
+
+    total_bytes = sum(size for _, size, _ in entries)
+    deleted = 0
+    for _, size, cache_path in sorted(entries):
+        if total_bytes <= max_bytes:
+            break
+        try:
+            os.remove(cache_path)
+        except FileNotFoundError:
+            pass
+        total_bytes -= size
+        deleted += 1
+    return deleted
+
+
+def clear_cache(cache_dir, keep_version=None):
+    """
+    Delete cache entries, e.g. after clean_fitfile's column set changed.
+
+    Args:
+        cache_dir (str): Path to the cache directory.
+        keep_version (str): If given, only entries of other versions are deleted.
+
+    Returns:
+        int: Number of entries deleted.
+    """
+    deleted = 0
+    for cache_path in glob.glob(os.path.join(cache_dir, "*.parquet")):
+        if keep_version is not None and cache_path.endswith(f"-{keep_version}.parquet"):
+            continue
+        os.remove(cache_path)
+        deleted += 1
+    return deleted
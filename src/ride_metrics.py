@@ -0,0 +1,185 @@
+"""
+Derived training metrics of each ride, computed once at ingest time.
+
+The metrics follow the usual power-based training load definitions: normalized
+power is the fourth root of the mean of the fourth power of the 30 second rolling
+average power, intensity factor is normalized power over FTP, and TSS is the
+training load of the ride relative to one hour at FTP. Everything is expressed
+as Polars expressions over the cleaned records, so a whole batch of rides is
+computed in one vectorized pass.
+
+The mean-maximal power curve of a ride is its best average power over each of
+a set of log-spaced durations, computed from prefix sums of the per-second
+power in O(n) per duration instead of O(n^2) over all windows.
+"""
+
+import numpy as np
+import polars as pl
+
+# Functional threshold power used when none is given (W)
+DEFAULT_FTP = 250
+
+# Window of the rolling average power used by normalized power
+ROLLING_POWER_SECONDS = 30
+
+# BigQuery table of the per-ride metrics
+METRICS_TABLE = "fitfile_metrics"
+
+# Durations of the mean-maximal power curve (s): log-spaced from 1s to 60min,
+# plus the usual reference durations
+POWER_CURVE_DURATIONS = tuple(
+    int(d) for d in np.unique(np.concatenate([np.geomspace(1, 3600, 40).round(), [5, 30, 60, 300, 1200, 3600]]))
+)
+
+# BigQuery table of the per-ride mean-maximal power curves
+POWER_CURVE_TABLE = "fitfile_power_curve"
+
+
+def add_rolling_power(df, window_seconds=ROLLING_POWER_SECONDS):
+    """
+    Add the rolling average power of each ride to cleaned FIT file records.
+
+    The window is a time window over the record timestamps, so pauses in the
+    recording do not stretch it. Missing power values (sensor dropouts) count as
+    zero. Records less than a full window into the ride get a null rolling power,
+    as those partial windows are left out of normalized power.
+
+    Args:
+        df (polars.DataFrame): Cleaned records, as returned by clean_fitfile.
+        window_seconds (int): Length of the window in seconds. Defaults to ROLLING_POWER_SECONDS.
+
+    Returns:
+        polars.DataFrame: The records sorted by file name and timestamp, with a
+                         rolling_power column.
+    """
+    elapsed = pl.col("timestamp") - pl.col("timestamp").first().over("file_name")
+    rolling_power = (
+        pl.col("power").cast(pl.Float64).fill_null(0).rolling_mean_by("timestamp", f"{window_seconds}s").over("file_name")
+    )
+    # The window ending on a record includes it, so it is full window_seconds - 1 seconds in
+    return df.sort("file_name", "timestamp").with_columns(
+        pl.when(elapsed >= pl.duration(seconds=window_seconds - 1)).then(rolling_power).alias("rolling_power")
+    )
+
+
+def compute_ride_metrics(df, ftp=DEFAULT_FTP, window_seconds=ROLLING_POWER_SECONDS):
+    """
+    Compute the training metrics of each ride in cleaned FIT file records.
+
+    Args:
+        df (polars.DataFrame): Cleaned records of one or more rides, as returned by
+                               clean_fitfile (full-width or compact).
+        ftp (float): Functional threshold power in watts. Defaults to DEFAULT_FTP.
+        window_seconds (int): Rolling power window in seconds. Defaults to ROLLING_POWER_SECONDS.
+
+    Returns:
+        polars.DataFrame: One row per file name with columns: file_name, start_time,
+                         end_time, duration_s, ftp, avg_power, max_power,
+                         max_rolling_power, normalized_power, intensity_factor, tss,
+                         variability_index, avg_heart_rate, efficiency_factor.
+                         Power-based metrics are null for rides without power.
+
+    Raises:
+        ValueError: If ftp is not positive.
+    """
+    if ftp <= 0:
+        raise ValueError(f"FTP must be positive, got {ftp}")
+    df = add_rolling_power(df.with_columns(pl.col("file_name").cast(pl.String)), window_seconds)
+    power = pl.col("power").cast(pl.Float64)
+    metrics = df.group_by("file_name", maintain_order=True).agg(
+        pl.col("timestamp").min().alias("start_time"),
+        pl.col("timestamp").max().alias("end_time"),
+        power.mean().alias("avg_power"),
+        power.max().alias("max_power"),
+        pl.when(power.count() > 0).then(pl.col("rolling_power").max()).alias("max_rolling_power"),
+        pl.when(power.count() > 0)
+        .then((pl.col("rolling_power") ** 4).mean().pow(0.25))
+        .alias("normalized_power"),
+        pl.col("heart_rate").cast(pl.Float64).mean().alias("avg_heart_rate"),
+    )
+    duration = (pl.col("end_time") - pl.col("start_time")).dt.total_seconds()
+    intensity_factor = pl.col("normalized_power") / ftp
+    return metrics.select(
+        "file_name",
+        "start_time",
+        "end_time",
+        duration.alias("duration_s"),
+        pl.lit(ftp, dtype=pl.Float64).alias("ftp"),
+        "avg_power",
+        "max_power",
+        "max_rolling_power",
+        "normalized_power",
+        intensity_factor.alias("intensity_factor"),
+        # TSS = duration x NP x IF / (FTP x 3600) x 100
+        (duration * pl.col("normalized_power") * intensity_factor / (ftp * 3600) * 100).alias("tss"),
+        pl.when(pl.col("avg_power") > 0)
+        .then(pl.col("normalized_power") / pl.col("avg_power"))
+        .alias("variability_index"),
+        "avg_heart_rate",
+        pl.when(pl.col("avg_heart_rate") > 0)
+        .then(pl.col("normalized_power") / pl.col("avg_heart_rate"))
+        .alias("efficiency_factor"),
+    )
+
+
+def mean_max_power(power, durations=POWER_CURVE_DURATIONS):
+    """
+    Compute the best average power over each duration of a per-second power series.
+
+    Args:
+        power (numpy.ndarray): Power of each second of the ride (W).
+        durations (iterable): Durations in seconds.
+
+    Returns:
+        dict: Duration to best average power, for the durations not longer than the ride.
+    """
+    prefix = np.concatenate([[0.0], np.cumsum(power, dtype=np.float64)])
+    return {
+        duration: float((prefix[duration:] - prefix[:-duration]).max()) / duration
+        for duration in durations
+        if 0 < duration <= len(power)
+    }
+
+
+def compute_power_curve(df, durations=POWER_CURVE_DURATIONS):
+    """
+    Compute the mean-maximal power curve of each ride in cleaned FIT file records.
+
+    Records are placed on a one second grid from the start of the ride; seconds
+    without a record or without power (pauses, sensor dropouts) count as zero, so
+    windows never span more time than their duration.
+
+    Args:
+        df (polars.DataFrame): Cleaned records of one or more rides, as returned by
+                               clean_fitfile (full-width or compact).
+        durations (iterable): Durations of the curve in seconds. Defaults to POWER_CURVE_DURATIONS.
+
+    Returns:
+        polars.DataFrame: One row per ride and duration with columns: file_name,
+                         start_time, duration_s, max_power. Rides without power
+                         have no rows.
+    """
+    seconds = df.with_columns(pl.col("file_name").cast(pl.String)).select(
+        "file_name",
+        pl.col("timestamp").min().over("file_name").alias("start_time"),
+        (pl.col("timestamp") - pl.col("timestamp").min().over("file_name")).dt.total_seconds().alias("second"),
+        pl.col("power").cast(pl.Float64),
+    )
+    rides = seconds.filter(pl.col("power").is_not_null()).partition_by("file_name", as_dict=True, maintain_order=True)
+    rows = []
+    for (filename,), ride in rides.items():
+        power = np.zeros(ride["second"].max() + 1)
+        power[ride["second"].to_numpy()] = ride["power"].to_numpy()
+        start_time = ride["start_time"][0]
+        curve = mean_max_power(power, durations)
+        rows.extend((filename, start_time, duration, max_power) for duration, max_power in curve.items())
+    return pl.DataFrame(
+        rows,
+        schema={
+            "file_name": pl.String,
+            "start_time": df.schema["timestamp"],
+            "duration_s": pl.Int64,
+            "max_power": pl.Float64,
+        },
+        orient="row",
+    )
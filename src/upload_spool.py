@@ -0,0 +1,323 @@
+"""
+Durable local spool of ready-to-load upload batches.
+
+The ETL writes every batch of cleaned data to the spool as a Parquet file
+before uploading it, and deletes the file only once the load job succeeded.
+Uploads are retried with exponential backoff on transient errors; a batch that
+still fails stays in the spool and is loaded at the start of the next run, so
+a warehouse outage never costs a re-parse of the FIT files.
+
+Each spool entry records the content hash of the FIT files it holds, so the
+ingest manifest entries can be built when it is finally loaded. Entries holding
+another table than the raw FIT file data (e.g. session summaries) record the name
+of their table, and do not produce manifest entries.
+"""
+
+import glob
+import json
+import os
+import time
+import uuid
+
+import polars as pl
+import pyarrow.parquet as pq
+import requests
+from google.api_core.exceptions import ServerError, TooManyRequests
+
+try:
+    from src.ingest_manifest import build_manifest_entry
+except ModuleNotFoundError:
+    # Imported from a script run (python src/fitfile_etl.py): src/ itself is on sys.path
+    from ingest_manifest import build_manifest_entry
+
+# Default spool directory
+SPOOL_DIR = "upload_spool"
+
+# Parquet schema metadata key holding the FIT file hashes of a spool entry
+SPOOL_METADATA_KEY = b"zwift_spool"
+
+# Upload attempts per spool entry, and delay before the first retry (doubled after each attempt)
+MAX_ATTEMPTS = 5
+BASE_DELAY_SECONDS = 1.0
+
+TRANSIENT_ERRORS = (
+    ServerError,
+    TooManyRequests,
+    ConnectionError,
+    TimeoutError,
+    requests.exceptions.ConnectionError,
+    requests.exceptions.Timeout,
+)
+
+
+def write_spool_entry(spool_dir, tables, file_hashes, table=None):
+    """
+    Write a batch of upload tables to the spool.
+
+    Tables are appended to the entry one at a time, so a streamed file is never
+    held in memory. The entry is written under a temporary name and renamed once
+    complete.
+
+    Args:
+        spool_dir (str): Path to the spool directory.
+        tables (iterable): pyarrow.Table objects with the same schema, as returned by
+                           to_upload_table.
+        file_hashes (dict): FIT file name to content hash, for the files in the batch.
+        table (str): Name of the table the entry is loaded to. Defaults to None (the raw
+                     FIT file data table).
+
+    Returns:
+        str: Path to the spool entry, or None if there was no table to write.
+    """
+    os.makedirs(spool_dir, exist_ok=True)
+    spool_path = os.path.join(spool_dir, f"{time.time_ns()}-{uuid.uuid4().hex[:8]}.parquet")
+    tmp_path = f"{spool_path}.tmp"
+    spool_metadata = {"file_hashes": file_hashes}
+    if table is not None:
+        spool_metadata["table"] = table
+    metadata = {SPOOL_METADATA_KEY: json.dumps(spool_metadata).encode()}
+    writer = None
+    try:
+        for upload_table in tables:
+            if writer is None:
+                writer = pq.ParquetWriter(tmp_path, upload_table.schema.with_metadata(metadata))
+            writer.write_table(upload_table)
+    except BaseException:
+        # e.g. an unreadable FIT file found halfway through a stream: leave nothing behind
+        if writer is not None:
+            writer.close()
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    if writer is None:
+        return None
+    writer.close()
+    os.replace(tmp_path, spool_path)
+    return spool_path
+
+
+def list_spool_entries(spool_dir):
+    """
+    List the spool entries, oldest first.
+
+    Args:
+        spool_dir (str): Path to the spool directory.
+
+    Returns:
+        list: Paths to the spool entries.
+    """
+    return sorted(glob.glob(os.path.join(glob.escape(spool_dir), "*.parquet")))
+
+
+def read_spool_metadata(spool_path):
+    """
+    Read the JSON metadata recorded in a spool entry.
+
+    Args:
+        spool_path (str): Path to the spool entry.
+
+    Returns:
+        dict: Spool entry metadata.
+    """
+    metadata = pq.read_schema(spool_path).metadata or {}
+    return json.loads(metadata.get(SPOOL_METADATA_KEY, b"{}"))
+
+
+def read_spool_file_hashes(spool_path):
+    """
+    Read the FIT file hashes recorded in a spool entry.
+
+    Args:
+        spool_path (str): Path to the spool entry.
+
+    Returns:
+        dict: FIT file name to content hash.
+    """
+    return read_spool_metadata(spool_path).get("file_hashes", {})
+
+
+def read_spool_table(spool_path):
+    """
+    Read the name of the table a spool entry is loaded to.
+
+    Args:
+        spool_path (str): Path to the spool entry.
+
+    Returns:
+        str: Name of the table, or None for the raw FIT file data table.
+    """
+    return read_spool_metadata(spool_path).get("table")
+
+
+def get_spooled_file_hashes(spool_dir):
+    """
+    Read the hashes of the FIT files waiting in the spool.
+
+    Args:
+        spool_dir (str): Path to the spool directory.
+
+    Returns:
+        dict: FIT file name to content hash, for the files held by the spool entries.
+    """
+    file_hashes = {}
+    for spool_path in list_spool_entries(spool_dir):
+        file_hashes.update(read_spool_file_hashes(spool_path))
+    return file_hashes
+
+
+def get_spooled_filenames(spool_dir):
+    """
+    List the FIT files waiting in the spool.
+
+    Args:
+        spool_dir (str): Path to the spool directory.
+
+    Returns:
+        set: Names of the FIT files held by the spool entries.
+    """
+    return set(get_spooled_file_hashes(spool_dir))
+
+
+def get_spool_job_id_prefix(spool_path):
+    """
+    Build the job ID prefix of the load jobs of a spool entry.
+
+    The prefix only depends on the entry, so every attempt to load it, in this run
+    or a later one, can find the load jobs of the earlier attempts.
+
+    Args:
+        spool_path (str): Path to the spool entry.
+
+    Returns:
+        str: Job ID prefix.
+    """
+    return f"zwift_spool_{os.path.splitext(os.path.basename(spool_path))[0]}"
+
+
+def get_spool_manifest_entries(spool_path):
+    """
+    Build the ingest manifest entries of the FIT files in a spool entry.
+
+    Args:
+        spool_path (str): Path to the spool entry.
+
+    Returns:
+        list: Manifest entries, as returned by build_manifest_entry, in file name order.
+    """
+    file_hashes = read_spool_file_hashes(spool_path)
+    stats_df = (
+        pl.read_parquet(spool_path, columns=["file_name", "timestamp"])
+        .group_by("file_name")
+        .agg(
+            pl.len().alias("row_count"),
+            pl.col("timestamp").min().dt.replace_time_zone(None).alias("start_time"),
+            pl.col("timestamp").max().dt.replace_time_zone(None).alias("end_time"),
+        )
+        .sort("file_name")
+    )
+    return [
+        build_manifest_entry(filename, file_hashes.get(filename), row_count, start_time, end_time)
+        for filename, row_count, start_time, end_time in stats_df.iter_rows()
+    ]
+
+
+def is_transient_error(error):
+    """
+    Check whether an upload error is worth retrying (server errors, rate limits, network failures).
+
+    Args:
+        error (Exception): Error raised by an upload.
+
+    Returns:
+        bool: True if the error is transient.
+    """
+    return isinstance(error, TRANSIENT_ERRORS)
+
+
+def retry_with_backoff(func, max_attempts=MAX_ATTEMPTS, base_delay=BASE_DELAY_SECONDS, sleep=time.sleep):
+    """
+    Call a function, retrying it with exponential backoff on transient errors.
+
+    Args:
+        func (callable): Function to call, without arguments.
+        max_attempts (int): Maximum number of calls. Defaults to MAX_ATTEMPTS.
+        base_delay (float): Delay before the first retry in seconds, doubled after each
+                            retry. Defaults to BASE_DELAY_SECONDS.
+        sleep (callable): Sleeps for a number of seconds. Defaults to time.sleep.
+
+    Returns:
+        The return value of the successful call.
+
+    Raises:
+        Exception: The last error, once the attempts are exhausted or on a
+                   non-transient error.
+    """
+    for attempt in range(max_attempts):
+        try:
+            return func()
+        except Exception as e:
+            if attempt == max_attempts - 1 or not is_transient_error(e):
+                raise
+            delay = base_delay * 2**attempt
+            print(f"   Upload failed ({e}), retrying in {delay:g}s...")
+            sleep(delay)
+
+
+def upload_spool_entry(spool_path, upload_file, max_attempts=MAX_ATTEMPTS, base_delay=BASE_DELAY_SECONDS, sleep=time.sleep):
+    """
+    Upload a spool entry, with retries, and delete it once loaded.
+
+    Args:
+        spool_path (str): Path to the spool entry.
+        upload_file (callable): Uploads a Parquet file, given its path, and returns the
+                                number of rows loaded.
+        max_attempts (int): Maximum number of upload attempts. Defaults to MAX_ATTEMPTS.
+        base_delay (float): Delay before the first retry in seconds. Defaults to BASE_DELAY_SECONDS.
+        sleep (callable): Sleeps for a number of seconds. Defaults to time.sleep.
+
+    Returns:
+        list: Manifest entries of the loaded FIT files (none for an entry of another
+              table than the raw FIT file data).
+
+    Raises:
+        ValueError: If the load job did not write one row per spooled row. The entry is
+                    kept; its load jobs have deterministic IDs (see upload_spool_file), so a
+                    later upload finds the finished job instead of appending the rows again.
+    """
+    entries = get_spool_manifest_entries(spool_path) if read_spool_table(spool_path) is None else []
+    output_rows = retry_with_backoff(lambda: upload_file(spool_path), max_attempts, base_delay, sleep)
+    expected_rows = pq.read_metadata(spool_path).num_rows
+    if output_rows != expected_rows:
+        raise ValueError(f"Load job wrote {output_rows} rows, expected {expected_rows}")
+    os.remove(spool_path)
+    return entries
+
+
+def drain_spool(spool_dir, upload_file, max_attempts=MAX_ATTEMPTS, base_delay=BASE_DELAY_SECONDS, sleep=time.sleep):
+    """
+    Upload the entries left in the spool by earlier runs, oldest first.
+
+    An entry failing with a non-transient error is kept and reported, and the
+    next entry is tried. A transient error that outlasts the retries stops the
+    drain, since the warehouse is most likely unavailable.
+
+    Args:
+        spool_dir (str): Path to the spool directory.
+        upload_file (callable): Uploads a Parquet file, given its path, and returns the
+                                number of rows loaded.
+        max_attempts (int): Maximum number of upload attempts per entry. Defaults to MAX_ATTEMPTS.
+        base_delay (float): Delay before the first retry in seconds. Defaults to BASE_DELAY_SECONDS.
+        sleep (callable): Sleeps for a number of seconds. Defaults to time.sleep.
+
+    Returns:
+        list: Manifest entries of the loaded FIT files.
+    """
+    entries = []
+    for spool_path in list_spool_entries(spool_dir):
+        try:
+            entries.extend(upload_spool_entry(spool_path, upload_file, max_attempts, base_delay, sleep))
+        except Exception as e:
+            print(f"Could not load spooled batch {os.path.basename(spool_path)}, keeping it: {e}")
+            if is_transient_error(e):
+                break
+    return entries
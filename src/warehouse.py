@@ -0,0 +1,460 @@
+"""
+Storage backends of the Zwift data: BigQuery, or a local DuckDB-over-Parquet warehouse.
+
+Both backends share one interface: list the FIT files already loaded, upload
+cleaned FIT file data, run the dbt transforms (augmented_data, training, zone,
+performance_rollup, timeseries_downsampled) and serve the dashboard queries.
+The BigQuery backend wraps the ETL functions and dbt. The DuckDB backend keeps every table as Parquet files in a local folder
+and runs the dbt models' logic with DuckDB, so the whole stack runs offline
+with millisecond query latency.
+
+DuckDB is an optional dependency (the "local" extra, installed for development):
+    poetry install --extras local
+
+Usage (load a folder of FIT files into a local warehouse and run the transforms):
+    poetry run python src/warehouse.py --warehouse-dir warehouse --folder "G:\\My Drive\\projects\\zwift\\data"
+"""
+
+import argparse
+import glob
+import os
+import re
+import subprocess
+import time
+import uuid
+
+import polars as pl
+import pyarrow.parquet as pq
+from google.api_core.exceptions import NotFound
+from google.cloud import bigquery
+
+try:
+    import duckdb
+except ImportError:
+    duckdb = None
+
+try:
+    from src.fitfile_etl import (
+        BQ_DATASET,
+        BQ_TABLE,
+        ZWIFT_DATA_FOLDER,
+        get_existing_filenames_from_bigquery,
+        get_fitfile_names_from_folder,
+        iter_valid_fitfiles,
+        load_fitfiles,
+        to_upload_table,
+        upload_to_bigquery,
+    )
+    from src.job_telemetry import append_job_record, record_dbt_run_results, record_job
+except ModuleNotFoundError:
+    # Run as a script (python src/warehouse.py): src/ itself is on sys.path
+    from fitfile_etl import (
+        BQ_DATASET,
+        BQ_TABLE,
+        ZWIFT_DATA_FOLDER,
+        get_existing_filenames_from_bigquery,
+        get_fitfile_names_from_folder,
+        iter_valid_fitfiles,
+        load_fitfiles,
+        to_upload_table,
+        upload_to_bigquery,
+    )
+    from job_telemetry import append_job_record, record_dbt_run_results, record_job
+
+# Artifact written by dbt run, with the BigQuery job statistics of every model build
+DBT_RUN_RESULTS_PATH = "target/run_results.json"
+
+# DuckDB versions of the dbt models (dbt/models), in dependency order, always built
+# in full. Their columns must match the ones listed in dbt/models/schema.yml
+# (tests/test_warehouse.py checks it). power_curve_best has no local version: its
+# source table is only loaded to BigQuery.
+DUCKDB_TRANSFORMS = {
+    "augmented_data": """
+        select
+            file_name,
+            timezone('America/New_York', timestamp) as local_timestamp,
+            cast(timezone('America/New_York', timestamp) as date) as date,
+            cast(timezone('America/New_York', timestamp) as time) as time,
+            heart_rate,
+            power,
+            cadence,
+            coalesce(speed, enhanced_speed) as speed_ms,
+            3.6 * coalesce(speed, enhanced_speed) as speed_kmh,
+            current_timestamp as transformed_at
+        from zwift_data.fitfile_data
+    """,
+    "training": """
+        select
+            date,
+            min(time) as start_time,
+            max(time) as end_time,
+            date_diff('second', min(time), max(time)) as duration,
+            round(sum(speed_ms) / 1000, 1) as distance_km,
+            round(avg(speed_kmh), 1) as avg_speed_kmh,
+            round(avg(power), 0) as avg_power,
+            round(avg(heart_rate), 0) as avg_heart_rate,
+            round(avg(cadence), 0) as avg_cadence,
+            round(max(heart_rate), 0) as max_heart_rate,
+            round(max(power), 0) as max_power,
+            round(max(cadence), 0) as max_cadence,
+            round(max(speed_kmh), 1) as max_speed_kmh,
+            max(transformed_at) as transformed_at
+        from zwift_data.augmented_data
+        group by date
+        order by date desc
+    """,
+    "zone": """
+        select
+            date,
+            sum(case when percent_of_max_hr < 0.6 then 1 else 0 end) as time_zone_1,
+            sum(case when percent_of_max_hr >= 0.6 and percent_of_max_hr < 0.7 then 1 else 0 end) as time_zone_2,
+            sum(case when percent_of_max_hr >= 0.7 and percent_of_max_hr < 0.8 then 1 else 0 end) as time_zone_3,
+            sum(case when percent_of_max_hr >= 0.8 and percent_of_max_hr < 0.9 then 1 else 0 end) as time_zone_4,
+            sum(case when percent_of_max_hr >= 0.9 then 1 else 0 end) as time_zone_5,
+            sum(case when percent_of_max_hr < 0.6 then 1 else 0 end) / count(date) as percentage_time_zone_1,
+            sum(case when percent_of_max_hr >= 0.6 and percent_of_max_hr < 0.7 then 1 else 0 end) / count(date) as percentage_time_zone_2,
+            sum(case when percent_of_max_hr >= 0.7 and percent_of_max_hr < 0.8 then 1 else 0 end) / count(date) as percentage_time_zone_3,
+            sum(case when percent_of_max_hr >= 0.8 and percent_of_max_hr < 0.9 then 1 else 0 end) / count(date) as percentage_time_zone_4,
+            sum(case when percent_of_max_hr >= 0.9 then 1 else 0 end) / count(date) as percentage_time_zone_5,
+            max(transformed_at) as transformed_at
+        from (
+            select
+                date,
+                heart_rate / (220 - date_diff('year', DATE '1994-05-12', cast(local_timestamp as date))) as percent_of_max_hr,
+                transformed_at
+            from zwift_data.augmented_data
+            where heart_rate is not null
+        ) as fitfile_data
+        group by date
+        order by date desc
+    """,
+    "performance_rollup": """
+        with days as (
+            select
+                'day' as grain,
+                date,
+                sum(heart_rate) as heart_rate_sum,
+                count(heart_rate) as heart_rate_count,
+                max(heart_rate) as heart_rate_max,
+                sum(power) as power_sum,
+                count(power) as power_count,
+                max(power) as power_max,
+                sum(cadence) as cadence_sum,
+                count(cadence) as cadence_count,
+                max(cadence) as cadence_max,
+                sum(speed_kmh) as speed_kmh_sum,
+                count(speed_kmh) as speed_kmh_count,
+                max(speed_kmh) as speed_kmh_max,
+                max(transformed_at) as transformed_at
+            from zwift_data.augmented_data
+            group by date
+        ),
+        periods as (
+            select 'month' as grain, cast(date_trunc('month', date) as date) as date, * exclude (grain, date) from days
+            union all
+            select 'year' as grain, cast(date_trunc('year', date) as date) as date, * exclude (grain, date) from days
+        )
+        select * from days
+        union all
+        select
+            grain,
+            date,
+            sum(heart_rate_sum) as heart_rate_sum,
+            sum(heart_rate_count) as heart_rate_count,
+            max(heart_rate_max) as heart_rate_max,
+            sum(power_sum) as power_sum,
+            sum(power_count) as power_count,
+            max(power_max) as power_max,
+            sum(cadence_sum) as cadence_sum,
+            sum(cadence_count) as cadence_count,
+            max(cadence_max) as cadence_max,
+            sum(speed_kmh_sum) as speed_kmh_sum,
+            sum(speed_kmh_count) as speed_kmh_count,
+            max(speed_kmh_max) as speed_kmh_max,
+            max(transformed_at) as transformed_at
+        from periods
+        group by grain, date
+    """,
+    "timeseries_downsampled": """
+        select
+            resolution_s,
+            date,
+            file_name,
+            time_bucket(to_seconds(resolution_s), local_timestamp) as local_timestamp,
+            avg(power) as power_avg,
+            min(power) as power_min,
+            max(power) as power_max,
+            avg(heart_rate) as heart_rate_avg,
+            min(heart_rate) as heart_rate_min,
+            max(heart_rate) as heart_rate_max,
+            avg(cadence) as cadence_avg,
+            min(cadence) as cadence_min,
+            max(cadence) as cadence_max,
+            avg(speed_kmh) as speed_kmh_avg,
+            min(speed_kmh) as speed_kmh_min,
+            max(speed_kmh) as speed_kmh_max
+        from zwift_data.augmented_data
+        cross join (values (1), (5), (30)) as resolutions(resolution_s)
+        group by all
+    """,
+}
+
+
+class Warehouse:
+    """Interface of a storage backend for the Zwift data."""
+
+    def get_existing_filenames(self, table):
+        """
+        List the FIT files already loaded to a raw table.
+
+        Args:
+            table (str): Name of the raw FIT file data table.
+
+        Returns:
+            set: Names of the loaded FIT files.
+        """
+        raise NotImplementedError
+
+    def upload(self, df, table):
+        """
+        Append cleaned FIT file data to a table.
+
+        Args:
+            df (polars.DataFrame or pyarrow.Table): Data to upload.
+            table (str): Name of the table.
+
+        Returns:
+            tuple: A tuple containing (number of rows uploaded, full table ID).
+        """
+        raise NotImplementedError
+
+    def run_transforms(self, full_refresh=False):
+        """
+        Update the augmented_data, training, zone, performance_rollup and timeseries_downsampled
+        tables from the raw table.
+
+        Args:
+            full_refresh (bool): Rebuild incremental tables from scratch instead of only
+                                 transforming the new rides. Defaults to False.
+        """
+        raise NotImplementedError
+
+    def query(self, sql, label="query"):
+        """
+        Run a dashboard query, written against `zwift_data.<table>`.
+
+        Args:
+            sql (str): Query to run.
+            label (str): Name of the query in the job metrics. Defaults to "query".
+
+        Returns:
+            pandas.DataFrame: Query result.
+
+        Raises:
+            google.api_core.exceptions.NotFound: If a queried table does not exist.
+        """
+        raise NotImplementedError
+
+    def query_polars(self, sql, params=(), label="query"):
+        """
+        Run a parameterized dashboard query, written against `zwift_data.<table>` with @name parameters.
+
+        Args:
+            sql (str): Query to run.
+            params (iterable): (name, BigQuery type, value) of each query parameter,
+                               e.g. ("date", "DATE", datetime.date(2024, 1, 1)).
+            label (str): Name of the query in the job metrics. Defaults to "query".
+
+        Returns:
+            polars.DataFrame: Query result.
+
+        Raises:
+            google.api_core.exceptions.NotFound: If a queried table does not exist.
+        """
+        raise NotImplementedError
+
+
+class BigQueryWarehouse(Warehouse):
+    """BigQuery backend: the ETL load jobs, dbt for the transforms."""
+
+    def __init__(self, client, dataset=BQ_DATASET):
+        self.client = client
+        self.dataset = dataset
+
+    def get_existing_filenames(self, table):
+        return get_existing_filenames_from_bigquery(self.client, self.dataset, table)
+
+    def upload(self, df, table):
+        return upload_to_bigquery(df, self.client, self.dataset, table)
+
+    def run_transforms(self, full_refresh=False):
+        subprocess.run(["dbt", "run"] + (["--full-refresh"] if full_refresh else []), check=True)
+        record_dbt_run_results(DBT_RUN_RESULTS_PATH)
+
+    def query(self, sql, label="query"):
+        job = self.client.query(sql)
+        df = job.to_dataframe()
+        record_job(job, label)
+        return df
+
+    def query_polars(self, sql, params=(), label="query"):
+        job_config = bigquery.QueryJobConfig(
+            query_parameters=[bigquery.ScalarQueryParameter(name, type_, value) for name, type_, value in params]
+        )
+        job = self.client.query(sql, job_config=job_config)
+        df = pl.from_arrow(job.to_arrow())
+        record_job(job, label)
+        return df
+
+
+class DuckDBWarehouse(Warehouse):
+    """
+    Local backend: Parquet files queried with DuckDB.
+
+    The raw table is a folder of Parquet files, one per upload; each transformed
+    table is a single Parquet file, replaced atomically by run_transforms. Every
+    table is exposed as a view in the zwift_data schema, so the dashboard queries
+    run unchanged.
+    """
+
+    def __init__(self, warehouse_dir):
+        if duckdb is None:
+            raise ImportError("The local warehouse requires DuckDB: pip install duckdb")
+        self.warehouse_dir = warehouse_dir
+        os.makedirs(warehouse_dir, exist_ok=True)
+        self.connection = duckdb.connect()
+        self.connection.execute("CREATE SCHEMA IF NOT EXISTS zwift_data")
+        self.refresh_views()
+
+    def get_table_path(self, table):
+        """Path of a transformed table's Parquet file."""
+        return os.path.join(self.warehouse_dir, f"{table}.parquet")
+
+    def get_raw_table_files(self, table):
+        """Parquet files of a raw (appended to) table."""
+        return sorted(glob.glob(os.path.join(glob.escape(self.warehouse_dir), table, "*.parquet")))
+
+    def refresh_views(self):
+        """Create a zwift_data view over the Parquet files of every existing table."""
+        for table_dir in glob.glob(os.path.join(glob.escape(self.warehouse_dir), "*", "")):
+            table = os.path.basename(os.path.dirname(table_dir))
+            if self.get_raw_table_files(table):
+                pattern = os.path.join(self.warehouse_dir, table, "*.parquet")
+                self.connection.execute(f"CREATE OR REPLACE VIEW zwift_data.{table} AS SELECT * FROM read_parquet('{pattern}')")
+        for table_path in glob.glob(os.path.join(glob.escape(self.warehouse_dir), "*.parquet")):
+            table = os.path.basename(table_path)[: -len(".parquet")]
+            self.connection.execute(f"CREATE OR REPLACE VIEW zwift_data.{table} AS SELECT * FROM read_parquet('{table_path}')")
+
+    def get_existing_filenames(self, table):
+        if not self.get_raw_table_files(table):
+            return set()
+        rows = self.connection.execute(f"SELECT DISTINCT file_name FROM zwift_data.{table} WHERE file_name IS NOT NULL").fetchall()
+        return {file_name for (file_name,) in rows}
+
+    def upload(self, df, table):
+        arrow_table = to_upload_table(df)
+        table_dir = os.path.join(self.warehouse_dir, table)
+        os.makedirs(table_dir, exist_ok=True)
+        part_path = os.path.join(table_dir, f"{uuid.uuid4().hex}.parquet")
+        # Hidden from the view's glob until complete
+        tmp_path = os.path.join(table_dir, f".{uuid.uuid4().hex}.tmp")
+        pq.write_table(arrow_table, tmp_path)
+        os.replace(tmp_path, part_path)
+        self.refresh_views()
+        return arrow_table.num_rows, f"{self.warehouse_dir}/{table}"
+
+    def run_transforms(self, full_refresh=False):
+        # Always a full rebuild: the local tables are small enough
+        for table, sql in DUCKDB_TRANSFORMS.items():
+            table_path = self.get_table_path(table)
+            tmp_path = f"{table_path}.tmp"
+            self.connection.execute(f"COPY ({sql}) TO '{tmp_path}' (FORMAT parquet)")
+            os.replace(tmp_path, table_path)
+            self.connection.execute(f"CREATE OR REPLACE VIEW zwift_data.{table} AS SELECT * FROM read_parquet('{table_path}')")
+
+    def query(self, sql, label="query"):
+        start = time.perf_counter()
+        # A cursor per query, since the dashboard shares the warehouse between threads
+        with self.connection.cursor() as cursor:
+            try:
+                df = cursor.execute(to_duckdb_sql(sql)).df()
+            except duckdb.CatalogException as e:
+                # Raised like on BigQuery, e.g. for the tables with no local version
+                raise NotFound(str(e)) from e
+        append_job_record({"label": label, "backend": "duckdb", "wall_s": time.perf_counter() - start})
+        return df
+
+    def query_polars(self, sql, params=(), label="query"):
+        start = time.perf_counter()
+        with self.connection.cursor() as cursor:
+            try:
+                df = cursor.execute(to_duckdb_sql(sql), {name: value for name, _, value in params}).pl()
+            except duckdb.CatalogException as e:
+                raise NotFound(str(e)) from e
+        append_job_record({"label": label, "backend": "duckdb", "wall_s": time.perf_counter() - start})
+        return df
+
+
+def to_duckdb_sql(sql):
+    """
+    Translate the BigQuery syntax of a dashboard query to DuckDB.
+
+    Table names lose their backquotes (`zwift_data.training`), and @name query
+    parameters become $name.
+
+    Args:
+        sql (str): Dashboard query, in BigQuery syntax.
+
+    Returns:
+        str: The query in DuckDB syntax.
+    """
+    sql = re.sub(r"`([^`]*)`", r"\1", sql)
+    return re.sub(r"@(\w+)", r"$\1", sql)
+
+
+def load_folder(warehouse, folder_path, table=BQ_TABLE, workers=1, cache_dir=None):
+    """
+    Load the new FIT files of a folder into a warehouse.
+
+    Empty files are deleted from the folder and invalid ones quarantined, as in the ETL.
+
+    Args:
+        warehouse (Warehouse): Storage backend to load into.
+        folder_path (str): Path to the folder containing the FIT files.
+        table (str): Name of the raw FIT file data table. Defaults to BQ_TABLE.
+        workers (int): Number of worker processes used to parse files. Defaults to 1.
+        cache_dir (str): Path to the parse cache directory. Defaults to None (no cache).
+
+    Returns:
+        dict: File name to number of rows uploaded, for each loaded file.
+    """
+    new_files = get_fitfile_names_from_folder(folder_path) - warehouse.get_existing_filenames(table)
+    row_counts = {}
+    results = load_fitfiles(folder_path, new_files, workers=workers, cache_dir=cache_dir)
+    for filename, df in iter_valid_fitfiles(folder_path, results):
+        try:
+            row_counts[filename], _ = warehouse.upload(df, table)
+        except Exception as e:
+            print(f"Error processing {filename}: {e}")
+    return row_counts
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load Zwift .fit files into a local DuckDB/Parquet warehouse.")
+    parser.add_argument("--warehouse-dir", default="warehouse", help="Folder of the local warehouse (default: warehouse).")
+    parser.add_argument("--folder", default=ZWIFT_DATA_FOLDER, help="Folder containing the FIT files.")
+    parser.add_argument("--workers", type=int, default=1, help="Number of processes used to parse FIT files (default: 1).")
+    parser.add_argument("--cache-dir", default=None, help="Directory of the local Parquet parse cache (default: no cache).")
+    args = parser.parse_args()
+
+    print("Loading Zwift .fit files to the local warehouse...")
+    warehouse = DuckDBWarehouse(args.warehouse_dir)
+    row_counts = load_folder(warehouse, args.folder, workers=args.workers, cache_dir=args.cache_dir)
+    for filename, output_rows in sorted(row_counts.items()):
+        print(f"   Processed '{filename}' successfully ({output_rows} rows).")
+    print(f"Total: Loaded {sum(row_counts.values())} rows from {len(row_counts)} files")
+
+    if warehouse.get_raw_table_files(BQ_TABLE):
+        warehouse.run_transforms()
+        print(f"Rebuilt {', '.join(DUCKDB_TRANSFORMS)}.")
+    print("--------------------------------")
@@ -0,0 +1,241 @@
+"""
+Watch mode: ingest Zwift activities within seconds of the end of a ride.
+
+Polls the Zwift activities folder instead of waiting for the daily
+move + ETL run. Each poll costs a single stat of the folder while nothing
+changes: the folder is only listed when its modification time changes (a file
+was created, renamed or deleted) or while a new file is still settling. A file
+is moved and ingested once its size and modification time stayed unchanged for
+a settle delay, so half-written files are never picked up; the in-progress
+activity is ignored until Zwift renames it on save. The poll interval doubles
+while the folder is idle, up to a maximum, and drops back to the minimum on any
+change.
+
+Usage:
+    poetry run python src/watch_zwift_folder.py
+"""
+
+import argparse
+import os
+import time
+
+from google.cloud import bigquery
+
+try:
+    from src.fitfile_etl import (
+        BQ_DATASET,
+        BQ_KEY_PATH,
+        BQ_MANIFEST_TABLE,
+        BQ_TABLE,
+        ZWIFT_DATA_FOLDER,
+        create_raw_table,
+        ingest_fitfile,
+    )
+    from src.move_zwift_files import IN_PROGRESS_FILENAME, SOURCE_FOLDER, transfer_file
+except ModuleNotFoundError:
+    # Run as a script (python src/watch_zwift_folder.py): src/ itself is on sys.path
+    from fitfile_etl import (
+        BQ_DATASET,
+        BQ_KEY_PATH,
+        BQ_MANIFEST_TABLE,
+        BQ_TABLE,
+        ZWIFT_DATA_FOLDER,
+        create_raw_table,
+        ingest_fitfile,
+    )
+    from move_zwift_files import IN_PROGRESS_FILENAME, SOURCE_FOLDER, transfer_file
+
+# Poll interval bounds, in seconds
+MIN_POLL_INTERVAL = 1
+MAX_POLL_INTERVAL = 8
+
+# Time a new file's size and modification time must stay unchanged before it is ingested
+SETTLE_SECONDS = 2
+
+# Delay before retrying a file whose move or ingest failed
+RETRY_SECONDS = 60
+
+
+def scan_folder(folder_path):
+    """
+    Stat the finished activity files of a folder.
+
+    Args:
+        folder_path (str): Path to the Zwift activities folder.
+
+    Returns:
+        dict: File name to (size, modification time in ns) signature, skipping the
+              in-progress activity.
+    """
+    signatures = {}
+    with os.scandir(folder_path) as entries:
+        for entry in entries:
+            if entry.name == IN_PROGRESS_FILENAME or not entry.is_file():
+                continue
+            stat = entry.stat()
+            signatures[entry.name] = (stat.st_size, stat.st_mtime_ns)
+    return signatures
+
+
+def find_settled_files(signatures, pending, now, settle_seconds=SETTLE_SECONDS):
+    """
+    Track new files until their signature stops changing.
+
+    Args:
+        signatures (dict): Current signatures, as returned by scan_folder.
+        pending (dict): File name to (signature, ready time) of the files waiting to
+                        be ingested. Updated in place: files that disappeared are
+                        dropped, and a changed signature pushes the ready time back.
+        now (float): Current monotonic time.
+        settle_seconds (float): Time a signature must stay unchanged. Defaults to SETTLE_SECONDS.
+
+    Returns:
+        list: Sorted names of the files that are ready to be ingested.
+    """
+    for filename in list(pending):
+        if filename not in signatures:
+            del pending[filename]
+    for filename, signature in signatures.items():
+        if filename not in pending or pending[filename][0] != signature:
+            pending[filename] = (signature, now + settle_seconds)
+    return sorted(filename for filename, (_, ready_at) in pending.items() if ready_at <= now)
+
+
+def get_next_poll_interval(interval, active, min_interval=MIN_POLL_INTERVAL, max_interval=MAX_POLL_INTERVAL):
+    """
+    Compute the next poll interval: back to the minimum after a change, doubled while idle.
+
+    Args:
+        interval (float): Current poll interval in seconds.
+        active (bool): Whether the last poll saw a change or has files waiting.
+        min_interval (float): Shortest poll interval. Defaults to MIN_POLL_INTERVAL.
+        max_interval (float): Longest poll interval. Defaults to MAX_POLL_INTERVAL.
+
+    Returns:
+        float: Next poll interval in seconds.
+    """
+    if active:
+        return min_interval
+    return min(interval * 2, max_interval)
+
+
+def watch_folder(
+    folder_path,
+    handle_file,
+    min_interval=MIN_POLL_INTERVAL,
+    max_interval=MAX_POLL_INTERVAL,
+    settle_seconds=SETTLE_SECONDS,
+    retry_seconds=RETRY_SECONDS,
+    should_stop=lambda: False,
+    sleep=time.sleep,
+    clock=time.monotonic,
+):
+    """
+    Poll a folder and call handle_file for each new file once it has settled.
+
+    Files already in the folder at startup are handled like new ones. A file is
+    handled again only if handle_file raised, after retry_seconds.
+
+    Args:
+        folder_path (str): Path to the Zwift activities folder.
+        handle_file (callable): Called with the name of each settled file. Must move
+                                the file out of the folder when it succeeds.
+        min_interval (float): Shortest poll interval. Defaults to MIN_POLL_INTERVAL.
+        max_interval (float): Longest poll interval, reached while idle. Defaults to MAX_POLL_INTERVAL.
+        settle_seconds (float): Time a file must stay unchanged. Defaults to SETTLE_SECONDS.
+        retry_seconds (float): Delay before retrying a failed file. Defaults to RETRY_SECONDS.
+        should_stop (callable): Checked before each poll; the loop ends when it returns True.
+        sleep (callable): Sleeps for a number of seconds. Defaults to time.sleep.
+        clock (callable): Monotonic clock. Defaults to time.monotonic.
+
+    Returns:
+        int: Number of files handled successfully.
+    """
+    pending = {}
+    folder_mtime = None
+    interval = min_interval
+    handled = 0
+    while not should_stop():
+        active = False
+        current_mtime = os.stat(folder_path).st_mtime_ns
+        if current_mtime != folder_mtime or pending:
+            active = current_mtime != folder_mtime
+            folder_mtime = current_mtime
+            now = clock()
+            for filename in find_settled_files(scan_folder(folder_path), pending, now, settle_seconds):
+                signature = pending.pop(filename)[0]
+                try:
+                    handle_file(filename)
+                    handled += 1
+                except Exception as e:
+                    print(f"Error ingesting {filename}, retrying in {retry_seconds}s: {e}")
+                    pending[filename] = (signature, now + retry_seconds)
+                active = True
+            # Settling files need the next poll soon, but not a retry far in the future
+            active = active or any(ready_at - now <= settle_seconds for _, ready_at in pending.values())
+        interval = get_next_poll_interval(interval, active, min_interval, max_interval)
+        sleep(interval)
+    return handled
+
+
+def ingest_new_activity(filename, source_folder, destination_folder, client):
+    """
+    Move a saved Zwift activity to the data folder, then load it to BigQuery.
+
+    A file already listed in the ingest manifest or waiting in the upload spool is
+    not loaded again. Errors reading the file are raised, so the watcher retries it.
+
+    Args:
+        filename (str): Name of the activity file.
+        source_folder (str): Path to the Zwift activities folder.
+        destination_folder (str): Path to the data folder.
+        client (google.cloud.bigquery.Client): BigQuery client instance.
+    """
+    status = transfer_file(source_folder, destination_folder, filename)
+    if status == "skipped":
+        print(f"   Already in the data folder: {filename}")
+    else:
+        print(f"   Moved: {filename}")
+    output_rows = ingest_fitfile(destination_folder, filename, client, BQ_DATASET, BQ_TABLE, BQ_MANIFEST_TABLE)
+    print(f"   Loaded '{filename}' ({output_rows} rows).")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Move and load Zwift .fit files to BigQuery as soon as they are saved.")
+    parser.add_argument("--source", default=SOURCE_FOLDER, help="Zwift activities folder to watch.")
+    parser.add_argument("--destination", default=ZWIFT_DATA_FOLDER, help="Data folder the activities are moved to.")
+    parser.add_argument(
+        "--min-interval",
+        type=float,
+        default=MIN_POLL_INTERVAL,
+        help=f"Poll interval after a change, in seconds (default: {MIN_POLL_INTERVAL}).",
+    )
+    parser.add_argument(
+        "--max-interval",
+        type=float,
+        default=MAX_POLL_INTERVAL,
+        help=f"Poll interval reached while idle, in seconds (default: {MAX_POLL_INTERVAL}).",
+    )
+    parser.add_argument(
+        "--settle",
+        type=float,
+        default=SETTLE_SECONDS,
+        help=f"Seconds a new file must stay unchanged before it is ingested (default: {SETTLE_SECONDS}).",
+    )
+    args = parser.parse_args()
+
+    os.makedirs(args.destination, exist_ok=True)
+    client = bigquery.Client.from_service_account_json(BQ_KEY_PATH)
+    create_raw_table(client, BQ_DATASET, BQ_TABLE)
+
+    print(f"Watching {args.source} for new Zwift activities (Ctrl+C to stop)...")
+    try:
+        watch_folder(
+            args.source,
+            lambda filename: ingest_new_activity(filename, args.source, args.destination, client),
+            min_interval=args.min_interval,
+            max_interval=args.max_interval,
+            settle_seconds=args.settle,
+        )
+    except KeyboardInterrupt:
+        print("Stopped watching.")
@@ -0,0 +1,188 @@
+"""
+ETL benchmark suite.
+
+Generates synthetic FIT files of configurable duration, field mix and count, then
+measures each ETL stage on them: fitparse decode, columnar decode, clean_fitfile,
+upload serialization (against an offline fake BigQuery client) and the streaming
+parse + spooled upload path. For each stage it reports records/sec, MB/sec and peak RSS.
+
+Each stage runs in a fresh process, so its peak RSS is not hidden by an earlier,
+hungrier stage. Peak RSS is not available on Windows (no resource module).
+
+Usage (from the repository root):
+    poetry run python -m tests.benchmark_etl --durations 10 60 720 --files 1 100
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import tempfile
+import time
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+import pyarrow.parquet as pq
+from google.api_core.exceptions import NotFound
+
+from src.fitfile_etl import (
+    clean_fitfile,
+    parse_fitfile,
+    spool_and_upload,
+    stream_fitfile,
+    to_upload_table,
+    upload_to_bigquery,
+)
+from tests.fit_generator import RECORD_FIELD_TYPES, ZWIFT_FIELDS, write_fitfile
+
+STAGES = ["parse_fitparse", "parse_columnar", "clean", "upload", "stream_upload"]
+
+
+class FakeLoadJob:
+    def __init__(self, output_rows):
+        self.output_rows = output_rows
+
+    def result(self):
+        return self
+
+
+class FakeBigQueryClient:
+    """Offline stand-in for google.cloud.bigquery.Client: reads the Parquet payload and drops it."""
+
+    project = "benchmark"
+
+    def load_table_from_file(self, file_obj, table_id, job_config=None, job_id=None):
+        return FakeLoadJob(pq.ParquetFile(file_obj).metadata.num_rows)
+
+    def get_job(self, job_id):
+        raise NotFound(job_id)
+
+
+def get_peak_rss_mb():
+    if resource is None:
+        return None
+    # ru_maxrss is in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def run_stage(stage, file_paths):
+    """
+    Run one ETL stage over every file and measure it. Inputs a stage depends on
+    (e.g. parsed frames for clean) are prepared before the measurement starts.
+
+    Returns:
+        dict: Stage name, seconds, records, megabytes processed and peak RSS.
+    """
+    if stage in ("clean", "upload"):
+        inputs = [(path, parse_fitfile(path, columnar=True)) for path in file_paths]
+        if stage == "upload":
+            inputs = [(path, clean_fitfile(df, os.path.basename(path))) for path, df in inputs]
+        megabytes = sum(df.estimated_size() for _, df in inputs) / 1024**2
+    else:
+        inputs = [(path, None) for path in file_paths]
+        megabytes = sum(os.path.getsize(path) for path in file_paths) / 1024**2
+
+    client = FakeBigQueryClient()
+    spool_dir = tempfile.mkdtemp()
+    rss_before = get_peak_rss_mb()
+    records = 0
+    start = time.perf_counter()
+    for path, df in inputs:
+        if stage == "parse_fitparse":
+            records += parse_fitfile(path).height
+        elif stage == "parse_columnar":
+            records += parse_fitfile(path, columnar=True).height
+        elif stage == "clean":
+            records += clean_fitfile(df, os.path.basename(path)).height
+        elif stage == "upload":
+            records += upload_to_bigquery(df, client, "dataset", "table")[0]
+        elif stage == "stream_upload":
+            tables = (to_upload_table(chunk) for chunk in stream_fitfile(path))
+            entries = spool_and_upload(tables, {}, client, "dataset", "table", spool_dir=spool_dir)
+            records += sum(entry["row_count"] for entry in entries)
+    seconds = time.perf_counter() - start
+    rss_after = get_peak_rss_mb()
+    os.rmdir(spool_dir)
+
+    return {
+        "stage": stage,
+        "seconds": seconds,
+        "records": records,
+        "megabytes": megabytes,
+        "peak_rss_mb": rss_after,
+        "peak_rss_increase_mb": None if rss_after is None else rss_after - rss_before,
+    }
+
+
+def run_stage_in_process(stage, file_paths):
+    context = multiprocessing.get_context("spawn")
+    with context.Pool(1) as pool:
+        return pool.apply(run_stage, (stage, file_paths))
+
+
+def run_benchmark(duration_min, n_files, fields=ZWIFT_FIELDS, stages=STAGES, workdir=None, isolate=True):
+    """
+    Generate synthetic FIT files and benchmark every requested stage on them.
+
+    Args:
+        duration_min (float): Duration of each ride in minutes.
+        n_files (int): Number of files to generate.
+        fields (tuple): Record fields to include in the files.
+        stages (list): Stages to run, from STAGES.
+        workdir (str): Directory for the generated files. Defaults to a temporary directory.
+        isolate (bool): Run each stage in a fresh process. Defaults to True.
+
+    Returns:
+        list: One result dict per stage, with records_per_sec and mb_per_sec added.
+    """
+    with tempfile.TemporaryDirectory(dir=workdir) as tmp_dir:
+        file_paths = []
+        for i in range(n_files):
+            file_path = os.path.join(tmp_dir, f"synthetic-{i:05d}.fit")
+            write_fitfile(file_path, int(duration_min * 60), fields=fields, seed=i)
+            file_paths.append(file_path)
+
+        results = []
+        for stage in stages:
+            result = run_stage_in_process(stage, file_paths) if isolate else run_stage(stage, file_paths)
+            result.update(
+                duration_min=duration_min,
+                files=n_files,
+                records_per_sec=result["records"] / result["seconds"] if result["seconds"] else None,
+                mb_per_sec=result["megabytes"] / result["seconds"] if result["seconds"] else None,
+            )
+            results.append(result)
+        return results
+
+
+def format_result(result):
+    rss = "n/a" if result["peak_rss_mb"] is None else f"{result['peak_rss_mb']:8.1f} MB"
+    return (
+        f"{result['duration_min']:>6g} min x {result['files']:<5d} {result['stage']:<15s}"
+        f"{result['records_per_sec']:>14,.0f} rec/s {result['mb_per_sec']:>9.2f} MB/s  peak RSS {rss}"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the Zwift ETL stages on synthetic FIT files.")
+    parser.add_argument("--durations", type=float, nargs="+", default=[10, 60, 720], help="Ride durations in minutes.")
+    parser.add_argument("--files", type=int, nargs="+", default=[1], help="Numbers of files per run.")
+    parser.add_argument(
+        "--fields",
+        nargs="+",
+        default=list(ZWIFT_FIELDS),
+        choices=sorted(RECORD_FIELD_TYPES),
+        help="Record fields to include in the generated files (timestamp is required).",
+    )
+    parser.add_argument("--stages", nargs="+", default=STAGES, choices=STAGES, help="Stages to benchmark.")
+    parser.add_argument("--workdir", default=None, help="Directory for the generated files.")
+    parser.add_argument("--json", action="store_true", help="Print results as JSON lines.")
+    args = parser.parse_args()
+
+    for duration_min in args.durations:
+        for n_files in args.files:
+            for result in run_benchmark(duration_min, n_files, tuple(args.fields), args.stages, args.workdir):
+                print(json.dumps(result) if args.json else format_result(result))
@@ -0,0 +1,135 @@
+"""
+Synthetic FIT file generator for tests and benchmarks.
+
+Writes valid FIT activity files (header, file_id, one record per second, CRCs)
+with a configurable duration and record field mix. Record messages are built
+as one NumPy structured array, so even 12-hour files are generated in
+milliseconds.
+"""
+
+import struct
+from datetime import datetime, timezone
+
+import numpy as np
+
+from src.fit_decoder import FIT_EPOCH_OFFSET, fit_crc
+
+# Record fields that can be generated: FIT field number, NumPy type, FIT base type
+RECORD_FIELD_TYPES = {
+    "timestamp": (253, "<u4", 0x86),
+    "position_lat": (0, "<i4", 0x85),
+    "position_long": (1, "<i4", 0x85),
+    "altitude": (2, "<u2", 0x84),
+    "heart_rate": (3, "u1", 0x02),
+    "cadence": (4, "u1", 0x02),
+    "distance": (5, "<u4", 0x86),
+    "speed": (6, "<u2", 0x84),
+    "power": (7, "<u2", 0x84),
+    "temperature": (13, "i1", 0x01),
+    "enhanced_speed": (73, "<u4", 0x86),
+}
+
+ZWIFT_FIELDS = ("timestamp", "position_lat", "position_long", "altitude", "heart_rate", "cadence", "distance", "speed", "power")
+
+INVALID_VALUES = {"u1": 0xFF, "<u2": 0xFFFF, "<u4": 0xFFFFFFFF, "i1": 0x7F, "<i4": 0x7FFFFFFF}
+
+
+def fit_timestamp(start_time):
+    return int(start_time.replace(tzinfo=timezone.utc).timestamp()) - FIT_EPOCH_OFFSET
+
+
+def definition_message(local_num, mesg_num, fields):
+    """Build a little-endian definition message for (field number, size, base type) tuples."""
+    message = struct.pack("<BBBHB", 0x40 | local_num, 0, 0, mesg_num, len(fields))
+    for number, size, base_type in fields:
+        message += bytes([number, size, base_type])
+    return message
+
+
+def generate_records(duration_s, fields, start_time, seed, dropout_rate):
+    """
+    Generate the raw values of one record per second of riding.
+
+    Returns:
+        numpy.ndarray: Structured array with a header byte and one column per field.
+    """
+    rng = np.random.default_rng(seed)
+    dtype = np.dtype([("header", "u1")] + [(name, RECORD_FIELD_TYPES[name][1]) for name in fields])
+    records = np.zeros(duration_s, dtype=dtype)
+    seconds = np.arange(duration_s)
+
+    # A ride: smooth effort changes plus per-second noise
+    effort = 1 + 0.25 * np.sin(seconds / 600) + 0.1 * np.sin(seconds / 47)
+    power = np.clip(200 * effort + rng.normal(0, 25, duration_s), 0, 1500)
+    speed = np.clip(7 + 3 * effort + rng.normal(0, 0.3, duration_s), 0, 25)
+    values = {
+        "timestamp": fit_timestamp(start_time) + seconds,
+        "position_lat": -138912672 + np.cumsum(rng.integers(-50, 50, duration_s)),
+        "position_long": 1991619840 + np.cumsum(rng.integers(-50, 50, duration_s)),
+        "altitude": (np.clip(20 + 10 * np.sin(seconds / 300), -400, 8000) + 500) * 5,
+        "heart_rate": np.clip(110 + 40 * (effort - 0.75) + rng.normal(0, 3, duration_s), 50, 210),
+        "cadence": np.clip(85 + 10 * (effort - 1) + rng.normal(0, 4, duration_s), 0, 160),
+        "distance": np.cumsum(speed) * 100,
+        "speed": speed * 1000,
+        "power": power,
+        "temperature": np.full(duration_s, 20),
+        "enhanced_speed": speed * 1000,
+    }
+    for name in fields:
+        column = np.round(values[name]).astype(records.dtype[name])
+        if dropout_rate and name != "timestamp":
+            column[rng.random(duration_s) < dropout_rate] = INVALID_VALUES[RECORD_FIELD_TYPES[name][1]]
+        records[name] = column
+    records["header"] = 0x01
+    return records
+
+
+def build_fitfile(duration_s, fields=ZWIFT_FIELDS, start_time=datetime(2023, 4, 4, 16, 33, 40), seed=0, dropout_rate=0.0):
+    """
+    Build the bytes of a synthetic FIT activity file.
+
+    Args:
+        duration_s (int): Ride duration in seconds (one record per second).
+        fields (tuple): Record fields to include, keys of RECORD_FIELD_TYPES. Must
+                        include "timestamp".
+        start_time (datetime.datetime): UTC time of the first record.
+        seed (int): Random seed for the record values.
+        dropout_rate (float): Fraction of non-timestamp values replaced by the FIT
+                              invalid value (sensor dropouts).
+
+    Returns:
+        bytes: Complete FIT file content.
+    """
+    file_id_fields = [(0, 1, 0x00), (1, 2, 0x84), (2, 2, 0x84), (4, 4, 0x86)]
+    messages = definition_message(0, 0, file_id_fields)
+    messages += struct.pack("<BBHHI", 0x00, 4, 260, 0, fit_timestamp(start_time))
+
+    record_fields = []
+    for name in fields:
+        number, type_code, base_type = RECORD_FIELD_TYPES[name]
+        record_fields.append((number, np.dtype(type_code).itemsize, base_type))
+    messages += definition_message(1, 20, record_fields)
+    messages += generate_records(duration_s, fields, start_time, seed, dropout_rate).tobytes()
+
+    header = struct.pack("<BBHI4s", 14, 0x20, 2132, len(messages), b".FIT")
+    header += struct.pack("<H", fit_crc(header))
+    data = header + messages
+    return data + struct.pack("<H", fit_crc(data))
+
+
+def write_fitfile(path, duration_s, **kwargs):
+    """
+    Write a synthetic FIT activity file.
+
+    Args:
+        path (str): Path of the FIT file to write.
+        duration_s (int): Ride duration in seconds (one record per second).
+        **kwargs: Passed to build_fitfile.
+
+    Returns:
+        int: Size of the written file in bytes.
+    """
+    data = build_fitfile(duration_s, **kwargs)
+    with open(path, "wb") as f:
+        f.write(data)
+    return len(data)
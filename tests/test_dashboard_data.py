@@ -0,0 +1,103 @@
+import os
+import shutil
+from datetime import date, datetime
+from unittest.mock import MagicMock
+
+import polars as pl
+import pyarrow as pa
+import pytest
+
+from src.dashboard_data import QUERIES, normalize_param, run_query, year_date_range
+from src.warehouse import BigQueryWarehouse, DuckDBWarehouse, load_folder, to_duckdb_sql
+
+TEST_FITFILE_PATH = os.path.join(os.path.dirname(__file__), "2023-04-04-12-33-06.fit")
+
+
+def test_normalize_param():
+    assert normalize_param("2023-04-04", "DATE") == date(2023, 4, 4)
+    assert normalize_param(datetime(2023, 4, 4, 12, 30), "DATE") == date(2023, 4, 4)
+    assert normalize_param(5.0, "INT64") == 5
+    assert normalize_param(2024, "STRING") == "2024"
+    with pytest.raises(ValueError):
+        normalize_param("2023-04-04'; DROP TABLE training; --", "DATE")
+    with pytest.raises(ValueError):
+        normalize_param(2.5, "INT64")
+
+
+def test_year_date_range():
+    assert year_date_range("2024") == (date(2024, 1, 1), date(2024, 12, 31))
+    assert year_date_range("All Years") == (date.min, date.max)
+
+
+def test_run_query_checks_parameters():
+    warehouse = MagicMock()
+
+    with pytest.raises(ValueError):
+        run_query("unknown", warehouse)
+    with pytest.raises(ValueError):
+        run_query("session_metrics", warehouse)
+    with pytest.raises(ValueError):
+        run_query("session_metrics", warehouse, date="2023-04-04", year="2023")
+
+    warehouse.query_polars.assert_not_called()
+
+
+def test_run_query_binds_normalized_parameters():
+    warehouse = MagicMock()
+    warehouse.query_polars.return_value = pl.DataFrame({"distance_km": [20.0]})
+
+    df = run_query("session_metrics", warehouse, date="2023-04-04")
+    run_query("session_metrics", warehouse, date=datetime(2023, 4, 4, 18, 0))
+
+    assert df["distance_km"].to_list() == [20.0]
+    first_call, second_call = warehouse.query_polars.call_args_list
+    sql, params = first_call.args
+    assert sql == QUERIES["session_metrics"].sql
+    assert params == (("date", "DATE", date(2023, 4, 4)),)
+    assert first_call.kwargs == {"label": "session_metrics"}
+    assert second_call == first_call
+
+
+def test_bigquery_warehouse_binds_query_parameters():
+    mock_client = MagicMock()
+    mock_client.query.return_value.to_arrow.return_value = pa.table({"year": [2023]})
+    warehouse = BigQueryWarehouse(mock_client, "zwift_data")
+
+    df = run_query("timeseries", warehouse, date="2023-04-04", resolution_s=5)
+
+    assert df.to_dict(as_series=False) == {"year": [2023]}
+    sql = mock_client.query.call_args.args[0]
+    assert "@date" in sql and "2023-04-04" not in sql
+    params = {param.name: (param.type_, param.value) for param in mock_client.query.call_args.kwargs["job_config"].query_parameters}
+    assert params == {"date": ("DATE", date(2023, 4, 4)), "resolution_s": ("INT64", 5)}
+
+
+def test_to_duckdb_sql():
+    assert to_duckdb_sql("SELECT * FROM `zwift_data.zone` WHERE date = @date") == "SELECT * FROM zwift_data.zone WHERE date = $date"
+
+
+def test_registered_queries_run_on_duckdb_warehouse(tmp_path):
+    data_dir = tmp_path / "data"
+    data_dir.mkdir()
+    shutil.copy(TEST_FITFILE_PATH, data_dir / "2023-04-04-12-33-06.fit")
+    warehouse = DuckDBWarehouse(str(tmp_path / "warehouse"))
+    load_folder(warehouse, str(data_dir))
+    warehouse.run_transforms()
+    start_date, end_date = year_date_range("All Years")
+
+    assert run_query("available_years", warehouse)["year"].to_list() == [2023]
+    assert run_query("available_dates", warehouse)["date"].to_list() == [date(2023, 4, 4)]
+    training = run_query("training_metrics", warehouse, start_date=start_date, end_date=end_date)
+    assert training["total_sessions"][0] == 1
+    assert run_query("training_metrics", warehouse, start_date="2024-01-01", end_date="2024-12-31")["total_sessions"][0] == 0
+    performance = run_query("performance_metrics", warehouse, start_date=date(2023, 1, 1), end_date=date(2023, 12, 31))
+    assert performance["max_power"][0] > 0
+    zones = run_query("zone_distribution", warehouse, start_date=start_date, end_date=end_date)
+    assert zones["zone_name"].to_list() == [f"Zone {zone}" for zone in range(1, 6)]
+    assert zones["percentage"].sum() == pytest.approx(100, abs=0.1)
+    session = run_query("session_metrics", warehouse, date="2023-04-04")
+    assert session["duration"][0] > 0
+    timeseries = run_query("timeseries", warehouse, date="2023-04-04", resolution_s=30)
+    assert timeseries["local_timestamp"].is_sorted()
+    session_zones = run_query("session_zone_distribution", warehouse, date="2023-04-04")
+    assert session_zones["percentage"].sum() == pytest.approx(1, abs=0.001)
@@ -0,0 +1,99 @@
+import json
+import os
+import shutil
+from unittest.mock import MagicMock
+
+import polars as pl
+import pytest
+
+from src.etl_instrumentation import RunReport, collect_stages, measure_stage, profile_call
+from src.fitfile_etl import load_fitfiles, upload_to_bigquery
+
+TEST_FITFILE_PATH = os.path.join(os.path.dirname(__file__), "2023-04-04-12-33-06.fit")
+
+
+def test_measure_stage_records_nothing_without_sink():
+    with measure_stage("parse", "a.fit") as stage:
+        stage["rows"] = 10
+
+    with collect_stages() as stages:
+        pass
+    assert stages == []
+
+
+def test_measure_stage_nested_stages_inherit_file_name():
+    with collect_stages() as stages:
+        with measure_stage("upload", "a.fit") as stage:
+            with measure_stage("serialize") as inner:
+                inner.update(rows=3, bytes=100)
+            stage["rows"] = 3
+
+    assert [(s["stage"], s["parent"], s["file_name"]) for s in stages] == [
+        ("serialize", "upload", "a.fit"),
+        ("upload", None, "a.fit"),
+    ]
+    assert stages[0]["bytes"] == 100
+    assert all(s["wall_s"] >= 0 and s["cpu_s"] >= 0 for s in stages)
+
+
+def test_run_report_writes_json_lines_and_keeps_slowest_profiles(tmp_path):
+    report = RunReport(str(tmp_path / "report.jsonl"), profile_dir=str(tmp_path / "profiles"), profile_top_n=1)
+    for file_name in ["fast.fit", "slow.fit"]:
+        profile_call(report.get_profile_path(file_name, "load"), sum, [1, 2])
+    report.extend(
+        [
+            {"stage": "parse", "parent": None, "file_name": "fast.fit", "wall_s": 0.1, "cpu_s": 0.1},
+            {"stage": "parse", "parent": None, "file_name": "slow.fit", "wall_s": 0.5, "cpu_s": 0.4},
+            {"stage": "serialize", "parent": "parse", "file_name": "fast.fit", "wall_s": 1.0, "cpu_s": 1.0},
+        ]
+    )
+
+    assert report.finish() == ["slow.fit"]
+    assert os.listdir(tmp_path / "profiles") == ["slow.fit.load.prof"]
+    lines = [json.loads(line) for line in (tmp_path / "report.jsonl").read_text().splitlines()]
+    assert len(lines) == 4
+    assert {line["run_id"] for line in lines} == {report.run_id}
+    assert lines[-1]["slowest_files"] == [{"file_name": "slow.fit", "wall_s": 0.5}]
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_load_fitfiles_reports_worker_stages(tmp_path, workers):
+    shutil.copy(TEST_FITFILE_PATH, tmp_path / "a.fit")
+    shutil.copy(TEST_FITFILE_PATH, tmp_path / "b.fit")
+    report = RunReport(str(tmp_path / "report.jsonl"), profile_dir=str(tmp_path / "profiles"))
+
+    results = list(load_fitfiles(str(tmp_path), {"a.fit", "b.fit"}, workers=workers, report=report))
+
+    assert [filename for filename, _, _ in results] == ["a.fit", "b.fit"]
+    lines = [json.loads(line) for line in (tmp_path / "report.jsonl").read_text().splitlines()]
+    assert [(line["stage"], line["file_name"]) for line in lines] == [
+        ("validate", "a.fit"),
+        ("parse", "a.fit"),
+        ("clean", "a.fit"),
+        ("validate", "b.fit"),
+        ("parse", "b.fit"),
+        ("clean", "b.fit"),
+    ]
+    assert lines[1]["bytes"] == os.path.getsize(TEST_FITFILE_PATH)
+    assert lines[2]["rows"] == results[0][1].height
+    assert sorted(os.listdir(tmp_path / "profiles")) == ["a.fit.load.prof", "b.fit.load.prof"]
+
+
+def test_upload_to_bigquery_measures_serialize_and_load_job():
+    mock_client = MagicMock()
+    mock_client.project = "test-project"
+    mock_client.load_table_from_file.return_value.output_rows = 2
+    df = pl.DataFrame({"file_name": ["a.fit", "a.fit"], "power": [150, 160]})
+
+    with collect_stages() as stages:
+        with measure_stage("upload", "a.fit"):
+            upload_to_bigquery(df, mock_client, "dataset", "table")
+
+    assert [(s["stage"], s["parent"], s["file_name"]) for s in stages] == [
+        ("serialize", "upload", "a.fit"),
+        ("load_job", "upload", "a.fit"),
+        ("upload", None, "a.fit"),
+    ]
+    assert stages[0]["rows"] == 2
+    assert stages[0]["bytes"] > 0
+    assert stages[1]["rows"] == 2
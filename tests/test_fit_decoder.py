@@ -0,0 +1,204 @@
+import os
+import struct
+from unittest.mock import patch
+
+import polars as pl
+import pyarrow as pa
+import pytest
+from fitparse.utils import FitCRCError, FitEOFError, FitHeaderError, FitParseError
+
+from src.fit_decoder import (
+    _CRC_TABLE,
+    FIT_CORRUPT,
+    FIT_EMPTY,
+    FIT_TRUNCATED,
+    FIT_VALID,
+    RECORD_FIELDS,
+    SESSION_FIELDS,
+    FitUnsupportedError,
+    decode_messages,
+    fit_crc,
+    iter_message_chunks,
+    read_header,
+    read_messages,
+    scan_messages,
+    validate_fitfile,
+)
+from src.fitfile_etl import parse_fitfile, parse_fitfile_messages, stream_fitfile
+
+TEST_FITFILE_PATH = os.path.join(os.path.dirname(__file__), "2023-04-04-12-33-06.fit")
+
+
+def read_test_fitfile():
+    with open(TEST_FITFILE_PATH, "rb") as f:
+        return f.read()
+
+
+def build_fitfile(messages):
+    header = struct.pack("<BBHI4s", 12, 0x10, 2132, len(messages), b".FIT")
+    data = header + messages
+    return data + struct.pack("<H", fit_crc(data))
+
+
+def compressed_timestamp_fitfile():
+    # Local 0: record with timestamp + heart_rate; local 1: record with heart_rate only,
+    # used by the compressed timestamp headers (header bit 7, local type in bits 5-6)
+    messages = struct.pack("<BBBHB", 0x40, 0, 0, 20, 2) + bytes([253, 4, 0x86, 3, 1, 0x02])
+    messages += struct.pack("<BBBHB", 0x41, 0, 0, 20, 1) + bytes([3, 1, 0x02])
+    messages += struct.pack("<BIB", 0x00, 1049474020, 120)
+    for offset in range(5, 8):
+        messages += struct.pack("<BB", 0x80 | (1 << 5) | offset, 121 + offset)
+    return build_fitfile(messages)
+
+
+def test_fit_crc_of_whole_file_is_zero():
+    # The trailing CRC makes the checksum of the complete file zero
+    data = read_test_fitfile()
+
+    assert fit_crc(data) == 0
+
+
+def test_fit_crc_matches_bytewise_crc():
+    data = os.urandom(10_000)
+
+    def bytewise_crc(data, crc=0):
+        for byte in data:
+            crc = (crc >> 8) ^ _CRC_TABLE[(crc ^ byte) & 0xFF]
+        return crc
+
+    # Short inputs, exact multiples of the block size, ragged tails and chained calls
+    for size in [0, 1, 255, 4096, 4097, 10_000]:
+        assert fit_crc(data[:size]) == bytewise_crc(data[:size])
+    assert fit_crc(data[5000:], fit_crc(data[:5000])) == bytewise_crc(data)
+
+
+@pytest.mark.parametrize("block_size", [2, 1 << 20])
+def test_validate_fitfile_classifies_files(tmp_path, block_size):
+    data = read_test_fitfile()
+    corrupted = bytearray(data)
+    corrupted[100] ^= 0xFF
+    header_only = build_fitfile(b"")
+    files = {
+        "valid.fit": (data, FIT_VALID),
+        "zero.fit": (b"", FIT_EMPTY),
+        "header_only.fit": (header_only, FIT_EMPTY),
+        "short.fit": (data[:6], FIT_TRUNCATED),
+        "truncated.fit": (data[: len(data) // 2], FIT_TRUNCATED),
+        "not_fit.fit": (b"dummy content", FIT_CORRUPT),
+        "corrupted.fit": (bytes(corrupted), FIT_CORRUPT),
+    }
+    for filename, (content, _) in files.items():
+        (tmp_path / filename).write_bytes(content)
+
+    for filename, (_, expected_status) in files.items():
+        status, reason = validate_fitfile(str(tmp_path / filename), block_size=block_size)
+        assert status == expected_status, filename
+        assert (reason is None) == (status == FIT_VALID)
+    assert "CRC Mismatch" in validate_fitfile(str(tmp_path / "corrupted.fit"))[1]
+
+
+def test_read_header():
+    header_size, data_size = read_header(read_test_fitfile())
+
+    assert header_size in (12, 14)
+    assert header_size + data_size + 2 == os.path.getsize(TEST_FITFILE_PATH)
+
+
+def test_read_header_rejects_non_fit_data():
+    with pytest.raises(FitHeaderError):
+        read_header(b"dummy content")
+
+
+def test_decode_messages_detects_crc_mismatch():
+    data = bytearray(read_test_fitfile())
+    data[100] ^= 0xFF
+
+    with pytest.raises(FitCRCError, match="CRC Mismatch"):
+        decode_messages(bytes(data), 20, RECORD_FIELDS)
+
+
+def test_decode_messages_returns_requested_columns():
+    table = decode_messages(read_test_fitfile(), 20, RECORD_FIELDS)
+
+    assert table.column_names == list(RECORD_FIELDS)
+    assert table.num_rows > 0
+
+
+def test_scan_messages_rejects_compressed_timestamps():
+    data = compressed_timestamp_fitfile()
+    header_size, data_size = read_header(data)
+
+    with pytest.raises(FitUnsupportedError):
+        scan_messages(data, header_size, data_size)
+
+
+def test_parse_fitfile_columnar_falls_back_to_fitparse(tmp_path):
+    fitfile_path = tmp_path / "compressed.fit"
+    fitfile_path.write_bytes(compressed_timestamp_fitfile())
+
+    expected_df = parse_fitfile(str(fitfile_path))
+    columnar_df = parse_fitfile(str(fitfile_path), columnar=True)
+
+    assert columnar_df.height == 4
+    assert columnar_df.equals(expected_df)
+
+
+def test_scan_messages_rejects_undefined_local_message_type():
+    data = build_fitfile(struct.pack("<BB", 0x03, 0))
+    header_size, data_size = read_header(data)
+
+    with pytest.raises(FitParseError, match="undefined local message type"):
+        scan_messages(data, header_size, data_size)
+
+
+def test_scan_messages_rejects_truncated_definition():
+    # Definition declares 4 fields but the data section only holds one
+    data = build_fitfile(struct.pack("<BBBHB", 0x40, 0, 0, 20, 4) + bytes([253, 4, 0x86]))
+    header_size, data_size = read_header(data)
+
+    with pytest.raises(FitEOFError):
+        scan_messages(data, header_size, data_size)
+
+
+def test_iter_message_chunks_matches_decode_messages():
+    data = read_test_fitfile()
+    table = decode_messages(data, 20, RECORD_FIELDS)
+
+    chunks = list(iter_message_chunks(data, 20, RECORD_FIELDS, chunk_size=1000))
+
+    assert [chunk.num_rows for chunk in chunks] == [1000, table.num_rows - 1000]
+    assert pa.concat_tables(chunks).equals(table)
+
+
+def test_stream_fitfile_falls_back_to_fitparse(tmp_path):
+    fitfile_path = tmp_path / "compressed.fit"
+    fitfile_path.write_bytes(compressed_timestamp_fitfile())
+
+    # The test file only has timestamp and heart_rate, so skip cleaning
+    with patch("src.fitfile_etl.clean_fitfile", side_effect=lambda df, filename, compact=False: df):
+        chunks = list(stream_fitfile(str(fitfile_path), chunk_rows=3))
+
+    assert [chunk.height for chunk in chunks] == [3, 1]
+    assert pl.concat(chunks).equals(parse_fitfile(str(fitfile_path)))
+
+
+def test_read_messages_decodes_summary_messages_with_records():
+    frames = read_messages(TEST_FITFILE_PATH)
+
+    assert frames["record"].equals(parse_fitfile(TEST_FITFILE_PATH, columnar=True))
+    assert frames["session"].columns == list(SESSION_FIELDS)
+    assert frames["session"].height == 1
+    assert frames["session"]["sport"].to_list() == ["cycling"]
+    assert frames["file_id"].height == 1
+    assert frames["device_info"].height > 0
+
+
+def test_parse_fitfile_messages_fallback_matches_columnar_decoder():
+    columnar = parse_fitfile_messages(TEST_FITFILE_PATH)
+
+    with patch("src.fitfile_etl.read_messages", side_effect=FitUnsupportedError("compressed timestamp")):
+        fallback = parse_fitfile_messages(TEST_FITFILE_PATH)
+
+    assert fallback.keys() == columnar.keys()
+    for name in ("session", "lap", "file_id", "device_info"):
+        assert fallback[name].equals(columnar[name]), name
@@ -0,0 +1,25 @@
+from src.fitfile_etl import clean_fitfile, parse_fitfile
+from tests.benchmark_etl import STAGES, run_benchmark
+from tests.fit_generator import ZWIFT_FIELDS, write_fitfile
+
+
+def test_write_fitfile_is_parsed_identically_by_both_decoders(tmp_path):
+    fitfile_path = str(tmp_path / "synthetic.fit")
+    write_fitfile(fitfile_path, 600, fields=ZWIFT_FIELDS + ("enhanced_speed",), dropout_rate=0.01)
+
+    expected_df = clean_fitfile(parse_fitfile(fitfile_path), "synthetic.fit")
+    columnar_df = clean_fitfile(parse_fitfile(fitfile_path, columnar=True), "synthetic.fit")
+
+    assert expected_df.height == 600
+    assert expected_df["power"].null_count() > 0
+    assert columnar_df.equals(expected_df)
+
+
+def test_run_benchmark_reports_every_stage(tmp_path):
+    results = run_benchmark(1, 2, workdir=str(tmp_path), isolate=False)
+
+    assert [result["stage"] for result in results] == STAGES
+    for result in results:
+        assert result["records"] == 120
+        assert result["records_per_sec"] > 0
+        assert result["mb_per_sec"] > 0
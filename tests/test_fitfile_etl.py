@@ -1,17 +1,46 @@
 import os
-from unittest.mock import MagicMock
+import shutil
+import struct
+from concurrent.futures import Future
+from concurrent.futures.process import BrokenProcessPool
+from unittest.mock import MagicMock, patch
 
 import pandas as pd
 import polars as pl
+import pyarrow as pa
+import pyarrow.parquet as pq
 import pytest
+from google.api_core.exceptions import NotFound
+from google.cloud import bigquery
 
+from src.fit_decoder import FitValidationError
 from src.fitfile_etl import (
+    batch_fitfiles,
     clean_fitfile,
+    collect_fitfile,
+    compact_fitfile,
+    create_raw_table,
+    derive_ride_tables,
+    get_bigquery_schema,
     get_existing_filenames_from_bigquery,
     get_fitfile_names_from_folder,
+    ingest_fitfile,
+    iter_valid_fitfiles,
+    load_fitfile,
+    load_fitfiles,
     parse_fitfile,
+    raw_table_needs_rebuild,
+    rebuild_raw_table,
+    split_summary_tables,
+    spool_and_upload,
+    stream_fitfile,
+    to_upload_table,
+    upload_spool_file,
     upload_to_bigquery,
 )
+from src.ingest_manifest import append_local_manifest, build_manifest_entry
+from src.parse_cache import hash_file
+from src.upload_spool import get_spool_job_id_prefix, write_spool_entry
 
 
 def test_parse_fitfile():
@@ -23,6 +52,16 @@ def test_parse_fitfile():
     assert df.height > 0
 
 
+def test_parse_fitfile_columnar_matches_fitparse():
+    test_fitfile_path = os.path.join(os.path.dirname(__file__), "2023-04-04-12-33-06.fit")
+    test_filename = "2023-04-04-12-33-06.fit"
+    expected_df = clean_fitfile(parse_fitfile(test_fitfile_path), test_filename)
+    columnar_df = clean_fitfile(parse_fitfile(test_fitfile_path, columnar=True), test_filename)
+
+    assert columnar_df.schema == expected_df.schema
+    assert columnar_df.equals(expected_df)
+
+
 def test_clean_fitfile():
     test_fitfile_path = os.path.join(os.path.dirname(__file__), "2023-04-04-12-33-06.fit")
     test_filename = "2023-04-04-12-33-06.fit"
@@ -41,6 +80,168 @@ def test_clean_fitfile():
     assert cleaned_df.height > 0
 
 
+def test_load_fitfile_returns_error_for_corrupted_file(tmp_path):
+    test_fitfile_path = os.path.join(os.path.dirname(__file__), "2023-04-04-12-33-06.fit")
+    with open(test_fitfile_path, "rb") as f:
+        data = bytearray(f.read())
+    data[100] ^= 0xFF
+    corrupted_path = tmp_path / "corrupted.fit"
+    corrupted_path.write_bytes(bytes(data))
+
+    with patch("src.fitfile_etl.parse_fitfile") as mock_parse:
+        df, error = load_fitfile(str(corrupted_path))
+
+    # Rejected by the validator, before any decoding
+    mock_parse.assert_not_called()
+    assert df is None
+    assert isinstance(error, FitValidationError)
+    assert error.status == "corrupt"
+    assert "CRC Mismatch" in str(error)
+
+
+def test_compact_fitfile_keeps_values_and_bigquery_types(tmp_path):
+    test_fitfile_path = os.path.join(os.path.dirname(__file__), "2023-04-04-12-33-06.fit")
+    shutil.copy(test_fitfile_path, tmp_path / "ride.fit")
+    cache_dir = str(tmp_path / "cache")
+    full_df, _ = load_fitfile(str(tmp_path / "ride.fit"), cache_dir=cache_dir)
+
+    # Served from the cache written by the full-width load
+    with patch("src.fitfile_etl.parse_fitfile") as mock_parse:
+        compact_df, error = load_fitfile(str(tmp_path / "ride.fit"), cache_dir=cache_dir, compact=True)
+    mock_parse.assert_not_called()
+
+    assert error is None
+    assert compact_df.schema == compact_fitfile(full_df).schema
+    assert compact_df["heart_rate"].dtype == pl.UInt8
+    assert compact_df["power"].dtype == pl.UInt16
+    assert compact_df["speed"].dtype == pl.Float32
+    assert compact_df["file_name"].dtype == pl.Categorical
+    assert compact_df.estimated_size() < full_df.estimated_size() / 1.5
+    assert compact_df.drop("speed", "enhanced_speed").with_columns(pl.col("file_name").cast(pl.String)).equals(
+        full_df.drop("speed", "enhanced_speed").cast({"heart_rate": pl.UInt8, "power": pl.UInt16, "cadence": pl.UInt8})
+    )
+    assert (compact_df["speed"].cast(pl.Float64) - full_df["speed"]).abs().max() < 1e-5
+    compact_schema = get_bigquery_schema(to_upload_table(compact_df).schema)
+    full_schema = get_bigquery_schema(to_upload_table(full_df).schema)
+    assert [(f.name, f.field_type) for f in compact_schema] == [(f.name, f.field_type) for f in full_schema]
+
+
+def test_load_fitfile_reads_back_from_cache(tmp_path):
+    test_fitfile_path = os.path.join(os.path.dirname(__file__), "2023-04-04-12-33-06.fit")
+    with open(test_fitfile_path, "rb") as f:
+        data = f.read()
+    (tmp_path / "first.fit").write_bytes(data)
+    (tmp_path / "second.fit").write_bytes(data)
+    cache_dir = str(tmp_path / "cache")
+
+    first_df, _ = load_fitfile(str(tmp_path / "first.fit"), cache_dir=cache_dir)
+    assert len(os.listdir(cache_dir)) == 1
+
+    # Same content under another name is served from the cache, with its own file name
+    with patch("src.fitfile_etl.parse_fitfile") as mock_parse:
+        second_df, error = load_fitfile(str(tmp_path / "second.fit"), cache_dir=cache_dir)
+    mock_parse.assert_not_called()
+    assert error is None
+    assert second_df.columns == first_df.columns
+    assert second_df.drop("file_name").equals(first_df.drop("file_name"))
+    assert second_df["file_name"].unique().to_list() == ["second.fit"]
+
+
+def test_load_fitfile_returns_nothing_for_empty_file(tmp_path):
+    # Valid FIT file (header and CRC) with no record messages
+    header = struct.pack("<BBHI4s", 12, 0x10, 2132, 0, b".FIT")
+    empty_path = tmp_path / "empty.fit"
+    empty_path.write_bytes(header + struct.pack("<H", 0xFFFF & crc16(header)))
+
+    df, error = load_fitfile(str(empty_path))
+
+    assert df is None
+    assert error is None
+
+
+def crc16(data):
+    crc = 0
+    for byte in data:
+        for _ in range(8):
+            crc = (crc >> 1) ^ 0xA001 if (crc ^ byte) & 1 else crc >> 1
+            byte >>= 1
+    return crc
+
+
+def test_collect_fitfile_reports_pool_failure_against_file():
+    future = Future()
+    future.set_exception(BrokenProcessPool("A process in the process pool was terminated abruptly"))
+
+    filename, df, error = collect_fitfile("a.fit", future)
+
+    assert filename == "a.fit"
+    assert df is None
+    assert isinstance(error, BrokenProcessPool)
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_load_fitfiles_preserves_order_and_errors(tmp_path, workers):
+    test_fitfile_path = os.path.join(os.path.dirname(__file__), "2023-04-04-12-33-06.fit")
+    with open(test_fitfile_path, "rb") as f:
+        data = f.read()
+    (tmp_path / "c.fit").write_bytes(data)
+    (tmp_path / "a.fit").write_bytes(data)
+    (tmp_path / "b.fit").write_bytes(b"dummy content")
+
+    results = list(load_fitfiles(str(tmp_path), {"c.fit", "a.fit", "b.fit"}, workers=workers))
+
+    assert [filename for filename, _, _ in results] == ["a.fit", "b.fit", "c.fit"]
+    assert results[0][1]["file_name"][0] == "a.fit"
+    assert results[0][2] is None
+    assert results[1][1] is None
+    assert results[1][2] is not None
+    assert results[2][1].height == results[0][1].height
+
+
+def test_create_raw_table_only_creates_missing_tables():
+    mock_client = MagicMock()
+    mock_client.project = "test_project"
+    mock_client.get_table.side_effect = NotFound("no table")
+
+    assert create_raw_table(mock_client, "dataset", "fitfile_data")
+    raw_table = mock_client.create_table.call_args[0][0]
+    assert raw_table.time_partitioning.field == "timestamp"
+    assert raw_table.clustering_fields == ["file_name"]
+
+    # Created without partitioning by an older version: left as is
+    mock_client.get_table.side_effect = None
+    mock_client.get_table.return_value = MagicMock(time_partitioning=None, clustering_fields=None)
+    assert not create_raw_table(mock_client, "dataset", "fitfile_data")
+    mock_client.create_table.assert_called_once()
+    mock_client.query.assert_not_called()
+
+
+def test_rebuild_raw_table_verifies_the_copy_before_dropping_the_old_table():
+    mock_client = MagicMock()
+    mock_client.project = "test_project"
+    partitioned_table = bigquery.Table("test_project.dataset.fitfile_data")
+    partitioned_table.time_partitioning = bigquery.TimePartitioning(field="timestamp")
+    partitioned_table.clustering_fields = ["file_name"]
+    mock_client.get_table.return_value = partitioned_table
+
+    # Already partitioned: nothing to do
+    assert not raw_table_needs_rebuild(mock_client, "dataset", "fitfile_data")
+    assert not rebuild_raw_table(mock_client, "dataset", "fitfile_data")
+    mock_client.query.assert_not_called()
+
+    mock_client.get_table.return_value = MagicMock(time_partitioning=None, clustering_fields=None)
+    assert raw_table_needs_rebuild(mock_client, "dataset", "fitfile_data")
+    assert rebuild_raw_table(mock_client, "dataset", "fitfile_data")
+    query = mock_client.query.call_args[0][0]
+    assert "PARTITION BY DATE(timestamp)" in query
+    assert "CLUSTER BY file_name" in query
+    statements = [statement.split()[0] for statement in query.split(";") if statement.strip()]
+    assert statements == ["CREATE", "ASSERT", "ALTER", "ALTER", "DROP"]
+    assert "RENAME TO `fitfile_data_unpartitioned`" in query
+    assert "RENAME TO `fitfile_data`" in query
+    assert "DROP TABLE `test_project.dataset.fitfile_data_unpartitioned`" in query
+
+
 def test_get_fitfile_names_from_folder():
     # Create a temporary directory with test files
     import tempfile
@@ -107,29 +308,287 @@ def test_get_existing_filenames_from_bigquery():
     assert isinstance(existing_files, set)
 
 
-def test_upload_to_bigquery_calls_load_table_from_dataframe():
+def test_upload_to_bigquery_calls_load_table_from_file():
     # Create a dummy DataFrame
-    df = pd.DataFrame({"a": [1, 2], "b": [3, 4]})
+    df = pl.DataFrame(
+        {
+            "file_name": ["a.fit", "a.fit"],
+            "timestamp": [pd.Timestamp("2023-04-04 16:33:40"), pd.Timestamp("2023-04-04 16:33:41")],
+            "power": [150, 160],
+            "speed": [9.8, 9.9],
+        }
+    )
 
     # Mock BigQuery client and job
     mock_client = MagicMock()
     mock_client.project = "test_project"
-    mock_job = MagicMock()
-    mock_job.output_rows = 2
-    mock_job.result.return_value = None
-    mock_client.load_table_from_dataframe.return_value = mock_job
+    uploaded = {}
+
+    def load_table_from_file(f, table_id, job_config):
+        uploaded["df"] = pl.read_parquet(f)
+        mock_job = MagicMock()
+        mock_job.output_rows = uploaded["df"].height
+        return mock_job
+
+    mock_client.load_table_from_file.side_effect = load_table_from_file
 
     # Call the function
     output_rows, table_id = upload_to_bigquery(df, mock_client, "test_dataset", "test_table")
 
     # Assertions
-    mock_client.load_table_from_dataframe.assert_called_once()
+    mock_client.load_table_from_file.assert_called_once()
+    mock_client.load_table_from_dataframe.assert_not_called()
 
     # Check that it was called with the right arguments
-    call_args = mock_client.load_table_from_dataframe.call_args
-    assert call_args[0][0].equals(df)
+    call_args = mock_client.load_table_from_file.call_args
     assert call_args[0][1] == "test_project.test_dataset.test_table"
-    assert "job_config" in call_args[1]
-    mock_job.result.assert_called_once()
+    job_config = call_args[1]["job_config"]
+    assert job_config.source_format == "PARQUET"
+    assert [(field.name, field.field_type) for field in job_config.schema] == [
+        ("file_name", "STRING"),
+        ("timestamp", "TIMESTAMP"),
+        ("power", "INTEGER"),
+        ("speed", "FLOAT"),
+    ]
+    assert uploaded["df"].drop("timestamp").equals(df.drop("timestamp"))
+    assert uploaded["df"]["timestamp"].dt.replace_time_zone(None).equals(df["timestamp"])
     assert output_rows == 2
     assert table_id == "test_project.test_dataset.test_table"
+
+
+def test_get_bigquery_schema_maps_arrow_types():
+    arrow_schema = pa.schema(
+        [
+            ("file_name", pa.dictionary(pa.int32(), pa.string())),
+            ("timestamp", pa.timestamp("us", tz="UTC")),
+            ("heart_rate", pa.uint8()),
+            ("speed", pa.float32()),
+        ]
+    )
+
+    schema = get_bigquery_schema(arrow_schema)
+
+    assert [(field.name, field.field_type) for field in schema] == [
+        ("file_name", "STRING"),
+        ("timestamp", "TIMESTAMP"),
+        ("heart_rate", "INTEGER"),
+        ("speed", "FLOAT"),
+    ]
+
+
+def test_iter_valid_fitfiles_deletes_empty_and_quarantines_corrupted_files(tmp_path):
+    for filename in ["empty.fit", "corrupted.fit", "other.fit"]:
+        (tmp_path / filename).write_bytes(b"dummy content")
+    df = pl.DataFrame({"a": [1, 2]})
+    results = [
+        ("corrupted.fit", None, ValueError("CRC Mismatch [computed: 0x0000, read: 0x0001]")),
+        ("empty.fit", None, None),
+        ("good.fit", df, None),
+        ("other.fit", None, ValueError("boom")),
+    ]
+
+    valid = list(iter_valid_fitfiles(str(tmp_path), results))
+
+    assert valid == [("good.fit", df)]
+    assert not (tmp_path / "empty.fit").exists()
+    assert not (tmp_path / "corrupted.fit").exists()
+    assert (tmp_path / "quarantine" / "corrupted.fit").read_bytes() == b"dummy content"
+    assert (tmp_path / "other.fit").exists()
+
+
+def test_derive_ride_tables_computes_compact_rides_in_one_pass():
+    test_fitfile_path = os.path.join(os.path.dirname(__file__), "2023-04-04-12-33-06.fit")
+    df, _ = load_fitfile(test_fitfile_path, compact=True)
+    other_df = compact_fitfile(df.with_columns(pl.lit("other.fit").alias("file_name")))
+
+    assert derive_ride_tables([df, other_df]) == {}
+    tables = derive_ride_tables([df, other_df], ftp=200, power_curve=True)
+
+    metrics = tables["fitfile_metrics"][0]
+    assert metrics["file_name"].to_list() == ["2023-04-04-12-33-06.fit", "other.fit"]
+    assert metrics["ftp"].to_list() == [200, 200]
+    curve = tables["fitfile_power_curve"][0]
+    assert curve.filter(pl.col("duration_s") == 1)["max_power"].to_list() == [df["power"].max()] * 2
+    assert curve["loaded_at"].null_count() == 0
+
+
+def test_batch_fitfiles_bounds_batch_rows():
+    frames = [(f"{i}.fit", pl.DataFrame({"a": list(range(n))})) for i, n in enumerate([3, 2, 4, 1])]
+
+    batches = list(batch_fitfiles(frames, max_rows=5))
+
+    assert [[filename for filename, _ in batch] for batch in batches] == [["0.fit", "1.fit"], ["2.fit", "3.fit"]]
+
+
+def test_load_fitfile_returns_summary_messages_with_records(tmp_path):
+    test_fitfile_path = os.path.join(os.path.dirname(__file__), "2023-04-04-12-33-06.fit")
+    cache_dir = str(tmp_path / "cache")
+    expected_df, _ = load_fitfile(test_fitfile_path)
+
+    tables, error = load_fitfile(test_fitfile_path, cache_dir=cache_dir, summaries=True)
+
+    assert error is None
+    assert tables["record"].equals(expected_df)
+    assert set(tables) == {"record", "session", "lap", "file_id", "device_info"}
+    assert tables["session"].columns[0] == "file_name"
+    assert tables["session"]["file_name"].to_list() == ["2023-04-04-12-33-06.fit"]
+    # The records are still cached for runs without summaries
+    assert len(os.listdir(cache_dir)) == 1
+
+
+def test_spool_and_upload_loads_summary_tables_to_their_own_tables(tmp_path):
+    test_fitfile_path = os.path.join(os.path.dirname(__file__), "2023-04-04-12-33-06.fit")
+    tables, _ = load_fitfile(test_fitfile_path, summaries=True)
+    df, summaries = split_summary_tables(tables)
+    mock_client = MagicMock()
+    mock_client.project = "test_project"
+    mock_client.get_job.side_effect = NotFound("job")
+    loaded = {}
+
+    def load_table_from_file(f, table_id, job_config, job_id):
+        job = MagicMock()
+        job.output_rows = pq.read_metadata(f).num_rows
+        loaded[table_id] = job.output_rows
+        return job
+
+    mock_client.load_table_from_file.side_effect = load_table_from_file
+
+    entries = spool_and_upload(
+        [to_upload_table(df)],
+        {"2023-04-04-12-33-06.fit": "hash"},
+        mock_client,
+        "dataset",
+        "fitfile_data",
+        str(tmp_path / "spool"),
+        summaries,
+    )
+
+    assert [(entry["file_name"], entry["row_count"]) for entry in entries] == [("2023-04-04-12-33-06.fit", df.height)]
+    assert loaded == {
+        "test_project.dataset.fitfile_data": df.height,
+        "test_project.dataset.fitfile_session": 1,
+        "test_project.dataset.fitfile_lap": tables["lap"].height,
+        "test_project.dataset.fitfile_file_id": 1,
+        "test_project.dataset.fitfile_device_info": tables["device_info"].height,
+    }
+    assert os.listdir(tmp_path / "spool") == []
+
+
+def test_ingest_fitfile_uploads_and_records_manifest_entry(tmp_path):
+    test_fitfile_path = os.path.join(os.path.dirname(__file__), "2023-04-04-12-33-06.fit")
+    with open(test_fitfile_path, "rb") as f:
+        (tmp_path / "a.fit").write_bytes(f.read())
+    expected_rows = load_fitfile(str(tmp_path / "a.fit"))[0].height
+    mock_client = MagicMock()
+    mock_client.project = "test_project"
+    mock_client.get_job.side_effect = NotFound("job")
+    mock_client.load_table_from_file.return_value.output_rows = expected_rows
+
+    with patch("src.fitfile_etl.MANIFEST_PATH", str(tmp_path / "manifest.parquet")):
+        output_rows = ingest_fitfile(
+            str(tmp_path), "a.fit", mock_client, "dataset", "fitfile_data", "ingest_manifest", str(tmp_path / "spool")
+        )
+
+    assert output_rows == expected_rows
+    assert pl.read_parquet(tmp_path / "manifest.parquet")["file_name"].to_list() == ["a.fit"]
+    assert os.listdir(tmp_path / "spool") == []
+    assert mock_client.load_table_from_json.call_args[0][1] == "test_project.dataset.ingest_manifest"
+
+
+def test_ingest_fitfile_skips_files_already_loaded_or_spooled(tmp_path):
+    test_fitfile_path = os.path.join(os.path.dirname(__file__), "2023-04-04-12-33-06.fit")
+    with open(test_fitfile_path, "rb") as f:
+        data = f.read()
+    (tmp_path / "a.fit").write_bytes(data)
+    (tmp_path / "b.fit").write_bytes(data)
+    (tmp_path / "c.fit").write_bytes(data + b"\0")
+    manifest_path = str(tmp_path / "manifest.parquet")
+    append_local_manifest(
+        manifest_path, [build_manifest_entry("a.fit", hash_file(str(tmp_path / "a.fit")), 1, None, None)]
+    )
+    # A spooled batch the warehouse refuses (non-transient error), so it stays in the spool
+    spooled_table = pa.table({"file_name": ["c.fit"], "timestamp": [pd.Timestamp("2023-04-04 16:33:40")]})
+    write_spool_entry(str(tmp_path / "spool"), [spooled_table], {"c.fit": hash_file(str(tmp_path / "c.fit"))})
+    mock_client = MagicMock()
+    mock_client.project = "test_project"
+    mock_client.load_table_from_file.side_effect = ValueError("Invalid table")
+
+    with patch("src.fitfile_etl.MANIFEST_PATH", manifest_path), patch("src.fitfile_etl.load_fitfiles") as mock_load:
+        for filename in ["a.fit", "b.fit", "c.fit"]:
+            ingest_fitfile(
+                str(tmp_path), filename, mock_client, "dataset", "fitfile_data", "ingest_manifest", str(tmp_path / "spool")
+            )
+
+    # a.fit is in the manifest, b.fit has the same content, c.fit is waiting in the spool
+    mock_load.assert_not_called()
+
+
+def test_ingest_fitfile_raises_read_errors_for_a_retry(tmp_path):
+    (tmp_path / "a.fit").write_bytes(b"locked")
+    mock_client = MagicMock()
+
+    with patch("src.fitfile_etl.MANIFEST_PATH", str(tmp_path / "manifest.parquet")), patch(
+        "src.fitfile_etl.load_fitfiles", return_value=[("a.fit", None, PermissionError("File is locked"))]
+    ):
+        with pytest.raises(PermissionError):
+            ingest_fitfile(
+                str(tmp_path), "a.fit", mock_client, "dataset", "fitfile_data", "ingest_manifest", str(tmp_path / "spool")
+            )
+
+    assert (tmp_path / "a.fit").exists()
+
+
+def test_stream_fitfile_matches_clean_fitfile():
+    test_fitfile_path = os.path.join(os.path.dirname(__file__), "2023-04-04-12-33-06.fit")
+    expected_df = clean_fitfile(parse_fitfile(test_fitfile_path), "2023-04-04-12-33-06.fit")
+
+    chunks = list(stream_fitfile(test_fitfile_path, chunk_rows=500))
+
+    assert [chunk.height for chunk in chunks] == [500, 500, 500, expected_df.height - 1500]
+    assert pl.concat(chunks).equals(expected_df)
+
+
+def test_stream_fitfile_rejects_truncated_file_before_decoding(tmp_path):
+    test_fitfile_path = os.path.join(os.path.dirname(__file__), "2023-04-04-12-33-06.fit")
+    with open(test_fitfile_path, "rb") as f:
+        data = f.read()
+    truncated_path = tmp_path / "truncated.fit"
+    truncated_path.write_bytes(data[: len(data) // 2])
+
+    with patch("src.fitfile_etl.iter_record_chunks") as mock_decode:
+        with pytest.raises(FitValidationError) as excinfo:
+            list(stream_fitfile(str(truncated_path)))
+    mock_decode.assert_not_called()
+    assert excinfo.value.status == "truncated"
+
+
+def test_upload_spool_file_waits_for_an_accepted_load_job_instead_of_resubmitting(tmp_path):
+    spool_path = write_spool_entry(
+        str(tmp_path),
+        [to_upload_table(pl.DataFrame({"file_name": ["a.fit"], "timestamp": [pd.Timestamp("2023-04-04 16:33:40")]}))],
+        {"a.fit": "hash_a"},
+    )
+    job_id_prefix = get_spool_job_id_prefix(spool_path)
+    failed_job = MagicMock(state="DONE", error_result={"reason": "backendError"})
+    running_job = MagicMock(state="RUNNING", error_result=None, output_rows=1)
+    jobs = {f"{job_id_prefix}_0": failed_job, f"{job_id_prefix}_1": running_job}
+
+    def get_job(job_id):
+        if job_id not in jobs:
+            raise NotFound(job_id)
+        return jobs[job_id]
+
+    mock_client = MagicMock()
+    mock_client.project = "test_project"
+    mock_client.get_job.side_effect = get_job
+
+    # The first attempt failed, the second was accepted before its result got lost
+    assert upload_spool_file(spool_path, mock_client, "test_dataset", "test_table") == 1
+    running_job.result.assert_called_once()
+    mock_client.load_table_from_file.assert_not_called()
+
+    # Once the accepted attempt failed as well, a third one is submitted
+    running_job.state, running_job.error_result = "DONE", {"reason": "backendError"}
+    mock_client.load_table_from_file.return_value.output_rows = 1
+    assert upload_spool_file(spool_path, mock_client, "test_dataset", "test_table") == 1
+    assert mock_client.load_table_from_file.call_args.kwargs["job_id"] == f"{job_id_prefix}_2"
@@ -0,0 +1,88 @@
+from datetime import datetime
+from unittest.mock import MagicMock
+
+import polars as pl
+import pyarrow as pa
+from google.api_core.exceptions import NotFound
+
+from src.ingest_manifest import (
+    MANIFEST_SCHEMA,
+    append_local_manifest,
+    build_manifest_entry,
+    find_changed_files,
+    read_local_manifest,
+    sync_manifest,
+)
+from src.parse_cache import hash_file
+
+
+def make_entry(filename, file_hash="abc"):
+    return build_manifest_entry(
+        filename, file_hash, 2, datetime(2023, 4, 4, 16, 33, 40), datetime(2023, 4, 4, 17, 4, 52)
+    )
+
+
+def test_build_manifest_entry():
+    entry = make_entry("a.fit")
+
+    assert entry["file_name"] == "a.fit"
+    assert entry["row_count"] == 2
+    assert entry["start_time"] == datetime(2023, 4, 4, 16, 33, 40)
+    assert entry["end_time"] == datetime(2023, 4, 4, 17, 4, 52)
+
+
+def test_append_local_manifest_replaces_entries_of_same_file(tmp_path):
+    manifest_path = str(tmp_path / "manifest.parquet")
+
+    append_local_manifest(manifest_path, [make_entry("a.fit", "old"), make_entry("b.fit")])
+    append_local_manifest(manifest_path, [make_entry("a.fit", "new")])
+    manifest_df = read_local_manifest(manifest_path)
+
+    assert manifest_df.schema == pl.Schema(MANIFEST_SCHEMA)
+    assert sorted(manifest_df.select("file_name", "file_hash").rows()) == [("a.fit", "new"), ("b.fit", "abc")]
+
+
+def test_sync_manifest_uploads_local_entries_missing_from_bigquery(tmp_path):
+    manifest_path = str(tmp_path / "manifest.parquet")
+    append_local_manifest(manifest_path, [make_entry("a.fit"), make_entry("b.fit")])
+    remote_df = pl.DataFrame([make_entry("a.fit")], schema=MANIFEST_SCHEMA)
+
+    mock_client = MagicMock()
+    mock_client.project = "test_project"
+    mock_client.query.return_value.to_arrow.return_value = remote_df.to_arrow()
+
+    manifest_df = sync_manifest(mock_client, "test_dataset", "test_manifest", "test_table", manifest_path)
+
+    mock_client.load_table_from_json.assert_called_once()
+    rows = mock_client.load_table_from_json.call_args[0][0]
+    assert [row["file_name"] for row in rows] == ["b.fit"]
+    assert sorted(manifest_df["file_name"]) == ["a.fit", "b.fit"]
+    assert sorted(read_local_manifest(manifest_path)["file_name"]) == ["a.fit", "b.fit"]
+
+
+def test_sync_manifest_creates_missing_table(tmp_path):
+    mock_client = MagicMock()
+    mock_client.project = "test_project"
+    empty = pa.Table.from_pylist([], schema=pl.DataFrame(schema=MANIFEST_SCHEMA).to_arrow().schema)
+    mock_client.query.return_value.to_arrow.side_effect = [NotFound("missing"), empty]
+
+    manifest_df = sync_manifest(mock_client, "test_dataset", "test_manifest", "test_table", str(tmp_path / "m.parquet"))
+
+    backfill_query = mock_client.query.call_args_list[1][0][0]
+    assert "CREATE TABLE IF NOT EXISTS `test_project.test_dataset.test_manifest`" in backfill_query
+    assert "FROM `test_project.test_dataset.test_table`" in backfill_query
+    assert manifest_df.height == 0
+
+
+def test_find_changed_files(tmp_path):
+    (tmp_path / "same.fit").write_bytes(b"dummy content")
+    (tmp_path / "changed.fit").write_bytes(b"new content")
+    entries = [
+        make_entry("same.fit", hash_file(str(tmp_path / "same.fit"))),
+        make_entry("changed.fit", "stale"),
+        make_entry("backfilled.fit", None),
+        make_entry("missing.fit", "abc"),
+    ]
+    manifest_df = pl.DataFrame(entries, schema=MANIFEST_SCHEMA)
+
+    assert find_changed_files(manifest_df, str(tmp_path)) == ["changed.fit"]
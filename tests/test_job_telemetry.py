@@ -0,0 +1,124 @@
+import json
+from datetime import datetime, timedelta, timezone
+from unittest.mock import MagicMock
+
+from src.fitfile_etl import get_existing_filenames_from_bigquery
+from src.job_telemetry import collect_jobs, record_dbt_run_results, record_job, summarize_jobs
+
+
+def make_job(job_id, job_type="query", bytes_billed=10 * 2**20, slot_ms=1500, wall_s=2.0):
+    job = MagicMock()
+    job.job_id = job_id
+    job.job_type = job_type
+    job.total_bytes_processed = bytes_billed
+    job.total_bytes_billed = bytes_billed
+    job.slot_millis = slot_ms
+    job.cache_hit = False
+    job.created = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    job.ended = job.created + timedelta(seconds=wall_s)
+    return job
+
+
+def read_records(store_path):
+    with open(store_path) as f:
+        return [json.loads(line) for line in f]
+
+
+def test_record_job_is_off_without_a_store(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+
+    record_job(make_job("job_1"), "query")
+
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_record_job_records_query_and_load_jobs(tmp_path):
+    store_path = str(tmp_path / "jobs.jsonl")
+    load_job = make_job("job_2", job_type="load", wall_s=5.0)
+    # Load jobs report the size of their input files, and bill nothing
+    load_job.total_bytes_processed = None
+    load_job.total_bytes_billed = None
+    load_job.slot_millis = None
+    load_job.input_file_bytes = 4096
+
+    with collect_jobs(store_path):
+        record_job(make_job("job_1"), "query")
+        record_job(load_job, "load_job:fitfile_data")
+
+    query_record, load_record = read_records(store_path)
+    assert query_record["job_id"] == "job_1"
+    assert query_record["bytes_billed"] == 10 * 2**20
+    assert query_record["slot_ms"] == 1500
+    assert query_record["wall_s"] == 2.0
+    assert load_record["label"] == "load_job:fitfile_data"
+    assert load_record["bytes_processed"] == 4096
+    assert load_record["bytes_billed"] is None
+    assert load_record["wall_s"] == 5.0
+
+
+def test_etl_queries_are_recorded(tmp_path):
+    store_path = str(tmp_path / "jobs.jsonl")
+    mock_client = MagicMock()
+    mock_client.project = "test_project"
+    job = make_job("job_1")
+    job.__iter__.return_value = iter([MagicMock(file_name="a.fit")])
+    mock_client.query.return_value = job
+
+    with collect_jobs(store_path):
+        assert get_existing_filenames_from_bigquery(mock_client, "zwift_data", "fitfile_data") == {"a.fit"}
+
+    assert [record["label"] for record in read_records(store_path)] == ["existing_filenames"]
+
+
+def test_record_dbt_run_results(tmp_path):
+    store_path = str(tmp_path / "jobs.jsonl")
+    run_results_path = tmp_path / "run_results.json"
+    run_results_path.write_text(
+        json.dumps(
+            {
+                "results": [
+                    {
+                        "unique_id": "model.zwift.training",
+                        "status": "success",
+                        "execution_time": 3.5,
+                        "adapter_response": {
+                            "job_id": "job_3",
+                            "bytes_processed": 2048,
+                            "bytes_billed": 10485760,
+                            "slot_ms": 700,
+                        },
+                    }
+                ]
+            }
+        )
+    )
+
+    with collect_jobs(store_path):
+        assert record_dbt_run_results(str(run_results_path)) == 1
+    # Not recorded once the collection ends
+    assert record_dbt_run_results(str(run_results_path)) == 0
+
+    (record,) = read_records(store_path)
+    assert record["label"] == "dbt:training"
+    assert record["job_id"] == "job_3"
+    assert record["bytes_billed"] == 10485760
+    assert record["wall_s"] == 3.5
+
+
+def test_summarize_jobs_per_label_most_billed_first(tmp_path):
+    store_path = str(tmp_path / "jobs.jsonl")
+    with collect_jobs(store_path):
+        record_job(make_job("job_1", bytes_billed=100, slot_ms=1000, wall_s=1.0), "cheap")
+        record_job(make_job("job_2", bytes_billed=300, slot_ms=2000, wall_s=1.0), "expensive")
+        record_job(make_job("job_3", bytes_billed=300, slot_ms=4000, wall_s=3.0), "expensive")
+
+    summary = summarize_jobs(store_path)
+
+    assert summary["label"].to_list() == ["expensive", "cheap"]
+    expensive = summary.row(0, named=True)
+    assert expensive["jobs"] == 2
+    assert expensive["bytes_billed"] == 600
+    assert expensive["slot_s"] == 6.0
+    assert expensive["avg_wall_s"] == 2.0
+    assert expensive["max_wall_s"] == 3.0
+    assert summarize_jobs(str(tmp_path / "missing.jsonl")).is_empty()
@@ -0,0 +1,89 @@
+import os
+from unittest.mock import patch
+
+import pytest
+
+from src.move_zwift_files import TransferError, get_files_to_move, transfer_file, transfer_files
+from src.parse_cache import hash_file
+
+
+@pytest.fixture
+def folders(tmp_path):
+    source, destination = tmp_path / "source", tmp_path / "destination"
+    source.mkdir()
+    destination.mkdir()
+    return source, destination
+
+
+def test_get_files_to_move_skips_in_progress_activity(folders):
+    source, _ = folders
+    (source / "a.fit").write_bytes(b"ride")
+    (source / "inProgressActivity.fit").write_bytes(b"recording")
+
+    assert get_files_to_move(str(source)) == ["a.fit"]
+
+
+def test_transfer_file_moves_verified_copy(folders):
+    source, destination = folders
+    (source / "a.fit").write_bytes(b"ride a")
+
+    assert transfer_file(str(source), str(destination), "a.fit") == "moved"
+    assert os.listdir(source) == []
+    assert os.listdir(destination) == ["a.fit"]
+    assert (destination / "a.fit").read_bytes() == b"ride a"
+
+
+def test_transfer_file_keeps_source_when_copy_does_not_match(folders):
+    source, destination = folders
+    (source / "a.fit").write_bytes(b"ride a")
+
+    def corrupted_copy(src, dst):
+        with open(dst, "wb") as f:
+            f.write(b"ride")
+
+    with patch("src.move_zwift_files.shutil.copyfile", side_effect=corrupted_copy):
+        with pytest.raises(TransferError):
+            transfer_file(str(source), str(destination), "a.fit")
+
+    assert os.listdir(source) == ["a.fit"]
+    assert os.listdir(destination) == []
+
+
+def test_transfer_file_skips_file_already_at_destination(folders):
+    source, destination = folders
+    (source / "a.fit").write_bytes(b"ride a")
+    (destination / "a.fit").write_bytes(b"ride a")
+
+    with patch("src.move_zwift_files.shutil.copyfile") as mock_copy:
+        assert transfer_file(str(source), str(destination), "a.fit") == "skipped"
+    mock_copy.assert_not_called()
+    assert os.listdir(source) == []
+
+
+def test_transfer_file_trusts_known_hash_of_destination(folders):
+    source, destination = folders
+    (source / "a.fit").write_bytes(b"ride a")
+    (destination / "a.fit").write_bytes(b"ride a")
+    source_hash = hash_file(str(source / "a.fit"))
+
+    with patch("src.move_zwift_files.hash_file", return_value=source_hash) as mock_hash:
+        assert transfer_file(str(source), str(destination), "a.fit", known_hash=source_hash) == "skipped"
+    # Only the source was hashed: the destination on the synced drive was not read
+    mock_hash.assert_called_once_with(str(source / "a.fit"))
+
+
+def test_transfer_files_reports_errors_per_file(folders):
+    source, destination = folders
+    for name in ["c.fit", "a.fit", "b.fit"]:
+        (source / name).write_bytes(name.encode())
+
+    results = list(transfer_files(str(source), str(destination), ["c.fit", "a.fit", "b.fit", "missing.fit"], workers=3))
+
+    assert [(filename, status) for filename, status, _ in results] == [
+        ("a.fit", "moved"),
+        ("b.fit", "moved"),
+        ("c.fit", "moved"),
+        ("missing.fit", None),
+    ]
+    assert isinstance(results[-1][2], FileNotFoundError)
+    assert sorted(os.listdir(destination)) == ["a.fit", "b.fit", "c.fit"]
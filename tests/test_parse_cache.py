@@ -0,0 +1,46 @@
+import os
+
+import polars as pl
+
+from src.parse_cache import clear_cache, evict_cache, hash_file, read_cache, write_cache
+
+
+def test_hash_file_depends_on_content(tmp_path):
+    (tmp_path / "a.fit").write_bytes(b"dummy content")
+    (tmp_path / "b.fit").write_bytes(b"dummy content")
+    (tmp_path / "c.fit").write_bytes(b"other content")
+
+    assert hash_file(str(tmp_path / "a.fit")) == hash_file(str(tmp_path / "b.fit"))
+    assert hash_file(str(tmp_path / "a.fit")) != hash_file(str(tmp_path / "c.fit"))
+
+
+def test_read_cache_round_trip_and_version_miss(tmp_path):
+    df = pl.DataFrame({"file_name": ["a.fit", "a.fit"], "power": [150, 160]})
+    write_cache(str(tmp_path), "abc", "v1", df)
+
+    assert read_cache(str(tmp_path), "abc", "v1").equals(df)
+    assert read_cache(str(tmp_path), "abc", "v2") is None
+    assert read_cache(str(tmp_path), "def", "v1") is None
+
+
+def test_evict_cache_removes_least_recently_used(tmp_path):
+    df = pl.DataFrame({"power": list(range(1000))})
+    for i, content_hash in enumerate(["old", "mid", "new"]):
+        write_cache(str(tmp_path), content_hash, "v1", df)
+        os.utime(tmp_path / f"{content_hash}-v1.parquet", (i, i))
+    entry_size = os.path.getsize(tmp_path / "new-v1.parquet")
+
+    deleted = evict_cache(str(tmp_path), max_bytes=2 * entry_size)
+
+    assert deleted == 1
+    assert sorted(os.listdir(tmp_path)) == ["mid-v1.parquet", "new-v1.parquet"]
+
+
+def test_clear_cache_keeps_current_version(tmp_path):
+    df = pl.DataFrame({"power": [1]})
+    write_cache(str(tmp_path), "abc", "v1", df)
+    write_cache(str(tmp_path), "abc", "v2", df)
+
+    assert clear_cache(str(tmp_path), keep_version="v2") == 1
+    assert os.listdir(tmp_path) == ["abc-v2.parquet"]
+    assert clear_cache(str(tmp_path)) == 1
@@ -0,0 +1,89 @@
+from datetime import datetime, timedelta
+
+import numpy as np
+import polars as pl
+import pytest
+
+from src.ride_metrics import add_rolling_power, compute_power_curve, compute_ride_metrics, mean_max_power
+
+
+def make_ride(filename, powers, heart_rate=150, start=datetime(2025, 1, 1, 10, 0, 0)):
+    return pl.DataFrame(
+        {
+            "file_name": [filename] * len(powers),
+            "timestamp": [start + timedelta(seconds=i) for i in range(len(powers))],
+            "heart_rate": [heart_rate] * len(powers),
+            "power": powers,
+        }
+    )
+
+
+def test_add_rolling_power_leaves_out_partial_windows():
+    df = add_rolling_power(make_ride("a.fit", [100] * 29 + [400] * 31), window_seconds=30)
+
+    assert df["rolling_power"][:29].null_count() == 29
+    assert df["rolling_power"][29] == pytest.approx(110)
+    assert df["rolling_power"][-1] == pytest.approx(400)
+
+
+def test_compute_ride_metrics_of_steady_hour_at_ftp():
+    metrics = compute_ride_metrics(make_ride("a.fit", [200] * 3601), ftp=200)
+
+    row = metrics.row(0, named=True)
+    assert row["duration_s"] == 3600
+    assert row["normalized_power"] == pytest.approx(200)
+    assert row["intensity_factor"] == pytest.approx(1)
+    assert row["tss"] == pytest.approx(100)
+    assert row["variability_index"] == pytest.approx(1)
+    assert row["efficiency_factor"] == pytest.approx(200 / 150)
+
+
+def test_compute_ride_metrics_matches_rolling_average_definition():
+    powers = [(i * 37) % 400 for i in range(600)]
+    rolling = [sum(powers[i - 29 : i + 1]) / 30 for i in range(29, len(powers))]
+    expected_np = (sum(p**4 for p in rolling) / len(rolling)) ** 0.25
+
+    # Rides are computed separately, whatever the order of their records
+    df = pl.concat([make_ride("b.fit", [100] * 60), make_ride("a.fit", powers)]).reverse()
+    metrics = compute_ride_metrics(df, ftp=250)
+
+    assert metrics.height == 2
+    row = metrics.filter(pl.col("file_name") == "a.fit").row(0, named=True)
+    assert row["normalized_power"] == pytest.approx(expected_np)
+    assert row["max_rolling_power"] == pytest.approx(max(rolling))
+    assert row["variability_index"] == pytest.approx(expected_np / (sum(powers) / len(powers)))
+
+
+def test_compute_ride_metrics_without_power():
+    metrics = compute_ride_metrics(make_ride("a.fit", [None] * 60).cast({"power": pl.Int64}))
+
+    row = metrics.row(0, named=True)
+    assert row["normalized_power"] is None
+    assert row["tss"] is None
+    assert row["efficiency_factor"] is None
+
+    with pytest.raises(ValueError, match="FTP"):
+        compute_ride_metrics(make_ride("a.fit", [100]), ftp=0)
+
+
+def test_mean_max_power_matches_brute_force():
+    power = np.random.default_rng(0).integers(0, 600, size=500).astype(float)
+
+    curve = mean_max_power(power, durations=(1, 7, 60, 500, 501))
+
+    assert set(curve) == {1, 7, 60, 500}
+    for duration, max_power in curve.items():
+        expected = max(power[i : i + duration].mean() for i in range(len(power) - duration + 1))
+        assert max_power == pytest.approx(expected)
+
+
+def test_compute_power_curve_counts_gaps_as_zero():
+    ride = make_ride("a.fit", [300] * 10 + [None] * 5 + [300] * 10)
+    # Drop 10 seconds of records in the middle: a 20s window cannot span them at 300 W
+    ride = ride.filter((pl.col("timestamp").dt.second() < 5) | (pl.col("timestamp").dt.second() >= 15))
+    no_power = make_ride("b.fit", [None] * 10).cast({"power": pl.Int64})
+
+    curve = compute_power_curve(pl.concat([ride, no_power]), durations=(5, 10, 20, 60))
+
+    assert curve["file_name"].unique().to_list() == ["a.fit"]
+    assert dict(zip(curve["duration_s"], curve["max_power"])) == {5: 300, 10: 300, 20: 300 * 10 / 20}
@@ -0,0 +1,121 @@
+import os
+from datetime import datetime
+
+import polars as pl
+import pyarrow.parquet as pq
+import pytest
+from google.api_core.exceptions import BadRequest, ServiceUnavailable
+
+from src.fitfile_etl import to_upload_table
+from src.upload_spool import (
+    drain_spool,
+    get_spooled_filenames,
+    list_spool_entries,
+    read_spool_table,
+    retry_with_backoff,
+    upload_spool_entry,
+    write_spool_entry,
+)
+
+
+def make_table(filename, n_rows):
+    df = pl.DataFrame(
+        {
+            "file_name": [filename] * n_rows,
+            "timestamp": [datetime(2025, 1, 1, 10, 0, i) for i in range(n_rows)],
+            "power": list(range(n_rows)),
+        }
+    )
+    return to_upload_table(df)
+
+
+def test_write_spool_entry_records_files_and_rows(tmp_path):
+    spool_path = write_spool_entry(
+        str(tmp_path), [make_table("a.fit", 2), make_table("b.fit", 3)], {"a.fit": "hash-a", "b.fit": "hash-b"}
+    )
+
+    assert list_spool_entries(str(tmp_path)) == [spool_path]
+    assert pq.read_metadata(spool_path).num_rows == 5
+    assert get_spooled_filenames(str(tmp_path)) == {"a.fit", "b.fit"}
+
+
+def test_write_spool_entry_leaves_nothing_on_failure(tmp_path):
+    def tables():
+        yield make_table("a.fit", 2)
+        raise ValueError("CRC Mismatch")
+
+    with pytest.raises(ValueError):
+        write_spool_entry(str(tmp_path), tables(), {"a.fit": "hash-a"})
+
+    assert os.listdir(tmp_path) == []
+    assert write_spool_entry(str(tmp_path), [], {"a.fit": "hash-a"}) is None
+
+
+def test_retry_with_backoff_retries_transient_errors_only():
+    sleeps = []
+    calls = []
+
+    def flaky():
+        calls.append(1)
+        if len(calls) < 3:
+            raise ServiceUnavailable("backend down")
+        return "done"
+
+    assert retry_with_backoff(flaky, max_attempts=5, base_delay=1, sleep=sleeps.append) == "done"
+    assert sleeps == [1, 2]
+
+    def invalid():
+        raise BadRequest("invalid schema")
+
+    with pytest.raises(BadRequest):
+        retry_with_backoff(invalid, sleep=sleeps.append)
+    assert sleeps == [1, 2]
+
+
+def test_upload_spool_entry_returns_manifest_entries_and_deletes_entry(tmp_path):
+    spool_path = write_spool_entry(str(tmp_path), [make_table("a.fit", 2)], {"a.fit": "hash-a"})
+
+    entries = upload_spool_entry(spool_path, lambda path: pq.read_metadata(path).num_rows)
+
+    assert [(e["file_name"], e["file_hash"], e["row_count"]) for e in entries] == [("a.fit", "hash-a", 2)]
+    assert entries[0]["start_time"] == datetime(2025, 1, 1, 10, 0, 0)
+    assert entries[0]["end_time"] == datetime(2025, 1, 1, 10, 0, 1)
+    assert list_spool_entries(str(tmp_path)) == []
+
+
+def test_upload_spool_entry_keeps_entry_on_row_mismatch(tmp_path):
+    spool_path = write_spool_entry(str(tmp_path), [make_table("a.fit", 2)], {"a.fit": "hash-a"})
+
+    with pytest.raises(ValueError, match="expected 2"):
+        upload_spool_entry(spool_path, lambda path: 1)
+    assert list_spool_entries(str(tmp_path)) == [spool_path]
+
+
+def test_drain_spool_stops_on_outage_and_resumes_next_run(tmp_path):
+    write_spool_entry(str(tmp_path), [make_table("a.fit", 2)], {"a.fit": "hash-a"})
+    write_spool_entry(str(tmp_path), [make_table("b.fit", 3)], {"b.fit": "hash-b"})
+    uploaded = []
+
+    def unavailable(path):
+        uploaded.append(path)
+        raise ServiceUnavailable("backend down")
+
+    assert drain_spool(str(tmp_path), unavailable, max_attempts=2, sleep=lambda seconds: None) == []
+    # Both attempts went to the oldest entry, then the drain stopped
+    assert len(set(uploaded)) == 1
+    assert len(list_spool_entries(str(tmp_path))) == 2
+
+    entries = drain_spool(str(tmp_path), lambda path: pq.read_metadata(path).num_rows)
+
+    assert [entry["file_name"] for entry in entries] == ["a.fit", "b.fit"]
+    assert list_spool_entries(str(tmp_path)) == []
+
+
+def test_upload_spool_entry_of_tagged_table_has_no_manifest_entries(tmp_path):
+    spool_path = write_spool_entry(
+        str(tmp_path), [make_table("a.fit", 1)], {"a.fit": "hash-a"}, table="fitfile_session"
+    )
+
+    assert read_spool_table(spool_path) == "fitfile_session"
+    assert upload_spool_entry(spool_path, lambda path: pq.read_metadata(path).num_rows) == []
+    assert list_spool_entries(str(tmp_path)) == []
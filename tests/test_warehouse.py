@@ -0,0 +1,155 @@
+import os
+import shutil
+from unittest.mock import MagicMock, patch
+
+import pytest
+import yaml
+from google.api_core.exceptions import NotFound
+
+from src.fitfile_etl import load_fitfile
+from src.job_telemetry import collect_jobs, summarize_jobs
+from src.warehouse import DUCKDB_TRANSFORMS, BigQueryWarehouse, DuckDBWarehouse, load_folder
+
+TEST_FITFILE_PATH = os.path.join(os.path.dirname(__file__), "2023-04-04-12-33-06.fit")
+DBT_SCHEMA_PATH = os.path.join(os.path.dirname(__file__), "..", "dbt", "models", "schema.yml")
+
+
+def test_bigquery_warehouse_delegates_to_client():
+    mock_client = MagicMock()
+    mock_client.project = "test_project"
+    mock_client.load_table_from_file.return_value.output_rows = 2
+    df, _ = load_fitfile(TEST_FITFILE_PATH)
+    warehouse = BigQueryWarehouse(mock_client, "zwift_data")
+
+    warehouse.upload(df.head(2), "fitfile_data")
+    warehouse.query("SELECT 1")
+
+    assert mock_client.load_table_from_file.call_args[0][1] == "test_project.zwift_data.fitfile_data"
+    mock_client.query.return_value.to_dataframe.assert_called_once()
+
+
+def test_bigquery_warehouse_runs_dbt_incrementally_unless_full_refresh():
+    warehouse = BigQueryWarehouse(MagicMock(), "zwift_data")
+
+    with patch("src.warehouse.subprocess.run") as mock_run:
+        warehouse.run_transforms()
+        warehouse.run_transforms(full_refresh=True)
+
+    assert [call.args[0] for call in mock_run.call_args_list] == [["dbt", "run"], ["dbt", "run", "--full-refresh"]]
+
+
+def test_duckdb_warehouse_loads_transforms_and_serves_queries(tmp_path):
+    data_dir = tmp_path / "data"
+    data_dir.mkdir()
+    shutil.copy(TEST_FITFILE_PATH, data_dir / "2023-04-04-12-33-06.fit")
+    warehouse = DuckDBWarehouse(str(tmp_path / "warehouse"))
+
+    row_counts = load_folder(warehouse, str(data_dir))
+    warehouse.run_transforms()
+
+    rows = row_counts["2023-04-04-12-33-06.fit"]
+    assert rows > 0
+    assert warehouse.get_existing_filenames("fitfile_data") == {"2023-04-04-12-33-06.fit"}
+    # Already loaded files are not loaded again
+    assert load_folder(warehouse, str(data_dir)) == {}
+
+    training = warehouse.query("SELECT date, duration, distance_km FROM `zwift_data.training`")
+    assert len(training) == 1
+    assert str(training["date"].iloc[0].date()) == "2023-04-04"
+    assert training["duration"].iloc[0] > 0
+    augmented = warehouse.query("SELECT COUNT(*) AS n FROM `zwift_data.augmented_data` WHERE date = '2023-04-04'")
+    assert augmented["n"].iloc[0] == rows
+    zone = warehouse.query(
+        """
+        SELECT percentage_time_zone_1 + percentage_time_zone_2 + percentage_time_zone_3
+            + percentage_time_zone_4 + percentage_time_zone_5 AS total
+        FROM `zwift_data.zone`
+        """
+    )
+    assert zone["total"].iloc[0] == pytest.approx(1)
+
+    # A new connection sees the same tables
+    assert len(DuckDBWarehouse(str(tmp_path / "warehouse")).query("SELECT * FROM zwift_data.zone")) == 1
+
+
+def test_duckdb_performance_rollup_recombines_exact_averages(tmp_path):
+    data_dir = tmp_path / "data"
+    data_dir.mkdir()
+    shutil.copy(TEST_FITFILE_PATH, data_dir / "2023-04-04-12-33-06.fit")
+    warehouse = DuckDBWarehouse(str(tmp_path / "warehouse"))
+    load_folder(warehouse, str(data_dir))
+    warehouse.run_transforms()
+
+    rollup = warehouse.query(
+        "SELECT grain, date, power_sum / power_count AS avg_power, power_max FROM `zwift_data.performance_rollup`"
+    )
+    expected = warehouse.query("SELECT AVG(power) AS avg_power, MAX(power) AS max_power FROM `zwift_data.augmented_data`")
+
+    assert sorted(rollup["grain"]) == ["day", "month", "year"]
+    assert sorted(str(date.date()) for date in rollup["date"]) == ["2023-01-01", "2023-04-01", "2023-04-04"]
+    assert rollup["avg_power"].tolist() == pytest.approx([expected["avg_power"].iloc[0]] * 3)
+    assert rollup["power_max"].tolist() == [expected["max_power"].iloc[0]] * 3
+
+
+def test_duckdb_timeseries_downsampled_keeps_peaks(tmp_path):
+    data_dir = tmp_path / "data"
+    data_dir.mkdir()
+    shutil.copy(TEST_FITFILE_PATH, data_dir / "2023-04-04-12-33-06.fit")
+    warehouse = DuckDBWarehouse(str(tmp_path / "warehouse"))
+    load_folder(warehouse, str(data_dir))
+    warehouse.run_transforms()
+
+    buckets = warehouse.query(
+        """
+        SELECT resolution_s, COUNT(*) AS n, MAX(power_max) AS power_max, MIN(power_min) AS power_min
+        FROM `zwift_data.timeseries_downsampled`
+        WHERE date = '2023-04-04'
+        GROUP BY resolution_s
+        ORDER BY resolution_s
+        """
+    )
+    expected = warehouse.query("SELECT COUNT(*) AS n, MAX(power) AS power_max, MIN(power) AS power_min FROM `zwift_data.augmented_data`")
+
+    assert buckets["resolution_s"].tolist() == [1, 5, 30]
+    assert buckets["n"].iloc[0] == expected["n"].iloc[0]
+    assert buckets["n"].iloc[2] == pytest.approx(expected["n"].iloc[0] / 30, rel=0.05)
+    assert buckets["power_max"].tolist() == [expected["power_max"].iloc[0]] * 3
+    assert buckets["power_min"].tolist() == [expected["power_min"].iloc[0]] * 3
+
+
+def test_duckdb_warehouse_records_query_wall_time(tmp_path):
+    store_path = str(tmp_path / "jobs.jsonl")
+    warehouse = DuckDBWarehouse(str(tmp_path / "warehouse"))
+
+    with collect_jobs(store_path):
+        warehouse.query("SELECT 1 AS one", label="one")
+
+    summary = summarize_jobs(store_path)
+    assert summary.select("label", "backend", "jobs").rows() == [("one", "duckdb", 1)]
+    assert summary["max_wall_s"][0] > 0
+
+
+def test_duckdb_warehouse_raises_not_found_for_missing_tables(tmp_path):
+    warehouse = DuckDBWarehouse(str(tmp_path / "warehouse"))
+
+    with pytest.raises(NotFound):
+        warehouse.query_polars("SELECT * FROM `zwift_data.power_curve_best`")
+    with pytest.raises(NotFound):
+        warehouse.query("SELECT * FROM `zwift_data.power_curve_best`")
+
+
+def test_duckdb_transforms_match_dbt_model_columns(tmp_path):
+    with open(DBT_SCHEMA_PATH) as f:
+        models = {model["name"]: [column["name"] for column in model["columns"]] for model in yaml.safe_load(f)["models"]}
+    data_dir = tmp_path / "data"
+    data_dir.mkdir()
+    shutil.copy(TEST_FITFILE_PATH, data_dir / "2023-04-04-12-33-06.fit")
+    warehouse = DuckDBWarehouse(str(tmp_path / "warehouse"))
+    load_folder(warehouse, str(data_dir))
+    warehouse.run_transforms()
+
+    # power_curve_best is BigQuery-only: its source table is not loaded to the local warehouse
+    assert set(DUCKDB_TRANSFORMS) == set(models) - {"power_curve_best"}
+    for table in DUCKDB_TRANSFORMS:
+        columns = warehouse.query(f"SELECT * FROM `zwift_data.{table}` LIMIT 0").columns.tolist()
+        assert columns == models[table], table
@@ -0,0 +1,72 @@
+import os
+
+from src.watch_zwift_folder import find_settled_files, get_next_poll_interval, scan_folder, watch_folder
+
+
+def test_scan_folder_skips_in_progress_activity(tmp_path):
+    (tmp_path / "2025-01-01-10-00-00.fit").write_bytes(b"ride")
+    (tmp_path / "inProgressActivity.fit").write_bytes(b"recording")
+    (tmp_path / "subfolder").mkdir()
+
+    signatures = scan_folder(str(tmp_path))
+
+    assert list(signatures) == ["2025-01-01-10-00-00.fit"]
+    assert signatures["2025-01-01-10-00-00.fit"][0] == 4
+
+
+def test_find_settled_files_waits_for_unchanged_signature():
+    pending = {}
+
+    assert find_settled_files({"a.fit": (10, 1)}, pending, now=0, settle_seconds=2) == []
+    # Still growing: the settle delay starts over
+    assert find_settled_files({"a.fit": (20, 2)}, pending, now=1, settle_seconds=2) == []
+    assert find_settled_files({"a.fit": (20, 2)}, pending, now=2, settle_seconds=2) == []
+    assert find_settled_files({"a.fit": (20, 2)}, pending, now=3, settle_seconds=2) == ["a.fit"]
+    # Removed files are forgotten
+    assert find_settled_files({}, pending, now=4) == []
+    assert pending == {}
+
+
+def test_get_next_poll_interval_backs_off_while_idle():
+    assert get_next_poll_interval(1, active=False, min_interval=1, max_interval=8) == 2
+    assert get_next_poll_interval(8, active=False, min_interval=1, max_interval=8) == 8
+    assert get_next_poll_interval(8, active=True, min_interval=1, max_interval=8) == 1
+
+
+def test_watch_folder_handles_settled_files_and_retries_failures(tmp_path):
+    (tmp_path / "a.fit").write_bytes(b"ride a")
+    (tmp_path / "b.fit").write_bytes(b"ride b")
+    (tmp_path / "inProgressActivity.fit").write_bytes(b"recording")
+    clock = {"now": 0.0}
+    sleeps = []
+    handled = []
+    failures = {"b.fit": 1}
+
+    def handle_file(filename):
+        if failures.get(filename):
+            failures[filename] -= 1
+            raise OSError("drive offline")
+        os.remove(tmp_path / filename)
+        handled.append(filename)
+
+    def sleep(seconds):
+        sleeps.append(seconds)
+        clock["now"] += seconds
+
+    result = watch_folder(
+        str(tmp_path),
+        handle_file,
+        min_interval=1,
+        max_interval=8,
+        settle_seconds=2,
+        retry_seconds=10,
+        should_stop=lambda: clock["now"] > 60,
+        sleep=sleep,
+        clock=lambda: clock["now"],
+    )
+
+    assert handled == ["a.fit", "b.fit"]
+    assert result == 2
+    assert os.listdir(tmp_path) == ["inProgressActivity.fit"]
+    # Idle once everything is handled: the interval backs off to the maximum
+    assert sleeps[-3:] == [8, 8, 8]